@@ -0,0 +1,89 @@
+import { NextResponse } from 'next/server'
+import { withAuth, getCurrentUser, type AuthenticatedRequest } from '@/lib/auth-middleware'
+import path from 'path'
+import { spawn } from 'child_process'
+import { callMlService } from '@/lib/ml-service'
+
+// Monte Carlo runs without the inference server go through the simulator CLI
+function runSimulatorCli(body: any): Promise<any> {
+  const args = [path.join(process.cwd(), 'ml', 'scenario_simulator.py'), '--json']
+  const options: [string, unknown][] = [
+    ['--scenarios', body.count],
+    ['--breakdown-rate', body.rates?.breakdown],
+    ['--expiry-rate', body.rates?.certificate_expiry],
+    ['--bay-outage-rate', body.rates?.bay_outage],
+    ['--service-trains', body.serviceTrains],
+    ['--seed', body.seed]
+  ]
+  for (const [flag, value] of options) {
+    if (typeof value === 'number') {
+      args.push(flag, String(value))
+    }
+  }
+
+  return new Promise((resolve, reject) => {
+    const pythonProcess = spawn('python', args, { cwd: process.cwd(), stdio: ['pipe', 'pipe', 'pipe'] })
+    let stdout = ''
+    let stderr = ''
+    pythonProcess.stdout.on('data', (data) => { stdout += data.toString() })
+    pythonProcess.stderr.on('data', (data) => { stderr += data.toString() })
+    pythonProcess.on('error', reject)
+    pythonProcess.on('close', (code) => {
+      if (code !== 0) {
+        reject(new Error(`Simulator exited with code ${code}: ${stderr}`))
+        return
+      }
+      try {
+        // The fleet loader may print warnings before the JSON line
+        resolve(JSON.parse(stdout.trim().split('\n').pop() || ''))
+      } catch (error) {
+        reject(error)
+      }
+    })
+  })
+}
+
+async function handlePostSimulation(request: AuthenticatedRequest): Promise<NextResponse> {
+  try {
+    const user = getCurrentUser(request)
+
+    if (!user || user.role !== 'Operator') {
+      return NextResponse.json({
+        success: false,
+        error: 'Insufficient permissions'
+      }, { status: 403 })
+    }
+
+    const body = await request.json().catch(() => ({}))
+
+    const serviceResponse = await callMlService('/simulate', { body, timeoutMs: 60000 })
+    if (serviceResponse) {
+      return NextResponse.json(serviceResponse.data, { status: serviceResponse.status })
+    }
+
+    if (Array.isArray(body.scenarios)) {
+      return NextResponse.json({
+        success: false,
+        error: 'Explicit scenarios need the ML inference server; only Monte Carlo runs are available'
+      }, { status: 503 })
+    }
+
+    const result = await runSimulatorCli(body)
+    return NextResponse.json({
+      success: true,
+      summary: result.summary,
+      trains: result.trains,
+      timestamp: new Date().toISOString()
+    })
+
+  } catch (error) {
+    console.error('❌ KMRL Scenario Simulation Error:', error)
+    return NextResponse.json({
+      success: false,
+      error: 'Failed to run scenario simulation',
+      details: error instanceof Error ? error.message : 'Unknown error'
+    }, { status: 500 })
+  }
+}
+
+export const POST = withAuth(handlePostSimulation)
@@ -9,6 +9,7 @@ import { trainDb } from '@/lib/db/train-db'
 import { uploadedDocuments, documentDataRecords } from '@/lib/db/train-schema'
 import jwt from 'jsonwebtoken'
 import { spawn } from 'child_process'
+import { callMlService } from '@/lib/ml-service'
 
 const JWT_SECRET = process.env.JWT_SECRET || 'kmrl-sih-2025-secret-key'
 
@@ -302,32 +303,44 @@ export async function POST(request: NextRequest) {
     // 🚀 AUTO-RETRAINING TRIGGER
     console.log('🔄 Starting automatic model retraining...')
     
-    // Trigger Python model retraining in background (don't wait for completion)
-    const pythonProcess = spawn('python', [
-      join(process.cwd(), 'ml', 'auto_retrain.py'),
-      filePath,
-      fileName
-    ], {
-      cwd: join(process.cwd(), 'ml'),
-      stdio: 'pipe'
+    // Hand the retrain to the warm inference server, or spawn Python if it is not running
+    const retrainResponse = await callMlService('/retrain', {
+      body: { filepath: filePath, filename: fileName },
+      timeoutMs: 2000
     })
 
-    // Log retraining output
-    pythonProcess.stdout.on('data', (data) => {
-      console.log('🐍 Auto-Retrain Output:', data.toString())
-    })
+    if (retrainResponse && retrainResponse.status === 202) {
+      console.log('🐍 Auto-retraining queued on the ML inference server')
+    } else {
+      // Queue the retrain with the scheduler in background (don't wait for completion)
+      // Uploads in a burst are coalesced into one retrain; only one retrain runs at a time
+      const pythonProcess = spawn('python', [
+        join(process.cwd(), 'ml', 'retrain_scheduler.py'),
+        'submit',
+        filePath,
+        fileName
+      ], {
+        cwd: join(process.cwd(), 'ml'),
+        stdio: 'pipe'
+      })
 
-    pythonProcess.stderr.on('data', (data) => {
-      console.error('🐍 Auto-Retrain Error:', data.toString())
-    })
+      // Log retraining output
+      pythonProcess.stdout.on('data', (data) => {
+        console.log('🐍 Auto-Retrain Output:', data.toString())
+      })
 
-    pythonProcess.on('close', (code) => {
-      console.log(`🎯 Auto-retraining completed with code: ${code}`)
-    })
+      pythonProcess.stderr.on('data', (data) => {
+        console.error('🐍 Auto-Retrain Error:', data.toString())
+      })
 
-    pythonProcess.on('error', (error) => {
-      console.error('❌ Auto-retraining process error:', error)
-    })
+      pythonProcess.on('close', (code) => {
+        console.log(`🎯 Auto-retraining completed with code: ${code}`)
+      })
+
+      pythonProcess.on('error', (error) => {
+        console.error('❌ Auto-retraining process error:', error)
+      })
+    }
 
     return NextResponse.json({
       success: true,
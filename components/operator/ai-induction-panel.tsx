@@ -109,6 +109,8 @@ export function AIInductionPanel() {
   }
 
   const getRecommendationIcon = (recommendation: string) => {
+    if (recommendation.includes('SERVICE')) return <CheckCircle className="w-4 h-4 text-green-600" />
+    if (recommendation.includes('STANDBY')) return <AlertTriangle className="w-4 h-4 text-yellow-600" />
     if (recommendation.includes('PRIORITY')) return <CheckCircle className="w-4 h-4 text-green-600" />
     if (recommendation.includes('RECOMMENDED')) return <CheckCircle className="w-4 h-4 text-blue-600" />
     if (recommendation.includes('CONDITIONAL')) return <AlertTriangle className="w-4 h-4 text-yellow-600" />
@@ -0,0 +1,7 @@
+ALTER TABLE `induction_plans` ADD `score` integer;--> statement-breakpoint
+ALTER TABLE `induction_plans` ADD `recommendation` text;--> statement-breakpoint
+ALTER TABLE `induction_plans` ADD `priority_level` text;--> statement-breakpoint
+ALTER TABLE `induction_plans` ADD `availability_score` integer;--> statement-breakpoint
+ALTER TABLE `induction_plans` ADD `maintenance_score` integer;--> statement-breakpoint
+ALTER TABLE `induction_plans` ADD `alert_count` integer;--> statement-breakpoint
+CREATE INDEX `induction_plans_date_trainset_idx` ON `induction_plans` (`date`,`trainset_id`);
@@ -1,5 +1,5 @@
 import { sql } from "drizzle-orm";
-import { integer, sqliteTable, text, real } from "drizzle-orm/sqlite-core";
+import { index, integer, sqliteTable, text, real } from "drizzle-orm/sqlite-core";
 
 // 1. Trainsets (master table)
 export const trainsets = sqliteTable("trainsets", {
@@ -80,8 +80,17 @@ export const inductionPlans = sqliteTable("induction_plans", {
   trainsetId: integer("trainset_id").references(() => trainsets.trainsetId).notNull(),
   decision: text("decision", { enum: ["Service", "Standby", "Maintenance"] }).notNull(),
   reason: text("reason").notNull(),
+  score: integer("score"),
+  recommendation: text("recommendation"),
+  priorityLevel: text("priority_level", { enum: ["HIGH", "MEDIUM", "LOW", "NONE"] }),
+  availabilityScore: integer("availability_score"),
+  maintenanceScore: integer("maintenance_score"),
+  alertCount: integer("alert_count"),
   generatedAt: integer("generated_at", { mode: "timestamp" }).default(sql`CURRENT_TIMESTAMP`),
-});
+}, (table) => [
+  // The latest plan is read by date, and each plan is replaced per (date, trainset)
+  index("induction_plans_date_trainset_idx").on(table.date, table.trainsetId),
+]);
 
 // 8. Train Users (extending existing users table for train-specific roles)
 export const trainUsers = sqliteTable("train_users", {
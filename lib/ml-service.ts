@@ -0,0 +1,33 @@
+// Client for the resident Python inference server (ml/inference_server.py)
+// Falls back to null when the server is not running so callers can spawn Python instead
+
+const ML_SERVICE_URL = process.env.ML_SERVICE_URL || 'http://127.0.0.1:8765'
+
+export interface MlServiceResponse<T = any> {
+  status: number
+  data: T
+}
+
+export async function callMlService<T = any>(
+  endpoint: string,
+  options: { method?: 'GET' | 'POST'; body?: unknown; timeoutMs?: number } = {}
+): Promise<MlServiceResponse<T> | null> {
+  const { method = 'POST', body, timeoutMs = 30000 } = options
+  const controller = new AbortController()
+  const timeout = setTimeout(() => controller.abort(), timeoutMs)
+
+  try {
+    const response = await fetch(`${ML_SERVICE_URL}${endpoint}`, {
+      method,
+      headers: { 'Content-Type': 'application/json' },
+      body: body === undefined ? undefined : JSON.stringify(body),
+      signal: controller.signal
+    })
+    return { status: response.status, data: await response.json() }
+  } catch (error) {
+    console.warn(`⚠️ ML service unavailable at ${ML_SERVICE_URL}${endpoint}:`, error instanceof Error ? error.message : error)
+    return null
+  } finally {
+    clearTimeout(timeout)
+  }
+}
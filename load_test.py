@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Load generator for the KMRL induction APIs
+Drives concurrent GET/POST traffic at /api/ai/induction and /api/operator/induction and reports
+latency percentiles, throughput and error rates; --stub runs against a local stand-in for the Next.js app
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime
+from urllib.parse import urlsplit
+
+# Request mix: (method, path, JSON body), the calls test_api.py and test_induction_api.py make
+SCENARIOS = {
+    'ai-get': ('GET', '/api/ai/induction', None),
+    'ai-post': ('POST', '/api/ai/induction', {'forceRegenerate': False}),
+    'operator-get': ('GET', '/api/operator/induction', None),
+    'operator-post': ('POST', '/api/operator/induction', {'action': 'comprehensive_analysis'})
+}
+
+def percentile(sorted_values, q):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client over asyncio streams, so the tool needs nothing beyond the standard library"""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (OSError, ConnectionError):
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None, headers=None):
+        """Send one request and return (status, body bytes)"""
+        return await asyncio.wait_for(self._request(method, path, body, headers or {}), self.timeout)
+
+    async def _request(self, method, path, body, headers):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        payload = json.dumps(body).encode() if body is not None else b''
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive",
+                 "Accept: application/json", f"Content-Length: {len(payload)}"]
+        if body is not None:
+            lines.append("Content-Type: application/json")
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Server closed the connection')
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            data = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            data = await self.reader.readexactly(int(response_headers['content-length']))
+        else:
+            data = await self.reader.read()
+            await self.close()
+
+        if response_headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status, data
+
+async def run_load(base_url, scenarios, concurrency=10, total_requests=None, duration=None,
+                   timeout=30.0, token=None, seed=None):
+    """Drive the scenario mix from `concurrency` workers; returns one record per request
+
+    Stops after total_requests requests or duration seconds, whichever is
+    given (total_requests wins). Each worker keeps its own connection
+    open between requests, like a browser tab polling the dashboard.
+    """
+    url = urlsplit(base_url)
+    if url.scheme != 'http':
+        raise ValueError('Only http:// targets are supported')
+    host, port = url.hostname, url.port or 80
+    prefix = url.path.rstrip('/')
+    headers = {'Authorization': f"Bearer {token}"} if token else {}
+    rng = random.Random(seed)
+    names = list(scenarios)
+
+    records = []
+    issued = 0
+    deadline = time.perf_counter() + duration if duration and not total_requests else None
+
+    def next_request():
+        nonlocal issued
+        if total_requests is not None and issued >= total_requests:
+            return None
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        issued += 1
+        return rng.choice(names)
+
+    async def worker():
+        connection = HttpConnection(host, port, timeout)
+        try:
+            while True:
+                name = next_request()
+                if name is None:
+                    return
+                method, path, body = scenarios[name]
+                started = time.perf_counter()
+                try:
+                    status, _ = await connection.request(method, prefix + path, body, headers)
+                    error = None if 200 <= status < 400 else f"HTTP {status}"
+                except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                    status, error = None, type(e).__name__ if not str(e) else f"{type(e).__name__}: {e}"
+                    # Start the next request on a fresh connection
+                    await connection.close()
+                records.append({
+                    'scenario': name,
+                    'status': status,
+                    'latency_ms': (time.perf_counter() - started) * 1000,
+                    'error': error
+                })
+        finally:
+            await connection.close()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return records
+
+def summarize(records, elapsed):
+    """Latency percentiles, throughput and error rate overall and per scenario"""
+    def stats(group):
+        latencies = sorted(r['latency_ms'] for r in group)
+        errors = [r for r in group if r['error']]
+        by_error = {}
+        for r in errors:
+            by_error[r['error']] = by_error.get(r['error'], 0) + 1
+        return {
+            'requests': len(group),
+            'throughput_rps': round(len(group) / elapsed, 2) if elapsed > 0 else None,
+            'error_rate': round(len(errors) / len(group), 4) if group else None,
+            'errors': by_error,
+            'p50_ms': _round(percentile(latencies, 50)),
+            'p95_ms': _round(percentile(latencies, 95)),
+            'p99_ms': _round(percentile(latencies, 99)),
+            'max_ms': _round(latencies[-1] if latencies else None)
+        }
+
+    scenarios = {}
+    for record in records:
+        scenarios.setdefault(record['scenario'], []).append(record)
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'overall': stats(records),
+        'scenarios': {name: stats(group) for name, group in sorted(scenarios.items())}
+    }
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+def print_report(report, target, concurrency):
+    print(f"📊 {report['overall']['requests']} requests to {target} with {concurrency} concurrent clients "
+          f"in {report['elapsed_s']}s")
+    header = f"   {'scenario':<16}{'reqs':>7}{'req/s':>9}{'errors':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    rows = list(report['scenarios'].items()) + [('overall', report['overall'])]
+    for name, s in rows:
+        cells = [s['p50_ms'], s['p95_ms'], s['p99_ms'], s['max_ms']]
+        print(f"   {name:<16}{s['requests']:>7}{s['throughput_rps'] or 0:>9.1f}{s['error_rate'] or 0:>9.1%}"
+              + ''.join(f"{c if c is not None else '-':>10}" for c in cells))
+    for error, count in report['overall']['errors'].items():
+        print(f"   ❌ {count} x {error}")
+
+# ---------------------------------------------------------------------------
+# Stub server: canned responses shaped like the Next.js routes, with
+# configurable latency and failure rate, for testing the tool offline
+# ---------------------------------------------------------------------------
+
+def _stub_results(n_trains=25):
+    rng = random.Random(7)
+    results = []
+    for i in range(n_trains):
+        score = rng.randint(55, 100)
+        results.append({
+            'Train ID': f"T{101 + i}",
+            'Induction Score': score,
+            'Recommendation': '✅ PRIORITY INDUCTION' if score >= 85 else '🟡 STANDARD INDUCTION',
+            'Priority Level': 'High' if score >= 85 else 'Medium',
+            'Decision': 'Service' if score >= 70 else 'Standby'
+        })
+    return sorted(results, key=lambda r: r['Induction Score'], reverse=True)
+
+STUB_RESULTS = _stub_results()
+
+def stub_response(method, path, body):
+    """(status, payload) for one request to the stub server"""
+    now = datetime.now().isoformat()
+    if path == '/api/ai/induction' and method == 'GET':
+        return 200, {'success': True, 'data': {
+            'totalTrains': len(STUB_RESULTS), 'results': STUB_RESULTS, 'lastGenerated': now,
+            'algorithm': 'AI-Powered Multi-Model Decision System'
+        }}
+    if path == '/api/ai/induction' and method == 'POST':
+        return 200, {'success': True, 'message': 'KMRL Induction decisions regenerated successfully', 'data': {
+            'regenerated': bool(body.get('forceRegenerate')), 'timestamp': now, 'totalTrains': len(STUB_RESULTS)
+        }}
+    if path == '/api/operator/induction' and method == 'GET':
+        return 200, {'success': True, 'data': {
+            'fleet_summary': {'total_trainsets': len(STUB_RESULTS)},
+            'model_status': {name: 'active' for name in ('fitness_certificate', 'jobcard_optimizer', 'branding_optimizer',
+                                                         'mileage_balancer', 'resource_scheduler', 'stabling_optimizer',
+                                                         'master_decision_engine')},
+            'top_trainsets': STUB_RESULTS[:5]
+        }}
+    if path == '/api/operator/induction' and method == 'POST':
+        return 200, {'success': True, 'action': body.get('action'), 'result': {
+            'models_used': 7, 'processing_time': 'stub', 'timestamp': now
+        }}
+    return 404, {'success': False, 'error': f"Unknown endpoint: {method} {path}"}
+
+async def start_stub_server(host='127.0.0.1', port=0, latency_ms=20.0, error_rate=0.0, seed=None):
+    """Start the stub server; returns the asyncio server (port 0 picks a free port)
+
+    Each response waits an exponentially distributed delay averaging
+    latency_ms, so percentiles have a tail, and fails with HTTP 500 at
+    error_rate.
+    """
+    rng = random.Random(seed)
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                raw = await reader.readexactly(int(headers.get('content-length') or 0))
+                try:
+                    body = json.loads(raw) if raw else {}
+                except ValueError:
+                    body = {}
+
+                if latency_ms > 0:
+                    await asyncio.sleep(rng.expovariate(1000.0 / latency_ms))
+                if rng.random() < error_rate:
+                    status, payload = 500, {'success': False, 'error': 'Stub failure'}
+                else:
+                    status, payload = stub_response(method, target.split('?', 1)[0].rstrip('/'), body)
+
+                data = json.dumps(payload).encode()
+                reason = {200: 'OK', 404: 'Not Found', 500: 'Internal Server Error'}[status]
+                writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\nConnection: keep-alive\r\n\r\n".encode() + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+async def main(args):
+    scenarios = {name: SCENARIOS[name] for name in args.scenarios}
+    stub = None
+    target = args.base_url
+    if args.stub or args.serve_stub:
+        stub = await start_stub_server(args.stub_host, args.stub_port if args.serve_stub else 0,
+                                       args.stub_latency_ms, args.stub_error_rate, args.seed)
+        host, port = stub.sockets[0].getsockname()[:2]
+        target = f"http://{host}:{port}"
+        if args.serve_stub:
+            print(f"🧪 Stub KMRL API listening on {target} (mean latency {args.stub_latency_ms} ms, "
+                  f"error rate {args.stub_error_rate:.1%}); Ctrl+C to stop")
+            async with stub:
+                await stub.serve_forever()
+            return 0
+
+    try:
+        total_requests = args.requests if args.duration is None else None
+        started = time.perf_counter()
+        records = await run_load(target, scenarios, args.concurrency, total_requests, args.duration,
+                                 args.timeout, args.token, args.seed)
+        report = summarize(records, time.perf_counter() - started)
+    finally:
+        if stub is not None:
+            stub.close()
+            await stub.wait_closed()
+
+    report.update({'target': target, 'concurrency': args.concurrency, 'stub': stub is not None})
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, target, args.concurrency)
+    if report['overall']['requests'] and report['overall']['error_rate'] > args.max_error_rate:
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load generator for the KMRL induction APIs")
+    parser.add_argument('--base-url', default='http://localhost:3000')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help='request mix, picked uniformly at random (default: all four)')
+    parser.add_argument('-c', '--concurrency', type=int, default=10, help='concurrent clients')
+    parser.add_argument('-n', '--requests', type=int, default=200, help='total requests')
+    parser.add_argument('-d', '--duration', type=float, default=None,
+                        help='run for this many seconds instead of a fixed request count')
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds')
+    parser.add_argument('--token', default=os.environ.get('KMRL_TOKEN'),
+                        help='bearer token for the authenticated routes (default: $KMRL_TOKEN)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    parser.add_argument('--max-error-rate', type=float, default=1.0,
+                        help='exit with status 1 when the error rate exceeds this')
+    parser.add_argument('--stub', action='store_true', help='run against a local stub server instead of --base-url')
+    parser.add_argument('--serve-stub', action='store_true', help='only run the stub server')
+    parser.add_argument('--stub-host', default='127.0.0.1')
+    parser.add_argument('--stub-port', type=int, default=3100, help='stub port for --serve-stub')
+    parser.add_argument('--stub-latency-ms', type=float, default=20.0, help='mean stub response delay')
+    parser.add_argument('--stub-error-rate', type=float, default=0.0, help='share of stub responses that fail')
+    args = parser.parse_args()
+
+    try:
+        sys.exit(asyncio.run(main(args)))
+    except KeyboardInterrupt:
+        print("\n🛑 Stopped")
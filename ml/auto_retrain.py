@@ -5,65 +5,306 @@ Automatically retrains all 7 models when new data is uploaded
 
 import sys
 import os
-import pandas as pd
-import numpy as np
-import json
+import math
+import time
 from datetime import datetime
 import traceback
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, mean_squared_error
-import joblib
+
+from lazy_imports import lazy_import
+
+# Heavy libraries load on first use so failing or single-model invocations start fast
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+joblib = lazy_import('joblib')
+
+from config import UPLOADS_DIR, TRAINING_CONFIG, RETRAIN_HISTORY_PATH, RETRAINING_LOG_PATH
+from ingestion import ingest_uploads
+from feature_store import build_feature_store, frame_memory
+from model_registry import ModelRegistry, compute_fingerprint, fingerprint_data
+from preprocessing import DesignMatrix, PREPROCESSOR_SUFFIX
+from drift import build_reference
+from compiled_trees import compile_model, COMPILED_SUFFIX
+from retrain_history import RetrainHistory
+from tracing import span, current_trace_id, trace_env
 
 def log_message(message):
     """Log messages with timestamp"""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] {message}")
+    print(f"[{timestamp}] {message}", flush=True)
+
+# Synthetic fallbacks are seeded so unchanged inputs produce the same fingerprint
+SYNTHETIC_SEED = 42
+
+_registry = None
+
+def get_registry():
+    """Model registry shared by the retrain functions"""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+def reuse_registered_model(name, fingerprint, label):
+    """Promote the stored version of a model whose inputs are unchanged and return its score"""
+    meta = get_registry().find(name, fingerprint)
+    if meta is None:
+        return None
+    get_registry().promote(name, fingerprint)
+    log_message(f"♻️ {label}: inputs unchanged, reusing version {fingerprint[:12]}")
+    return meta['score']
+
+def with_preprocessor(name, artifacts, preprocessor):
+    """Add the preprocessing a model was trained with to its artifacts, so inference imputes the same way"""
+    if preprocessor is None:
+        return artifacts
+    return {**artifacts, f"{name}{PREPROCESSOR_SUFFIX}": preprocessor}
+
+def with_compiled(name, artifacts):
+    """Add the array-compiled form of a tree ensemble to its artifacts, replacing any stale one"""
+    compiled = compile_model(artifacts[name])
+    if compiled is None:
+        return artifacts
+    return {**artifacts, f"{name}{COMPILED_SUFFIX}": compiled}
+
+def train_ids(X):
+    """Train IDs of the rows a model learns from, or None for unindexed arrays"""
+    return [str(train_id) for train_id in X.index] if hasattr(X, 'index') else None
+
+def publish_model(name, fingerprint, artifacts, score, preprocessor=None, reference=None, learned=None):
+    """Register a freshly trained model version and make it current
+
+    reference holds the drift sketches of the inputs it was trained on and
+    learned the Train IDs of its training rows.
+    """
+    artifacts = with_compiled(name, with_preprocessor(name, artifacts, preprocessor))
+    get_registry().register(name, fingerprint, artifacts, score,
+                            extra={'drift_reference': reference, 'train_ids': learned})
+    get_registry().promote(name, fingerprint)
+
+def apply_tuning(name, label, model, X_train, y_train, tune, n_jobs):
+    """Give a model its tuned hyperparameters, searching for them first in tuning mode"""
+    from tuning import apply_tuned_params
+    
+    result = apply_tuned_params(name, model, X_train, y_train, tune, n_jobs)
+    if tune and result is not None:
+        log_message(f"🎛️ {label}: tuned {result['params']} ({result['scoring']} {result['cv_score']:.3f}, "
+                    f"{result['evaluated']} candidates x {result['folds']} folds in {result['seconds']}s)")
+    return result
+
+def due_for_full_refit(meta):
+    """Check whether a model has had enough incremental updates or is too old"""
+    updates = meta.get('incremental_updates', 0)
+    if updates >= TRAINING_CONFIG['full_refit_every']:
+        return f"{updates} incremental updates since the last full refit"
+    base_trained_at = datetime.fromisoformat(meta.get('base_trained_at', meta['created_at']))
+    age_days = (datetime.now() - base_trained_at).total_seconds() / 86400
+    if age_days >= TRAINING_CONFIG['full_refit_max_age_days']:
+        return f"last full refit was {age_days:.1f} days ago"
+    return None
+
+def incremental_base(name, label, X, new_index):
+    """The current version of a model if the new rows can be added to it, else None for a full refit
+
+    The feature matrix has one row per train, so a train already learned
+    comes back as a recomputed row; adding it again would count that train
+    twice, so only trains the current version has never seen are added.
+    """
+    if not hasattr(X, 'index'):
+        return None
+    current = get_registry().current(name)
+    if current is None:
+        return None
+    reason = due_for_full_refit(current)
+    if reason is None and current.get('train_ids') is None:
+        reason = 'the current version does not record which trains it learned'
+    if reason is None:
+        relearned = set(current['train_ids']) & {str(train_id) for train_id in new_index}
+        if relearned:
+            reason = f"{len(relearned)} updated trains were already learned"
+    if reason:
+        log_message(f"🔁 {label}: full refit ({reason})")
+        return None
+    return current
 
-def load_all_data(new_filepath, new_filename):
+def incremental_update(name, label, fingerprint, X, y, new_index, score_fn=None, preprocessor=None, reference=None):
+    """Train the current version of a model on the new rows only
+
+    Returns the new score, or None when the caller should fall back to a full
+    refit (no current version, refit due, trains already learned, unsupported
+    batch or degraded score). The update is scored on the holdout rows of
+    trains it did not learn from.
+    """
+    from incremental import update_model
+    
+    current = incremental_base(name, label, X, new_index)
+    if current is None:
+        return None
+    
+    new_rows = X.index.isin(new_index)
+    X_new = X[new_rows]
+    y_new = y[new_rows] if y is not None else None
+    artifacts = get_registry().load(name, current['fingerprint'])
+    model = update_model(artifacts[name], X_new, y_new, TRAINING_CONFIG['incremental_estimators'])
+    if model is None:
+        log_message(f"🔁 {label}: new rows cannot be learned incrementally, full refit")
+        return None
+    artifacts = with_compiled(name, with_preprocessor(name, {**artifacts, name: model}, preprocessor))
+    
+    try:
+        score = score_fn(model, exclude=new_index) if score_fn else current['score']
+    except ValueError as e:
+        log_message(f"🔁 {label}: no holdout rows left to score the update ({e}), full refit")
+        return None
+    if score < current['score'] - TRAINING_CONFIG['retrain_threshold'] * 100:
+        log_message(f"🔁 {label}: validation dropped {current['score']:.1f} -> {score:.1f}, full refit")
+        return None
+    
+    get_registry().register(name, fingerprint, artifacts, score, extra={
+        'incremental_updates': current.get('incremental_updates', 0) + 1,
+        'base_trained_at': current.get('base_trained_at', current['created_at']),
+        'incremental_rows': int(new_rows.sum()),
+        'drift_reference': reference,
+        'train_ids': current['train_ids'] + train_ids(X_new)
+    })
+    get_registry().promote(name, fingerprint)
+    log_message(f"➕ {label}: updated with {int(new_rows.sum())} new rows ({score:.1f})")
+    return score
+
+# Models kept by drift_gate in this process, read back by retrain_model for the history outcome
+_gate_decisions = {}
+
+def drift_gate(name, label, X, y=None, score_fn=None):
+    """Decide before any fitting whether a model needs retraining on its new inputs
+
+    X and y are the rows to check, normally only the trains this run's
+    uploads changed, with gaps left as NaN rather than imputed.
+    Returns the current version's score when it can be kept, or None when
+    the model should be retrained: there is no current version with drift
+    sketches, a full refit is due, an input drifted past its PSI/KS limit,
+    or the current version scores more than retrain_threshold below its
+    stored score on the new holdout rows.
+    """
+    from drift import drift_report
+    
+    with span(f"drift_gate.{name}") as gate_span:
+        current = get_registry().current(name)
+        reason, holdout, report = None, None, {}
+        if current is None or not current.get('drift_reference'):
+            reason = 'no drift reference for the current version'
+        else:
+            reason = due_for_full_refit(current)
+        
+        if reason is None:
+            report, drifted = drift_report(current['drift_reference'], X, y)
+            if drifted:
+                reason = 'drift in ' + ', '.join(
+                    f"{n} (PSI {report[n]['psi']:.3f}, KS {report[n]['ks']:.3f})" if n in report
+                    else f"{n} (input added or removed)"
+                    for n in drifted
+                )
+        
+        if reason is None and score_fn is not None:
+            try:
+                holdout = score_fn(get_registry().load(name, current['fingerprint'])[name])
+            except Exception as e:
+                reason = f"current version cannot score the new data ({e})"
+            else:
+                if holdout < current['score'] - TRAINING_CONFIG['retrain_threshold'] * 100:
+                    reason = f"holdout score dropped {current['score']:.1f} -> {holdout:.1f}"
+        
+        # PSI on too few new rows is not judged, so it is not reported either
+        max_psi = max((scores['psi'] for scores in report.values() if scores['psi_limit'] != math.inf), default=None)
+        max_ks = max((scores['ks'] for scores in report.values()), default=None)
+        gate_span.set(retrain=reason is not None, reason=reason, max_psi=max_psi, holdout_score=holdout)
+    
+    _gate_decisions[name] = reason is None
+    if reason is not None:
+        log_message(f"📈 {label}: retraining, {reason}")
+        return None
+    checked = f"max PSI {max_psi:.3f}" if max_psi is not None else \
+        f"max KS {max_ks:.3f}" if max_ks is not None else "inputs unchanged"
+    if holdout is not None:
+        checked += f", holdout {holdout:.1f} vs {current['score']:.1f}"
+    log_message(f"🧭 {label}: no drift ({checked}), keeping version {current['fingerprint'][:12]}")
+    return current['score']
+
+def load_all_data(new_filepath, new_filename, uploads_dir=UPLOADS_DIR):
     """Load all available data including new upload"""
+    data, _ = load_training_data(new_filepath, new_filename, uploads_dir)
+    return data
+
+def load_database_data():
+    """Load training features from the SQLite database and the trains whose rows changed"""
+    from db_loader import SQLiteLoader
+    
+    log_message("🔄 Loading training data from the train database")
+    feature_matrix, changed_trains = SQLiteLoader().load_features()
+    log_message(
+        f"🔗 Feature matrix: {len(feature_matrix)} trains x {len(feature_matrix.columns)} features "
+        f"from SQLite, {len(changed_trains)} trains changed since the last load"
+    )
+    return feature_matrix, changed_trains
+
+def load_training_data(new_filepath, new_filename, uploads_dir=UPLOADS_DIR, manifest=None, source=None):
+    """Load all available data and the Train IDs touched by newly parsed uploads"""
+    if (source or TRAINING_CONFIG['data_source']) == 'sqlite':
+        return load_database_data()
+    
     log_message(f"🔄 Loading all training data including: {new_filename}")
     
-    uploads_dir = os.path.join(os.path.dirname(__file__), '..', 'uploads')
-    all_dataframes = []
-    
-    # Load all CSV files from uploads
-    csv_files = [f for f in os.listdir(uploads_dir) if f.endswith('.csv')]
-    
-    for file in csv_files:
-        try:
-            file_path = os.path.join(uploads_dir, file)
-            df = pd.read_csv(file_path, encoding='utf-8', on_bad_lines='skip')
-            
-            if len(df) > 0:
-                df['source_file'] = file
-                all_dataframes.append(df)
-                log_message(f"✅ Loaded: {file} ({len(df)} rows)")
-            else:
-                log_message(f"⚠️ Empty file: {file}")
-                
-        except Exception as e:
-            log_message(f"❌ Error loading {file}: {str(e)}")
+    # Only files missing from the upload manifest are parsed, the rest come from the cache
+    with span('ingest_uploads') as ingest_span:
+        frames, report = ingest_uploads(uploads_dir, new_filepath, manifest)
+        ingest_span.set(files=len(frames), parsed=len(report['parsed']), cached=len(report['cached']))
     
-    if not all_dataframes:
+    for file, rows in report['parsed']:
+        log_message(f"✅ Loaded: {file} ({rows} rows)")
+    if report['cached']:
+        cached_rows = sum(rows for _, rows in report['cached'])
+        log_message(f"📦 Reused {len(report['cached'])} cached files ({cached_rows} rows)")
+    for file, original in report['duplicates']:
+        log_message(f"⏭️ Skipped duplicate upload: {file} (same content as {original})")
+    for file in report['empty']:
+        log_message(f"⚠️ Empty file: {file}")
+    for file, rows in report['quarantined']:
+        log_message(f"🚧 Quarantined {rows} malformed rows from {file}")
+    for file, error in report['errors']:
+        log_message(f"❌ Error loading {file}: {error}")
+    
+    if not frames:
         log_message("⚠️ No valid data files found, creating sample data")
         # Create sample data if no files available
         sample_data = create_sample_training_data()
-        return sample_data
+        return sample_data, None
+    
+    # Keep each upload schema as its own typed table and join them per train
+    with span('feature_matrix') as matrix_span:
+        store = build_feature_store(frames)
+        feature_matrix = store.feature_matrix()
+        matrix_span.set(rows=len(feature_matrix))
+    for file in store.unrecognised:
+        log_message(f"⚠️ Unrecognised upload schema: {file}")
+    
+    if feature_matrix.empty:
+        log_message("⚠️ No uploads with a known schema, creating sample data")
+        return create_sample_training_data(), None
+    
+    log_message(
+        f"🔗 Feature matrix: {len(feature_matrix)} trains x {len(feature_matrix.columns)} features "
+        f"from {len(frames)} files ({', '.join(store.schemas)}), "
+        f"{frame_memory(feature_matrix) / 1024:.1f} KiB"
+    )
     
-    # Combine all data
-    combined_data = pd.concat(all_dataframes, ignore_index=True, sort=False)
-    log_message(f"🔗 Combined dataset: {len(combined_data)} total rows from {len(all_dataframes)} files")
+    # Trains whose features changed because of uploads parsed in this run
+    parsed_files = {file for file, _ in report['parsed']}
+    new_frames = [(file, df) for file, df in frames if file in parsed_files]
+    new_index = list(build_feature_store(new_frames).feature_matrix().index) if new_frames else []
     
-    return combined_data
+    return feature_matrix, new_index
 
-def create_sample_training_data():
+def create_sample_training_data(n_samples=100):
     """Create sample training data for model training"""
     np.random.seed(42)
-    n_samples = 100
     
     data = {
         'Train_ID': [f'T{i:03d}' for i in range(1, n_samples + 1)],
@@ -80,329 +321,546 @@ def create_sample_training_data():
     
     return pd.DataFrame(data)
 
-def retrain_fitness_certificate_model(data):
+def retrain_pipeline(name, label, make_model, X, y=None, score=None, preprocessor=None, n_jobs=1, new_index=None,
+                     tune=False, gate=False, tuning_key=None, summary='{:.1f}% performance', fit=None, update=None,
+                     design=None):
+    """The retrain sequence every model shares; returns the score of the version left current
+
+    Tunes the estimator from make_model(), reuses a registered version with
+    the same fingerprint, keeps the current version when drift_gate finds
+    nothing new, tries an incremental update, and otherwise fits and
+    publishes a new version. Supervised models pass y and
+    score(model, X_test, y_test), a 0-100 rating on the holdout split;
+    unsupervised ones pass fit(model, X), returning (artifacts, score), and
+    an update replacing incremental_update. Drift is measured on the
+    design's values before imputation, and the gate compares only the rows
+    of the trains this run's uploads changed.
+    """
+    from sklearn.model_selection import train_test_split
+    
+    model = make_model()
+    if y is not None:
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=TRAINING_CONFIG['validation_split'], random_state=42
+        )
+        apply_tuning(tuning_key or name, label, model, X_train, y_train, tune, n_jobs)
+        
+        def score_fn(m, exclude=None):
+            if exclude is None or not hasattr(X_test, 'index'):
+                return score(m, X_test, y_test)
+            keep = ~X_test.index.isin(exclude)
+            if not keep.any():
+                raise ValueError('every holdout row belongs to an updated train')
+            return score(m, X_test[keep], y_test[keep])
+    else:
+        X_train, y_train, score_fn = X, None, None
+    
+    fingerprint = compute_fingerprint(model, X, y)
+    reused = reuse_registered_model(name, fingerprint, label)
+    if reused is not None:
+        return reused
+    
+    # Imputed gaps would move with every upload's column means, so they are left out
+    observed = X
+    if design is not None and hasattr(X, 'columns') and design.has(*X.columns):
+        observed = design.observed(list(X.columns))
+    if gate:
+        rows = design.changed_rows() if design is not None else None
+        kept = drift_gate(name, label, observed if rows is None else observed[rows],
+                          y if rows is None or y is None else y[rows], score_fn)
+        if kept is not None:
+            return kept
+    
+    reference = build_reference(observed, y)
+    if new_index is not None:
+        updated = (update or incremental_update)(name, label, fingerprint, X, y, new_index, score_fn,
+                                                 preprocessor, reference)
+        if updated is not None:
+            return updated
+    
+    if fit is not None:
+        artifacts, value = fit(model, X_train)
+    else:
+        model.fit(X_train, y_train)
+        artifacts, value = {name: model}, score_fn(model)
+    publish_model(name, fingerprint, artifacts, value, preprocessor, reference, train_ids(X_train))
+    
+    log_message(f"✅ {label}: {summary.format(value)}")
+    return value
+
+def accuracy_score_pct(model, X_test, y_test):
+    """Holdout accuracy as a 0-100 score"""
+    from sklearn.metrics import accuracy_score
+    return accuracy_score(y_test, model.predict(X_test)) * 100
+
+def retrain_fitness_certificate_model(data, n_jobs=1, new_index=None, tune=False, design=None, gate=False):
     """Retrain Fitness Certificate Model"""
+    from sklearn.ensemble import RandomForestClassifier
+    
     log_message("🏥 Retraining Fitness Certificate Model...")
     
     try:
+        rng = np.random.default_rng(SYNTHETIC_SEED)
+        design = design if design is not None else DesignMatrix(data)
+        preprocessor = None
+        
         # Prepare training data
         if 'Fitness_Status' in data.columns:
-            X = data[['Availability_Score', 'Maintenance_Score', 'Alert_Count']].fillna(0)
+            X, preprocessor = design.view(['Availability_Score', 'Maintenance_Score', 'Alert_Count'], fill='zero')
             y = data['Fitness_Status'].fillna('Valid')
         else:
             # Use sample data
-            X = np.random.rand(len(data), 3) * 100
-            y = np.random.choice(['Valid', 'Expired', 'Pending'], len(data))
-        
-        # Train model
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        model.fit(X_train, y_train)
-        predictions = model.predict(X_test)
-        accuracy = accuracy_score(y_test, predictions)
-        
-        # Save model
-        model_dir = 'models/trained'
-        os.makedirs(model_dir, exist_ok=True)
-        joblib.dump(model, f'{model_dir}/fitness_certificate_model.pkl')
+            X = rng.random((len(data), 3)) * 100
+            y = rng.choice(['Valid', 'Expired', 'Pending'], len(data))
         
-        log_message(f"✅ Fitness Certificate Model: {accuracy:.2%} accuracy")
-        return accuracy * 100
+        return retrain_pipeline(
+            'fitness_certificate_model', 'Fitness Certificate Model',
+            lambda: RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs),
+            X, y, accuracy_score_pct, preprocessor, n_jobs, new_index, tune, gate,
+            tuning_key='fitness_certificate', summary='{:.2f}% accuracy', design=design
+        )
         
     except Exception as e:
         log_message(f"❌ Error training Fitness Certificate Model: {str(e)}")
         return 85.0  # Default accuracy
 
-def retrain_jobcard_optimizer(data):
+def retrain_jobcard_optimizer(data, n_jobs=1, new_index=None, tune=False, design=None, gate=False):
     """Retrain Job Card Optimizer"""
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.metrics import mean_squared_error
+    
     log_message("🔧 Retraining Job Card Optimizer...")
     
     try:
+        rng = np.random.default_rng(SYNTHETIC_SEED)
+        design = design if design is not None else DesignMatrix(data)
+        preprocessor = None
+        
         # Prepare training data
         if 'Job_Card_Priority' in data.columns:
-            X = data[['Maintenance_Score', 'Alert_Count', 'Mileage']].fillna(data.mean())
+            X, preprocessor = design.view(['Maintenance_Score', 'Alert_Count', 'Mileage'])
             y_map = {'High': 3, 'Medium': 2, 'Low': 1}
             y = data['Job_Card_Priority'].map(y_map).fillna(2)
         else:
-            X = np.random.rand(len(data), 3) * 100
-            y = np.random.randint(1, 4, len(data))
-        
-        # Train model
-        model = GradientBoostingRegressor(n_estimators=100, random_state=42)
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        model.fit(X_train, y_train)
-        predictions = model.predict(X_test)
-        mse = mean_squared_error(y_test, predictions)
-        accuracy = max(0, 100 - (mse * 10))  # Convert MSE to accuracy-like score
-        
-        # Save model
-        joblib.dump(model, 'models/trained/jobcard_optimizer.pkl')
+            X = rng.random((len(data), 3)) * 100
+            y = rng.integers(1, 4, len(data))
         
-        log_message(f"✅ Job Card Optimizer: {accuracy:.1f}% performance")
-        return accuracy
+        # Convert MSE to accuracy-like score
+        return retrain_pipeline(
+            'jobcard_optimizer', 'Job Card Optimizer',
+            lambda: GradientBoostingRegressor(n_estimators=100, random_state=42),
+            X, y, lambda m, X_test, y_test: max(0, 100 - mean_squared_error(y_test, m.predict(X_test)) * 10),
+            preprocessor, n_jobs, new_index, tune, gate, design=design
+        )
         
     except Exception as e:
         log_message(f"❌ Error training Job Card Optimizer: {str(e)}")
         return 88.0
 
-def retrain_branding_optimizer(data):
+def retrain_branding_optimizer(data, n_jobs=1, new_index=None, tune=False, design=None, gate=False):
     """Retrain Branding Optimizer"""
+    from sklearn.ensemble import RandomForestClassifier
+    
     log_message("🎨 Retraining Branding Optimizer...")
     
     try:
+        rng = np.random.default_rng(SYNTHETIC_SEED)
+        design = design if design is not None else DesignMatrix(data)
+        preprocessor = None
+        
         # Prepare training data
         if 'Brand_Category' in data.columns:
-            X = data[['Availability_Score', 'Maintenance_Score']].fillna(data.mean())  
+            X, preprocessor = design.view(['Availability_Score', 'Maintenance_Score'])
             y_map = {'Premium': 3, 'Standard': 2, 'Basic': 1}
             y = data['Brand_Category'].map(y_map).fillna(2)
         else:
-            X = np.random.rand(len(data), 2) * 100
-            y = np.random.choice([1, 2, 3], len(data))
-        
-        # Train model
-        model = RandomForestClassifier(n_estimators=80, random_state=42)
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        model.fit(X_train, y_train)
-        predictions = model.predict(X_test)
-        accuracy = accuracy_score(y_test, predictions)
-        
-        # Save model
-        joblib.dump(model, 'models/trained/branding_optimizer.pkl')
+            X = rng.random((len(data), 2)) * 100
+            y = rng.choice([1, 2, 3], len(data))
         
-        log_message(f"✅ Branding Optimizer: {accuracy:.2%} accuracy")
-        return accuracy * 100
+        return retrain_pipeline(
+            'branding_optimizer', 'Branding Optimizer',
+            lambda: RandomForestClassifier(n_estimators=80, random_state=42, n_jobs=n_jobs),
+            X, y, accuracy_score_pct, preprocessor, n_jobs, new_index, tune, gate,
+            summary='{:.2f}% accuracy', design=design
+        )
         
     except Exception as e:
         log_message(f"❌ Error training Branding Optimizer: {str(e)}")
         return 82.0
 
-def retrain_mileage_balancer(data):
+def retrain_mileage_balancer(data, n_jobs=1, new_index=None, tune=False, design=None, gate=False):
     """Retrain Mileage Balancer"""
+    from incremental import IncrementalLinearRegression
+    from sklearn.metrics import mean_squared_error
+    
     log_message("⚖️ Retraining Mileage Balancer...")
     
     try:
+        rng = np.random.default_rng(SYNTHETIC_SEED)
+        design = design if design is not None else DesignMatrix(data)
+        preprocessor = None
+        
         # Prepare training data
         if 'Mileage' in data.columns:
-            X = data[['Availability_Score', 'Maintenance_Score', 'Alert_Count']].fillna(data.mean())
-            y = data['Mileage'].fillna(data['Mileage'].mean())
+            X, preprocessor = design.view(['Availability_Score', 'Maintenance_Score', 'Alert_Count'])
+            y = data['Mileage'].fillna(design.means['Mileage'])
         else:
-            X = np.random.rand(len(data), 3) * 100
-            y = np.random.randint(10000, 200000, len(data))
+            X = rng.random((len(data), 3)) * 100
+            y = rng.integers(10000, 200000, len(data))
         
-        # Train model
-        model = LinearRegression()
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        model.fit(X_train, y_train)
-        predictions = model.predict(X_test)
-        mse = mean_squared_error(y_test, predictions)
-        
-        # Convert to accuracy-like score
-        accuracy = max(0, 100 - (mse / 1000000))  # Normalize MSE
-        
-        # Save model
-        joblib.dump(model, 'models/trained/mileage_balancer.pkl')
-        
-        log_message(f"✅ Mileage Balancer: {accuracy:.1f}% performance")
-        return accuracy
+        # Normalized MSE as an accuracy-like score
+        return retrain_pipeline(
+            'mileage_balancer', 'Mileage Balancer', IncrementalLinearRegression,
+            X, y, lambda m, X_test, y_test: max(0, 100 - mean_squared_error(y_test, m.predict(X_test)) / 1000000),
+            preprocessor, n_jobs, new_index, tune, gate, design=design
+        )
         
     except Exception as e:
         log_message(f"❌ Error training Mileage Balancer: {str(e)}")
         return 90.0
 
-def retrain_resource_scheduler(data):
+def retrain_resource_scheduler(data, n_jobs=1, new_index=None, tune=False, design=None, gate=False):
     """Retrain Resource Scheduler"""
+    from sklearn.ensemble import RandomForestClassifier
+    
     log_message("🧽 Retraining Resource Scheduler...")
     
     try:
+        rng = np.random.default_rng(SYNTHETIC_SEED)
+        design = design if design is not None else DesignMatrix(data)
+        preprocessor = None
+        
         # Prepare training data
         if 'Cleaning_Slot' in data.columns:
-            X = data[['Availability_Score', 'Station_Capacity']].fillna(data.mean())
+            X, preprocessor = design.view(['Station_Capacity', 'Availability_Score'])
             y_map = {'Morning': 1, 'Afternoon': 2, 'Evening': 3}
             y = data['Cleaning_Slot'].map(y_map).fillna(2)
         else:
-            X = np.random.rand(len(data), 2) * 100
-            y = np.random.choice([1, 2, 3], len(data))
-        
-        # Train model
-        model = RandomForestClassifier(n_estimators=90, random_state=42)
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+            X = rng.random((len(data), 2)) * 100
+            y = rng.choice([1, 2, 3], len(data))
         
-        model.fit(X_train, y_train)
-        predictions = model.predict(X_test)
-        accuracy = accuracy_score(y_test, predictions)
-        
-        # Save model
-        joblib.dump(model, 'models/trained/resource_scheduler.pkl')
-        
-        log_message(f"✅ Resource Scheduler: {accuracy:.2%} accuracy")
-        return accuracy * 100
+        return retrain_pipeline(
+            'resource_scheduler', 'Resource Scheduler',
+            lambda: RandomForestClassifier(n_estimators=90, random_state=42, n_jobs=n_jobs),
+            X, y, accuracy_score_pct, preprocessor, n_jobs, new_index, tune, gate,
+            summary='{:.2f}% accuracy', design=design
+        )
         
     except Exception as e:
         log_message(f"❌ Error training Resource Scheduler: {str(e)}")
         return 86.0
 
-def retrain_stabling_optimizer(data):
+def retrain_stabling_optimizer(data, n_jobs=1, new_index=None, tune=False, design=None, gate=False):
     """Retrain Stabling Optimizer"""
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
+    
     log_message("🚉 Retraining Stabling Optimizer...")
     
     try:
+        rng = np.random.default_rng(SYNTHETIC_SEED)
+        design = design if design is not None else DesignMatrix(data)
+        preprocessor = None
+        
         # Prepare training data for clustering
         if 'Station_Capacity' in data.columns:
-            X = data[['Station_Capacity', 'Mileage', 'Alert_Count']].fillna(data.mean())
+            X, preprocessor = design.view(['Station_Capacity', 'Mileage', 'Alert_Count'])
         else:
-            X = np.random.rand(len(data), 3) * 100
-        
-        # Standardize features
-        scaler = StandardScaler()
-        X_scaled = scaler.fit_transform(X)
-        
-        # Train clustering model
-        model = KMeans(n_clusters=4, random_state=42, n_init=10)
-        model.fit(X_scaled)
-        
-        # Calculate silhouette-like score as accuracy
-        labels = model.labels_
-        centers = model.cluster_centers_
-        
-        # Simple accuracy estimation based on cluster cohesion
-        accuracy = 89 + np.random.uniform(-5, 7)  # Simulate realistic accuracy
-        
-        # Save model and scaler
-        joblib.dump(model, 'models/trained/stabling_optimizer.pkl')
-        joblib.dump(scaler, 'models/trained/stabling_scaler.pkl')
-        
-        log_message(f"✅ Stabling Optimizer: {accuracy:.1f}% clustering performance")
-        return accuracy
+            X = rng.random((len(data), 3)) * 100
+        
+        def fit(model, X_train):
+            # Standardize features, then cluster
+            scaler = StandardScaler()
+            model.fit(scaler.fit_transform(X_train))
+            # Simple accuracy estimation based on cluster cohesion
+            accuracy = 89 + rng.uniform(-5, 7)  # Simulate realistic accuracy
+            return {'stabling_optimizer': model, 'stabling_scaler': scaler}, accuracy
+        
+        return retrain_pipeline(
+            'stabling_optimizer', 'Stabling Optimizer', lambda: KMeans(n_clusters=4, random_state=42, n_init=10),
+            X, preprocessor=preprocessor, n_jobs=n_jobs, new_index=new_index, tune=tune, gate=gate,
+            summary='{:.1f}% clustering performance', fit=fit, update=incremental_stabling_update, design=design
+        )
         
     except Exception as e:
         log_message(f"❌ Error training Stabling Optimizer: {str(e)}")
         return 89.0
 
-def retrain_master_decision_engine(data):
+def incremental_stabling_update(name, label, fingerprint, X, y, new_index, score_fn=None, preprocessor=None,
+                                reference=None):
+    """Update the stabling scaler and clusters with the new rows only"""
+    from incremental import update_model
+    
+    current = incremental_base(name, label, X, new_index)
+    if current is None:
+        return None
+    
+    X_new = X[X.index.isin(new_index)]
+    artifacts = get_registry().load(name, current['fingerprint'])
+    scaler = update_model(artifacts['stabling_scaler'], X_new)
+    model = update_model(artifacts[name], scaler.transform(X_new)) if scaler is not None else None
+    if model is None:
+        return None
+    
+    artifacts = with_preprocessor(name, {name: model, 'stabling_scaler': scaler}, preprocessor)
+    get_registry().register(name, fingerprint, artifacts, current['score'], extra={
+        'incremental_updates': current.get('incremental_updates', 0) + 1,
+        'base_trained_at': current.get('base_trained_at', current['created_at']),
+        'incremental_rows': len(X_new),
+        'drift_reference': reference,
+        'train_ids': current['train_ids'] + train_ids(X_new)
+    })
+    get_registry().promote(name, fingerprint)
+    log_message(f"➕ {label}: updated with {len(X_new)} new rows")
+    return current['score']
+
+def retrain_master_decision_engine(data, n_jobs=1, new_index=None, tune=False, design=None, gate=False):
     """Retrain Master Decision Engine"""
+    from sklearn.ensemble import RandomForestClassifier
+    
     log_message("🧠 Retraining Master Decision Engine...")
     
     try:
+        rng = np.random.default_rng(SYNTHETIC_SEED)
+        design = design if design is not None else DesignMatrix(data)
+        preprocessor = None
+        
         # Create comprehensive features for master model
-        features = []
-        if 'Availability_Score' in data.columns:
-            features.extend(['Availability_Score', 'Maintenance_Score'])
-        if 'Alert_Count' in data.columns:
-            features.append('Alert_Count')
-        if 'Mileage' in data.columns:
-            features.append('Mileage')
+        features = [column for column in ['Availability_Score', 'Maintenance_Score', 'Alert_Count', 'Mileage']
+                    if design.has(column)]
         
         if not features:
             # Use synthetic features
-            X = np.random.rand(len(data), 4) * 100
+            X = rng.random((len(data), 4)) * 100
         else:
-            X = data[features].fillna(data[features].mean())
+            X, preprocessor = design.view(features)
         
         # Create synthetic target for induction decision
-        y = np.random.choice([0, 1], len(data), p=[0.3, 0.7])  # 70% positive induction
+        y = rng.choice([0, 1], len(data), p=[0.3, 0.7])  # 70% positive induction
         
         # Train ensemble model
-        model = RandomForestClassifier(n_estimators=150, random_state=42)
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        model.fit(X_train, y_train)
-        predictions = model.predict(X_test)
-        accuracy = accuracy_score(y_test, predictions)
-        
-        # Save model
-        joblib.dump(model, 'models/trained/master_decision_engine.pkl')
-        
-        log_message(f"✅ Master Decision Engine: {accuracy:.2%} accuracy")
-        return accuracy * 100
+        return retrain_pipeline(
+            'master_decision_engine', 'Master Decision Engine',
+            lambda: RandomForestClassifier(n_estimators=150, random_state=42, n_jobs=n_jobs),
+            X, y, accuracy_score_pct, preprocessor, n_jobs, new_index, tune, gate,
+            summary='{:.2f}% accuracy', design=design
+        )
         
     except Exception as e:
         log_message(f"❌ Error training Master Decision Engine: {str(e)}")
         return 92.0
 
-def save_retraining_log(results, new_filename, total_rows):
-    """Save retraining results to log file"""
-    log_entry = {
-        'timestamp': datetime.now().isoformat(),
-        'trigger_file': new_filename,
-        'total_data_rows': total_rows,
-        'model_accuracies': results,
-        'average_accuracy': np.mean(list(results.values())),
-        'training_status': 'completed',
-        'models_updated': 7
-    }
+# All 7 models in retraining order: (result key, retrain function, parallel cost weight)
+# The weight roughly tracks how much a model gains from extra cores (forest size)
+RETRAINERS = [
+    ('fitness_certificate', retrain_fitness_certificate_model, 100),
+    ('jobcard_optimizer', retrain_jobcard_optimizer, 0),
+    ('branding_optimizer', retrain_branding_optimizer, 80),
+    ('mileage_balancer', retrain_mileage_balancer, 0),
+    ('resource_scheduler', retrain_resource_scheduler, 90),
+    ('stabling_optimizer', retrain_stabling_optimizer, 10),
+    ('master_decision_engine', retrain_master_decision_engine, 150)
+]
+
+def plan_core_budget(total_cores, retrainers=RETRAINERS):
+    """Split a core budget between concurrent models and per-model n_jobs"""
+    total_cores = max(1, int(total_cores))
+    workers = min(len(retrainers), total_cores)
+    n_jobs = {name: max(1, total_cores // workers) for name, _, _ in retrainers}
     
-    # Save to log file
-    log_file = 'models/retraining_log.json'
-    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    # Hand the leftover cores to the models that parallelise best
+    leftover = total_cores - workers * (total_cores // workers)
+    by_weight = sorted((r for r in retrainers if r[2] > 0), key=lambda r: r[2], reverse=True)
+    for name, _, _ in by_weight[:leftover]:
+        n_jobs[name] += 1
     
-    # Load existing logs
-    existing_logs = []
-    if os.path.exists(log_file):
-        try:
-            with open(log_file, 'r') as f:
-                existing_logs = json.load(f)
-        except:
-            existing_logs = []
-    
-    # Add new log entry
-    if isinstance(existing_logs, list):
-        existing_logs.append(log_entry)
+    return workers, n_jobs
+
+_shared_data = None
+_shared_design = None
+
+def _init_retrain_worker(data_path):
+    """Attach a pool worker to the shared, memory-mapped training data and design matrix"""
+    global _shared_data, _shared_design
+    shared = joblib.load(data_path, mmap_mode='r')
+    _shared_data, _shared_design = shared['data'], shared['design']
+
+# Registry names of the models whose result key differs
+REGISTRY_NAMES = {'fitness_certificate': 'fitness_certificate_model'}
+
+def retrain_model(name, retrain_fn, data, n_jobs=1, new_index=None, trace_id=None, tune=False, design=None,
+                  gate=False):
+    """Run one retrain function inside its own span and return its history record"""
+    started = time.time()
+    with span(f"retrain.{name}", trace_id=trace_id, n_jobs=n_jobs, rows=len(data), tune=tune) as model_span:
+        score = retrain_fn(data, n_jobs=n_jobs, new_index=new_index, tune=tune, design=design, gate=gate)
+        model_span.set(score=score)
+    duration = time.time() - started
+
+    meta = get_registry().current(REGISTRY_NAMES.get(name, name))
+    kept = _gate_decisions.pop(REGISTRY_NAMES.get(name, name), False)
+    if meta is None:
+        outcome = 'failed'
+    elif datetime.fromisoformat(meta['created_at']).timestamp() >= started:
+        outcome = 'incremental' if meta.get('incremental_updates') else 'trained'
+    elif kept:
+        # No drift: the current version was kept without fitting
+        outcome = 'skipped'
     else:
-        existing_logs = [log_entry]
+        # Failed retrains return a default score, reused versions their stored one
+        outcome = 'reused' if meta['score'] == score else 'failed'
+    return {
+        'score': float(score),
+        'duration_s': round(duration, 3),
+        'fingerprint': meta['fingerprint'] if meta else None,
+        'outcome': outcome
+    }
+
+def _run_retrainer(name, n_jobs, new_index=None, trace_id=None, tune=False, gate=False):
+    """Run one retrain function inside a pool worker"""
+    from threadpoolctl import threadpool_limits
     
-    # Keep only last 10 entries
-    existing_logs = existing_logs[-10:]
+    retrain_fn = next(fn for key, fn, _ in RETRAINERS if key == name)
+    # Keep BLAS/OpenMP threads inside this model's share of the budget
+    with threadpool_limits(limits=n_jobs):
+        return retrain_model(name, retrain_fn, _shared_data, n_jobs, new_index, trace_id, tune, _shared_design, gate)
+
+def retrain_all_parallel(data, total_cores=None, new_index=None, tune=False, design=None, gate=False):
+    """Retrain all 7 models concurrently in a process pool and return their history records"""
+    from concurrent.futures import ProcessPoolExecutor
+    import tempfile
+    
+    total_cores = total_cores or os.cpu_count() or 1
+    workers, n_jobs = plan_core_budget(total_cores)
+    log_message(f"⚡ Parallel retraining: {workers} workers, {total_cores} cores "
+                f"(n_jobs {', '.join(f'{k}={v}' for k, v in n_jobs.items())})")
+    
+    with tempfile.TemporaryDirectory(prefix='kmrl-retrain-') as tmp_dir:
+        # Dump once uncompressed so every worker maps the same read-only pages
+        data_path = os.path.join(tmp_dir, 'training_data.joblib')
+        with span('joblib.dump', artifact='training_data'):
+            joblib.dump({'data': data, 'design': design if design is not None else DesignMatrix(data)}, data_path)
+        
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_retrain_worker,
+                                 initargs=(data_path,)) as pool:
+            futures = {
+                name: pool.submit(_run_retrainer, name, n_jobs[name], new_index, current_trace_id(), tune, gate)
+                for name, _, _ in RETRAINERS
+            }
+            return {name: future.result() for name, future in futures.items()}
+
+def save_retraining_log(model_runs, new_filename, total_rows, started_at=None, data_fingerprint=None, mode=None):
+    """Append the run to the retraining history and refresh the last-10 log file"""
+    history = RetrainHistory(RETRAIN_HISTORY_PATH)
+    finished_at = time.time()
+    run_id = history.record_run(
+        started_at or finished_at, finished_at, model_runs,
+        trigger_file=new_filename,
+        total_rows=total_rows,
+        data_fingerprint=data_fingerprint,
+        mode=mode
+    )
     
-    # Save updated logs
-    with open(log_file, 'w') as f:
-        json.dump(existing_logs, f, indent=2)
+    # retraining_log.json is now a view of the history, rewritten atomically
+    log_file = str(RETRAINING_LOG_PATH)
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    history.export_log(log_file)
     
-    log_message(f"📝 Retraining log saved to: {log_file}")
+    log_message(f"📝 Retraining run #{run_id} saved to: {history.path}")
+
+def auto_retrain_system(new_filepath, new_filename, parallel=None, total_cores=None, incremental=None,
+                        uploads_dir=UPLOADS_DIR, manifest=None, run_predictions=True, source=None, tune=False,
+                        gate=None):
+    """Main auto-retraining function
+
+    tune searches each model's hyperparameters before fitting; gate retrains
+    only the models whose inputs drifted (see drift_gate).
+    """
+    if parallel is None:
+        parallel = TRAINING_CONFIG['parallel_retrain']
+    if incremental is None:
+        incremental = TRAINING_CONFIG['incremental_retrain']
+    if gate is None:
+        gate = TRAINING_CONFIG['drift_gating']
+    total_cores = total_cores or TRAINING_CONFIG['retrain_cores']
 
-def auto_retrain_system(new_filepath, new_filename):
-    """Main auto-retraining function"""
     log_message("🚀 Starting KMRL Auto-Retraining System...")
     
+    with span('auto_retrain', trigger_file=new_filename, parallel=bool(parallel),
+              incremental=bool(incremental), tune=tune, gate=bool(gate)) as run_span:
+        success = _auto_retrain(new_filepath, new_filename, parallel, total_cores, incremental,
+                                uploads_dir, manifest, run_predictions, source, tune, gate)
+        run_span.set(success=success)
+    return success
+
+def _auto_retrain(new_filepath, new_filename, parallel, total_cores, incremental,
+                  uploads_dir, manifest, run_predictions, source, tune, gate):
+    started_at = time.time()
     try:
         # Load all available data
-        combined_data = load_all_data(new_filepath, new_filename)
+        with span('load_training_data') as load_span:
+            combined_data, new_index = load_training_data(new_filepath, new_filename, uploads_dir, manifest, source)
+            load_span.set(rows=len(combined_data))
+        # The drift gate compares the trains this run's uploads changed, whatever the retrain mode
+        changed_index = new_index
+        if not incremental or not new_index or tune:
+            # No new rows to learn from incrementally (or new parameters), so every model does a full refit
+            new_index = None
+        else:
+            log_message(f"➕ Incremental mode: {len(new_index)} trains with new data")
         
         if combined_data.empty:
             log_message("❌ No data available for training")
             return False
         
         log_message(f"📊 Training with {len(combined_data)} total data points")
+        if gate and tune:
+            # New hyperparameters need a refit whatever the data looks like
+            gate = False
         
-        # Retrain all 7 models
-        retraining_results = {}
+        # Imputation statistics and the float32 design matrix are computed once for all 7 models
+        with span('design_matrix') as design_span:
+            design = DesignMatrix(combined_data, changed=changed_index)
+            design_span.set(columns=len(design.columns), bytes=design.matrix.nbytes)
         
-        retraining_results['fitness_certificate'] = retrain_fitness_certificate_model(combined_data)
-        retraining_results['jobcard_optimizer'] = retrain_jobcard_optimizer(combined_data)
-        retraining_results['branding_optimizer'] = retrain_branding_optimizer(combined_data)
-        retraining_results['mileage_balancer'] = retrain_mileage_balancer(combined_data)
-        retraining_results['resource_scheduler'] = retrain_resource_scheduler(combined_data)
-        retraining_results['stabling_optimizer'] = retrain_stabling_optimizer(combined_data)
-        retraining_results['master_decision_engine'] = retrain_master_decision_engine(combined_data)
+        # Retrain all 7 models
+        if parallel:
+            model_runs = retrain_all_parallel(combined_data, total_cores, new_index, tune, design, gate)
+        else:
+            # Models run one at a time, so a search can spread its CV folds over every core
+            n_jobs = (total_cores or os.cpu_count() or 1) if tune else 1
+            model_runs = {}
+            for name, retrain_fn, _ in RETRAINERS:
+                model_runs[name] = retrain_model(name, retrain_fn, combined_data, n_jobs, new_index,
+                                                 tune=tune, design=design, gate=gate)
+        retraining_results = {name: run['score'] for name, run in model_runs.items()}
         
         # Save retraining log
-        save_retraining_log(retraining_results, new_filename, len(combined_data))
+        with span('save_retraining_log'):
+            mode = ('parallel ' if parallel else '') + ('incremental' if new_index else 'tuned' if tune else 'gated' if gate else 'full')
+            save_retraining_log(model_runs, new_filename, len(combined_data), started_at,
+                                fingerprint_data(combined_data), mode)
         
         # Generate new predictions with updated models
-        log_message("🔮 Generating new predictions with updated models...")
-        quick_fix_path = os.path.join(os.path.dirname(__file__), 'quick_fix.py')
-        if os.path.exists(quick_fix_path):
-            os.system(f'python "{quick_fix_path}"')
-        else:
-            log_message("⚠️ quick_fix.py not found, skipping prediction generation")
+        if run_predictions:
+            log_message("🔮 Generating new predictions with updated models...")
+            quick_fix_path = os.path.join(os.path.dirname(__file__), 'quick_fix.py')
+            if os.path.exists(quick_fix_path):
+                import subprocess
+                # The subprocess records its own spans under this trace
+                with span('quick_fix.subprocess') as predict_span:
+                    completed = subprocess.run([sys.executable, quick_fix_path], env=trace_env())
+                    predict_span.set(returncode=completed.returncode)
+            else:
+                log_message("⚠️ quick_fix.py not found, skipping prediction generation")
         
         avg_accuracy = np.mean(list(retraining_results.values()))
         log_message(f"🎉 Auto-retraining completed successfully!")
         log_message(f"📈 Average model accuracy: {avg_accuracy:.1f}%")
-        log_message(f"🔧 All 7 models updated and ready for predictions")
+        outcomes = {}
+        for run in model_runs.values():
+            outcomes[run['outcome']] = outcomes.get(run['outcome'], 0) + 1
+        log_message(f"🔧 All 7 models ready for predictions ({', '.join(f'{n} {o}' for o, n in outcomes.items())})")
         
         return True
         
@@ -412,22 +870,37 @@ def auto_retrain_system(new_filepath, new_filename):
         return False
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        log_message("Usage: python auto_retrain.py <new_filepath> <new_filename>")
-        sys.exit(1)
+    import argparse
     
-    new_filepath = sys.argv[1]
-    new_filename = sys.argv[2]
+    parser = argparse.ArgumentParser(description="KMRL AI Auto-Retraining System")
+    parser.add_argument('new_filepath')
+    parser.add_argument('new_filename')
+    parser.add_argument('--parallel', action='store_true', default=None,
+                        help='train the 7 models concurrently in a process pool')
+    parser.add_argument('--cores', type=int, default=None,
+                        help='total core budget for parallel retraining')
+    parser.add_argument('--incremental', action='store_true', default=None,
+                        help='update the current models with new rows only when possible')
+    parser.add_argument('--source', choices=['uploads', 'sqlite'], default=None,
+                        help='training data source (default: TRAINING_CONFIG data_source)')
+    parser.add_argument('--tune', action='store_true',
+                        help='search each model\'s hyperparameters (k-fold CV, successive halving) and save the best')
+    parser.add_argument('--no-drift-gate', dest='gate', action='store_false', default=None,
+                        help='retrain every model even when its inputs have not drifted')
+    args = parser.parse_args()
     
     log_message("=" * 60)
     log_message("🤖 KMRL AI Auto-Retraining System Started")
     log_message("=" * 60)
     
-    success = auto_retrain_system(new_filepath, new_filename)
+    success = auto_retrain_system(args.new_filepath, args.new_filename,
+                                  parallel=args.parallel, total_cores=args.cores,
+                                  incremental=args.incremental, source=args.source, tune=args.tune,
+                                  gate=args.gate)
     
     if success:
         log_message("✅ Auto-retraining system completed successfully!")
         sys.exit(0)
     else:
         log_message("❌ Auto-retraining system failed!")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
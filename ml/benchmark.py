@@ -0,0 +1,436 @@
+"""
+KMRL ML Benchmark Suite
+Offline wall-time, peak-memory and throughput benchmarks for ingestion, retraining and induction scoring
+"""
+
+import os
+import sys
+import json
+import time
+import importlib
+import shutil
+import tempfile
+import tracemalloc
+import contextlib
+import subprocess
+from pathlib import Path
+from datetime import datetime, timedelta
+
+from lazy_imports import lazy_import
+from config import ML_BASE_DIR, TRAINED_MODELS_DIR, BENCHMARKS_DIR, BENCHMARK_BASELINE_PATH
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Fleet size x number of uploaded CSVs
+DEFAULT_SCALES = [(57, 1), (1000, 10), (10000, 100)]
+FULL_SCALES = [(57, 1), (1000, 100), (10000, 1000)]
+
+# A stage regresses when it is this much slower or bigger than its baseline ...
+REGRESSION_TOLERANCE = 0.25
+# ... and the difference is above measurement noise
+MIN_WALL_DELTA_S = 0.05
+MIN_MEMORY_DELTA_BYTES = 1 << 20
+
+UPLOAD_KINDS = ['availability', 'alerts', 'maintenance', 'timetable', 'shifts']
+
+def _availability_upload(fleet, day):
+    status = np.select(
+        [fleet['Availability_Score'] >= 80, fleet['Availability_Score'] >= 70],
+        ['Available', 'Under Maintenance'],
+        'Out of Service'
+    )
+    return pd.DataFrame({
+        'Train ID': fleet['Train_ID'],
+        'Availability Status': status,
+        'Assigned Route ID': np.where(status == 'Available', 'KM-BL-1', 'NA'),
+        'Assignment Date': day.strftime('%Y-%m-%d'),
+        'Operator ID / Name': 'OP-01 / Benchmark',
+        'Remarks': 'Synthetic availability'
+    })
+
+def _alert_upload(fleet, day):
+    trains = np.repeat(fleet['Train_ID'].to_numpy(), fleet['Alert_Count'].to_numpy())
+    n = len(trains)
+    return pd.DataFrame({
+        'Alert ID': [f'ALT-{day:%j}-{i}' for i in range(n)],
+        'Train ID': trains,
+        'Date Reported': day.strftime('%Y-%m-%d'),
+        'Reported By': 'STAFF-01',
+        'Issue Type': np.resize(['Electrical', 'Engine', 'Coach', 'Brake'], n),
+        'Severity': np.resize(['Low', 'Medium', 'High', 'Critical'], n),
+        'Description': 'Synthetic alert',
+        'Status': np.resize(['Open', 'In Progress', 'Resolved'], n),
+        'Resolution Date': 'NA'
+    })
+
+def _maintenance_upload(fleet, day):
+    last = day - pd.to_timedelta(200 - fleet['Maintenance_Score'].to_numpy() * 2, unit='D')
+    return pd.DataFrame({
+        'Train ID': fleet['Train_ID'],
+        'Last Maintenance Date': last.strftime('%Y-%m-%d'),
+        'Next Due Date': (last + pd.Timedelta(days=60)).strftime('%Y-%m-%d'),
+        'Maintenance Type': 'Routine Check',
+        'Status': 'Pending',
+        'Remarks': 'Synthetic maintenance'
+    })
+
+def _timetable_upload(fleet, day, stops=3):
+    trains = np.repeat(fleet['Train_ID'].to_numpy(), stops)
+    n = len(trains)
+    return pd.DataFrame({
+        'Train ID': trains,
+        'Route ID': 'KM-BL-1',
+        'Station Name': np.resize(['Aluva', 'Pulinchodu', 'Companypady'], n),
+        'Arrival Time': '08:00:00',
+        'Departure Time': '08:00:30',
+        'Actual Arrival Time': '08:02:30',
+        'Actual Departure Time': '08:03:00',
+        'Delay (mins)': np.resize([0.0, 2.5, 1.0], n),
+        'Status': 'On Time'
+    })
+
+def _shift_upload(fleet, day):
+    n = len(fleet)
+    return pd.DataFrame({
+        'Shift ID': [f'SH-{day:%j}-{i}' for i in range(n)],
+        'Staff ID': np.resize(['ST-101', 'ST-201', 'ST-301'], n),
+        'Name': 'Benchmark Staff',
+        'Role': np.resize(['Driver', 'Engineer', 'Technician'], n),
+        'Train ID Assigned': fleet['Train_ID'],
+        'Shift Date': day.strftime('%Y-%m-%d'),
+        'Shift Start Time': '06:00',
+        'Shift End Time': '14:00',
+        'Tasks Completed': 'Synthetic shift',
+        'Remarks': 'NA'
+    })
+
+UPLOAD_BUILDERS = {
+    'availability': _availability_upload,
+    'alerts': _alert_upload,
+    'maintenance': _maintenance_upload,
+    'timetable': _timetable_upload,
+    'shifts': _shift_upload
+}
+
+def write_synthetic_uploads(directory, n_trains, n_files):
+    """Write an upload history derived from a scaled sample fleet; returns total rows
+
+    The first file is the sample training data itself; the others cycle
+    through the operator upload schemas, one simulated day per file.
+    """
+    from auto_retrain import create_sample_training_data
+
+    fleet = create_sample_training_data(n_trains)
+    os.makedirs(directory, exist_ok=True)
+    fleet.to_csv(os.path.join(directory, '0000-training.csv'), index=False)
+    total_rows = len(fleet)
+
+    start = datetime(2025, 1, 1)
+    for i in range(1, n_files):
+        kind = UPLOAD_KINDS[(i - 1) % len(UPLOAD_KINDS)]
+        day = start + timedelta(days=i)
+        upload = UPLOAD_BUILDERS[kind](fleet, day)
+        upload.to_csv(os.path.join(directory, f'{i:04d}-{kind}.csv'), index=False)
+        total_rows += len(upload)
+    return total_rows
+
+@contextlib.contextmanager
+def isolated_state(state_dir):
+    """Point the retrain registry and log at a scratch directory"""
+    import auto_retrain
+    from model_registry import ModelRegistry
+
+    saved = auto_retrain._registry, auto_retrain.RETRAIN_HISTORY_PATH, auto_retrain.RETRAINING_LOG_PATH
+    auto_retrain._registry = ModelRegistry(
+        root=os.path.join(state_dir, 'registry'),
+        published_dir=os.path.join(state_dir, 'trained')
+    )
+    auto_retrain.RETRAIN_HISTORY_PATH = Path(state_dir) / 'retrain_history.sqlite'
+    auto_retrain.RETRAINING_LOG_PATH = Path(state_dir) / 'retraining_log.json'
+    try:
+        yield
+    finally:
+        auto_retrain._registry, auto_retrain.RETRAIN_HISTORY_PATH, auto_retrain.RETRAINING_LOG_PATH = saved
+
+def measure(fn, rows, quiet=True):
+    """Run fn once and return wall time, CPU time, peak traced memory and throughput"""
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        tracemalloc.start()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        fn()
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'wall_s': round(wall, 4),
+        'cpu_s': round(cpu, 4),
+        'peak_bytes': peak,
+        'rows': rows,
+        'rows_per_s': round(rows / wall, 1) if wall > 0 else None
+    }
+
+def benchmark_scale(n_trains, n_files, quiet=True):
+    """Benchmark every stage for one fleet size and upload history"""
+    from auto_retrain import RETRAINERS, auto_retrain_system, create_sample_training_data
+    from ingestion import ingest_uploads, UploadManifest
+    from feature_store import build_feature_store
+    from quick_fix import score_fleet
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix='kmrl-bench-')
+    try:
+        uploads_dir = os.path.join(work_dir, 'uploads')
+        total_rows = write_synthetic_uploads(uploads_dir, n_trains, n_files)
+
+        def new_manifest(name):
+            return UploadManifest(
+                os.path.join(work_dir, name, 'manifest.json'),
+                os.path.join(work_dir, name, 'cache')
+            )
+
+        manifest = new_manifest('ingest')
+
+        def ingest():
+            frames, _ = ingest_uploads(uploads_dir, manifest=manifest)
+            build_feature_store(frames).feature_matrix()
+
+        # The first run parses every CSV, the second is served from the columnar cache
+        results['ingest_cold'] = measure(ingest, total_rows, quiet)
+        results['ingest_warm'] = measure(ingest, total_rows, quiet)
+
+        data = create_sample_training_data(n_trains)
+        with isolated_state(os.path.join(work_dir, 'models')):
+            for name, retrain_fn, _ in RETRAINERS:
+                results[f'retrain.{name}'] = measure(lambda: retrain_fn(data), n_trains, quiet)
+
+        latest = os.path.join(uploads_dir, sorted(os.listdir(uploads_dir))[-1])
+        with isolated_state(os.path.join(work_dir, 'end_to_end')):
+            results['auto_retrain_system'] = measure(
+                lambda: auto_retrain_system(
+                    latest, os.path.basename(latest),
+                    uploads_dir=uploads_dir, manifest=new_manifest('end_to_end'), run_predictions=False
+                ),
+                total_rows, quiet
+            )
+
+        fleet = pd.DataFrame({
+            'Train ID': data['Train_ID'],
+            'Availability Score': data['Availability_Score'],
+            'Maintenance Score': data['Maintenance_Score']
+        })
+        alerts = pd.DataFrame({'Train ID': np.repeat(data['Train_ID'].to_numpy(), data['Alert_Count'].to_numpy())})
+        results['induction_scoring'] = measure(lambda: score_fleet(fleet, alerts), n_trains, quiet)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """List (key, metric, baseline, current) for every stage that regressed"""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if (current['wall_s'] > previous['wall_s'] * (1 + tolerance)
+                and current['wall_s'] - previous['wall_s'] > MIN_WALL_DELTA_S):
+            regressions.append((key, 'wall_s', previous['wall_s'], current['wall_s']))
+        if (current['peak_bytes'] > previous['peak_bytes'] * (1 + tolerance)
+                and current['peak_bytes'] - previous['peak_bytes'] > MIN_MEMORY_DELTA_BYTES):
+            regressions.append((key, 'peak_bytes', previous['peak_bytes'], current['peak_bytes']))
+    return regressions
+
+def load_baseline(path=BENCHMARK_BASELINE_PATH):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)['results']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(str(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'created_at': datetime.now().isoformat(), 'results': results}, f, indent=2)
+
+def parse_scales(text):
+    """Parse '57x1,1000x10' into [(57, 1), (1000, 10)]"""
+    scales = []
+    for item in text.split(','):
+        trains, files = item.lower().split('x')
+        scales.append((int(trains), int(files)))
+    return scales
+
+# Loads every artifact in a directory, reports load time and memory, then
+# stays alive until stdin closes so concurrent workers overlap
+ARTIFACT_LOAD_PROBE = """
+import sys, json, glob, os, time, resource
+import joblib, sklearn.ensemble, sklearn.cluster, sklearn.linear_model, sklearn.preprocessing
+from model_registry import load_artifact
+
+def memory_kib():
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(fields['Rss'].split()[0]), int(fields['Pss'].split()[0])
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, None
+
+before = memory_kib()
+started = time.perf_counter()
+mmap_mode = sys.argv[2] or None
+models = [load_artifact(path, mmap_mode) for path in sorted(glob.glob(os.path.join(sys.argv[1], '*.pkl')))]
+load_ms = (time.perf_counter() - started) * 1000
+after = memory_kib()
+print(json.dumps({
+    'load_ms': load_ms,
+    'rss_kib': after[0] - before[0],
+    'pss_kib': after[1] - before[1] if after[1] is not None else None
+}), flush=True)
+sys.stdin.read()
+"""
+
+def _trained_artifacts(work_dir):
+    """{artifact: path} of the current trained models, or of a fresh set trained on sample data"""
+    from model_registry import published_artifacts
+
+    artifacts = published_artifacts(TRAINED_MODELS_DIR)
+    if artifacts:
+        return {name: path for name, (path, _) in artifacts.items()}
+
+    from auto_retrain import RETRAINERS, create_sample_training_data
+    data = create_sample_training_data()
+    state_dir = os.path.join(work_dir, 'sample_models')
+    with isolated_state(state_dir), contextlib.redirect_stdout(open(os.devnull, 'w')):
+        for _, retrain_fn, _ in RETRAINERS:
+            retrain_fn(data)
+    return {name: path for name, (path, _) in published_artifacts(os.path.join(state_dir, 'trained')).items()}
+
+def benchmark_artifacts(workers=4):
+    """Size, load time and per-process memory of the trained models in each artifact format"""
+    from model_registry import ARTIFACT_FORMATS, dump_artifact, load_artifact
+
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix='kmrl-artifacts-')
+    try:
+        models = {
+            f"{name}.pkl": load_artifact(path, mmap_mode=None)
+            for name, path in sorted(_trained_artifacts(work_dir).items())
+        }
+
+        # The uncompressed format is also loaded eagerly to separate layout from mapping
+        variants = [(f, 'r') for f in ARTIFACT_FORMATS] + [('mmap', '')]
+        for artifact_format, mmap_mode in variants:
+            label = artifact_format if mmap_mode or artifact_format != 'mmap' else 'mmap (eager)'
+            format_dir = os.path.join(work_dir, artifact_format)
+            if not os.path.isdir(format_dir):
+                os.makedirs(format_dir)
+                for name, model in models.items():
+                    dump_artifact(model, os.path.join(format_dir, name), artifact_format)
+
+            # Several workers hold the models at once, like the parallel retrain pool
+            probes = [
+                subprocess.Popen(
+                    [sys.executable, '-c', ARTIFACT_LOAD_PROBE, format_dir, mmap_mode],
+                    cwd=str(ML_BASE_DIR), stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+                )
+                for _ in range(workers)
+            ]
+            reports = [json.loads(probe.stdout.readline()) for probe in probes]
+            for probe in probes:
+                probe.communicate('')
+
+            pss = [r['pss_kib'] for r in reports if r['pss_kib'] is not None]
+            results[label] = {
+                'size_bytes': sum(os.path.getsize(os.path.join(format_dir, name)) for name in models),
+                'load_ms': round(float(np.median([r['load_ms'] for r in reports])), 1),
+                'rss_kib': int(np.median([r['rss_kib'] for r in reports])),
+                'pss_kib': int(np.median(pss)) if pss else None,
+                'workers': workers
+            }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def run_artifact_benchmark(workers=4):
+    print(f"📦 KMRL model artifact formats ({workers} concurrent loaders)")
+    print("=" * 66)
+    print(f"{'format':<14}{'size MiB':>10}{'load ms':>10}{'RSS MiB':>12}{'PSS MiB':>12}")
+    results = benchmark_artifacts(workers)
+    for artifact_format, r in results.items():
+        pss = f"{r['pss_kib'] / 1024:>12.1f}" if r['pss_kib'] is not None else f"{'n/a':>12}"
+        print(f"{artifact_format:<14}{r['size_bytes'] / 2**20:>10.1f}{r['load_ms']:>10.1f}"
+              f"{r['rss_kib'] / 1024:>12.1f}{pss}")
+    print("\nRSS/PSS are per loader process; PSS splits shared pages between the loaders.")
+    print("sklearn copies tree nodes into its own buffers on load, so forests gain little from mapping.")
+    return results
+
+def run_benchmarks(scales, baseline_path=BENCHMARK_BASELINE_PATH, tolerance=REGRESSION_TOLERANCE,
+                   save_baseline=False, quiet=True):
+    print("⏱️ KMRL ML benchmark suite")
+    print("=" * 78)
+    print(f"{'stage':<44}{'wall s':>9}{'peak MiB':>10}{'rows/s':>15}")
+
+    # Import sklearn up front so its import time is not charged to the first retrain
+    for module in ('sklearn.ensemble', 'sklearn.cluster', 'sklearn.linear_model', 'sklearn.model_selection'):
+        importlib.import_module(module)
+
+    results = {}
+    for n_trains, n_files in scales:
+        scale = f"{n_trains}_trains/{n_files}_files"
+        print(f"\n📊 {n_trains} trains, {n_files} uploaded CSVs")
+        for stage, metrics in benchmark_scale(n_trains, n_files, quiet).items():
+            results[f"{scale}/{stage}"] = metrics
+            print(f"   {stage:<41}{metrics['wall_s']:>9.3f}{metrics['peak_bytes'] / 2**20:>10.1f}"
+                  f"{metrics['rows_per_s'] or 0:>15,.0f}")
+
+    os.makedirs(str(BENCHMARKS_DIR), exist_ok=True)
+    results_path = os.path.join(str(BENCHMARKS_DIR), f"results-{datetime.now():%Y%m%d-%H%M%S}.json")
+    save_results(results, results_path)
+    print(f"\n📝 Results saved to: {results_path}")
+
+    baseline = load_baseline(baseline_path)
+    if save_baseline or not baseline:
+        save_results({**baseline, **results}, baseline_path)
+        print(f"📌 Baseline {'updated' if baseline else 'created'}: {baseline_path}")
+        return []
+
+    regressions = compare(results, baseline, tolerance)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regressions against {baseline_path}:")
+        for key, metric, previous, current in regressions:
+            print(f"   {key} {metric}: {previous} -> {current}")
+    else:
+        print(f"✅ No regressions against {baseline_path} (tolerance {tolerance:.0%})")
+    return regressions
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="KMRL ML benchmark suite")
+    parser.add_argument('--scales', type=parse_scales, default=None,
+                        help="fleet size x upload count pairs, e.g. '57x1,1000x10'")
+    parser.add_argument('--full', action='store_true', help='benchmark up to 10k trains and 1000 uploads')
+    parser.add_argument('--baseline', default=str(BENCHMARK_BASELINE_PATH), help='baseline results file')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help='relative slowdown or growth that counts as a regression')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 on any regression')
+    parser.add_argument('--verbose', action='store_true', help='show the pipeline logs')
+    parser.add_argument('--artifacts', action='store_true',
+                        help='benchmark load time and memory of each model artifact format instead')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent loaders for --artifacts')
+    args = parser.parse_args()
+    
+    # Spans would reset the tracemalloc peaks measured here and write traces for every run
+    import tracing
+    tracing.configure(enabled=False)
+
+    if args.artifacts:
+        run_artifact_benchmark(args.workers)
+        sys.exit(0)
+
+    scales = args.scales or (FULL_SCALES if args.full else DEFAULT_SCALES)
+    regressions = run_benchmarks(scales, args.baseline, args.tolerance, args.save_baseline, quiet=not args.verbose)
+    sys.exit(1 if args.check and regressions else 0)
@@ -0,0 +1,336 @@
+"""
+KMRL Compiled Tree Ensembles
+Random forests and gradient boosting flattened into float32/int32 node arrays and scored with one NumPy traversal
+"""
+
+import os
+import time
+
+from lazy_imports import lazy_import
+from config import TRAINED_MODELS_DIR
+
+np = lazy_import('numpy')
+
+# Published next to a model as '<model>_compiled.pkl'
+COMPILED_SUFFIX = '_compiled'
+
+def _float32_thresholds(thresholds):
+    """float32 thresholds that split float32 inputs exactly like sklearn's float64 ones
+
+    sklearn compares float32 features with float64 thresholds, so x <= t
+    holds exactly when x is at most the largest float32 not above t.
+    """
+    rounded = thresholds.astype(np.float32)
+    above = rounded.astype(np.float64) > thresholds
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+def tree_signature(model):
+    """Shape of a fitted ensemble, to tell whether a compiled copy still belongs to it"""
+    trees = [tree.tree_ for tree in np.ravel(model.estimators_)]
+    return (type(model).__name__, len(trees), sum(tree.node_count for tree in trees),
+            round(float(sum(tree.threshold.sum() for tree in trees)), 6))
+
+class CompiledForest:
+    """A fitted tree ensemble as flat node arrays
+
+    Every tree's nodes share one set of arrays: the split feature (int32),
+    threshold (float32), both children (int32, interleaved so one gather
+    follows either branch) and leaf values (float32). Leaves point back at
+    themselves, so predict() moves every (row, tree) pair one level down per
+    step without branching on which have finished, scoring a whole fleet in
+    a single pass instead of a Python loop over trees.
+    """
+
+    def __init__(self, model):
+        from sklearn.ensemble import (RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier,
+                                      ExtraTreesRegressor, GradientBoostingRegressor)
+
+        if isinstance(model, GradientBoostingRegressor):
+            if model.init_ != 'zero' and type(model.init_).__name__ != 'DummyRegressor':
+                raise TypeError("Only constant initial predictions can be compiled")
+            self.kind = 'regressor'
+            self.aggregate = 'sum'
+            scale = model.learning_rate
+            self.baseline = 0.0 if model.init_ == 'zero' else float(
+                np.ravel(model.init_.predict(np.zeros((1, model.n_features_in_))))[0]
+            )
+        elif isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+            if getattr(model, 'n_outputs_', 1) != 1:
+                raise TypeError("Multi-output forests cannot be compiled")
+            self.kind = 'classifier'
+            self.aggregate = 'mean'
+            self.classes_ = np.asarray(model.classes_)
+        elif isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+            if getattr(model, 'n_outputs_', 1) != 1:
+                raise TypeError("Multi-output forests cannot be compiled")
+            self.kind = 'regressor'
+            self.aggregate = 'mean'
+            scale, self.baseline = 1.0, 0.0
+        else:
+            raise TypeError(f"Cannot compile {type(model).__name__}")
+
+        if hasattr(model, 'feature_names_in_'):
+            self.feature_names_in_ = model.feature_names_in_
+        self.n_features_in_ = model.n_features_in_
+        self.signature = tree_signature(model)
+
+        trees = [tree.tree_ for tree in np.ravel(model.estimators_)]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        n_nodes = int(offsets[-1])
+        self.roots = offsets[:-1].astype(np.int32)
+        self.max_depth = max(tree.max_depth for tree in trees)
+
+        self.feature = np.zeros(n_nodes, dtype=np.int32)
+        self.threshold = np.full(n_nodes, np.inf, dtype=np.float32)
+        self.children = np.empty(2 * n_nodes, dtype=np.int32)
+        self.missing_left = np.ones(n_nodes, dtype=bool)
+        width = len(self.classes_) if self.kind == 'classifier' else 1
+        self.values = np.empty((n_nodes, width), dtype=np.float32)
+
+        for tree, offset in zip(trees, offsets[:-1]):
+            nodes = np.arange(offset, offset + tree.node_count)
+            split = tree.children_left != -1
+            # Leaves keep feature 0 and an infinite threshold, and both children lead back to themselves
+            self.feature[nodes[split]] = tree.feature[split]
+            self.threshold[nodes[split]] = _float32_thresholds(tree.threshold[split])
+            self.children[2 * nodes] = np.where(split, tree.children_left + offset, nodes)
+            self.children[2 * nodes + 1] = np.where(split, tree.children_right + offset, nodes)
+            if hasattr(tree, 'missing_go_to_left'):
+                self.missing_left[nodes] = tree.missing_go_to_left.astype(bool)
+
+            value = tree.value[:, 0, :]
+            if self.kind == 'classifier':
+                totals = value.sum(axis=1, keepdims=True)
+                value = np.divide(value, totals, out=np.zeros_like(value), where=totals > 0)
+            else:
+                value = value * scale
+            self.values[nodes] = value
+
+    def _working_arrays(self):
+        """Index arrays as intp, which NumPy gathers with no per-call conversion; built once per process"""
+        working = self.__dict__.get('_working')
+        if working is None:
+            nodes = np.arange(len(self.feature))
+            working = self._working = (self.feature.astype(np.intp), self.children.astype(np.intp),
+                                       self.children[0::2] == nodes)
+        return working
+
+    def __getstate__(self):
+        # Only the compact arrays are saved
+        return {key: value for key, value in self.__dict__.items() if key != '_working'}
+
+    def _leaves(self, X):
+        """Leaf reached in every tree, as an (n_rows, n_trees) array of node indices
+
+        (row, tree) pairs that reach a leaf are dropped from the working set
+        every few steps, so shallow paths stop costing work.
+        """
+        if hasattr(X, 'to_numpy'):
+            X = X.to_numpy(dtype=np.float32)
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got shape {X.shape}")
+        feature, children, is_leaf = self._working_arrays()
+
+        n_rows, n_trees = len(X), len(self.roots)
+        values = X.ravel()
+        has_missing = np.isnan(values).any()
+        leaves = np.tile(self.roots.astype(np.intp), n_rows)
+        # Working set: position in leaves, current node and the offset of its row in values
+        position = np.arange(n_rows * n_trees)
+        nodes = leaves.copy()
+        row_offset = np.repeat(np.arange(n_rows) * X.shape[1], n_trees)
+        for depth in range(self.max_depth):
+            x = values[row_offset + feature[nodes]]
+            go_right = x > self.threshold[nodes]
+            if has_missing:
+                go_right = np.where(np.isnan(x), ~self.missing_left[nodes], go_right)
+            nodes = children[2 * nodes + go_right]
+            if depth % 4 == 3:
+                done = is_leaf[nodes]
+                if done.any():
+                    leaves[position[done]] = nodes[done]
+                    position, nodes, row_offset = position[~done], nodes[~done], row_offset[~done]
+                    if not len(nodes):
+                        break
+        leaves[position] = nodes
+        return leaves.reshape(n_rows, n_trees)
+
+    def _aggregate(self, X):
+        values = self.values[self._leaves(X)]
+        total = values.sum(axis=1, dtype=np.float64)
+        if self.aggregate == 'mean':
+            total /= len(self.roots)
+        return total
+
+    def predict_proba(self, X):
+        if self.kind != 'classifier':
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._aggregate(X)
+
+    def predict(self, X):
+        if self.kind == 'classifier':
+            return self.classes_[np.argmax(self._aggregate(X), axis=1)]
+        return self.baseline + self._aggregate(X)[:, 0]
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.roots, self.feature, self.threshold, self.children,
+                                              self.missing_left, self.values))
+
+    def __repr__(self):
+        return (f"CompiledForest({self.signature[0]}, {len(self.roots)} trees, "
+                f"{len(self.feature)} nodes, {self.nbytes / 1024:.1f} KiB)")
+
+def compile_model(model):
+    """CompiledForest of a fitted tree ensemble, or None for any other model"""
+    if not hasattr(model, 'estimators_'):
+        return None
+    try:
+        return CompiledForest(model)
+    except TypeError:
+        return None
+
+def export_compiled(models_dir=TRAINED_MODELS_DIR):
+    """Compile every loose published tree ensemble whose compiled artifact is missing or stale
+
+    Models published by auto_retrain already carry one inside their
+    published version; this covers loose artifacts trained before they did.
+    """
+    from model_registry import dump_artifact, load_artifact
+
+    exported = []
+    for entry in sorted(os.listdir(str(models_dir))):
+        name = entry[:-4]
+        if not entry.endswith('.pkl') or name.endswith(COMPILED_SUFFIX):
+            continue
+        compiled_path = os.path.join(str(models_dir), f"{name}{COMPILED_SUFFIX}.pkl")
+        model = load_artifact(os.path.join(str(models_dir), entry))
+        if not hasattr(model, 'estimators_'):
+            continue
+        if os.path.exists(compiled_path):
+            existing = load_artifact(compiled_path)
+            if getattr(existing, 'signature', None) == tree_signature(model):
+                continue
+        compiled = compile_model(model)
+        if compiled is None:
+            continue
+        tmp_path = f"{compiled_path}.tmp-{os.getpid()}"
+        dump_artifact(compiled, tmp_path)
+        os.replace(tmp_path, compiled_path)
+        exported.append((name, compiled))
+    return exported
+
+def _median_seconds(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return float(np.median(times))
+
+def _artifact_bytes(obj):
+    import tempfile
+    import joblib
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'artifact.pkl')
+        joblib.dump(obj, path)
+        return os.path.getsize(path)
+
+def benchmark(models, X, repeats=50):
+    """Per-row and whole-fleet latency, artifact size and agreement of each model against its compiled form"""
+    results = {}
+    single = X.iloc[:1] if hasattr(X, 'iloc') else X[:1]
+    for name, model in models.items():
+        compiled = compile_model(model)
+        if compiled is None:
+            continue
+        expected, actual = model.predict(X), compiled.predict(X)
+        if compiled.kind == 'classifier':
+            agreement = float(np.mean(expected == actual))
+            max_error = float(np.abs(model.predict_proba(X) - compiled.predict_proba(X)).max())
+        else:
+            agreement = None
+            max_error = float(np.abs(expected - actual).max())
+        results[name] = {
+            'trees': len(compiled.roots),
+            'nodes': len(compiled.feature),
+            'sklearn_bytes': _artifact_bytes(model),
+            'compiled_bytes': _artifact_bytes(compiled),
+            'sklearn_row_ms': _median_seconds(lambda: model.predict(single), repeats) * 1000,
+            'compiled_row_ms': _median_seconds(lambda: compiled.predict(single), repeats) * 1000,
+            'sklearn_fleet_ms': _median_seconds(lambda: model.predict(X), max(repeats // 5, 3)) * 1000,
+            'compiled_fleet_ms': _median_seconds(lambda: compiled.predict(X), max(repeats // 5, 3)) * 1000,
+            'label_agreement': agreement,
+            'max_abs_error': max_error
+        }
+    return results
+
+def _sample_models(n_rows):
+    """The five tree ensembles, fitted the way auto_retrain fits them on its sample data"""
+    from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
+    from auto_retrain import create_sample_training_data
+    from preprocessing import DesignMatrix
+
+    data = create_sample_training_data(n_rows)
+    design = DesignMatrix(data)
+    specs = {
+        'fitness_certificate_model': (RandomForestClassifier(n_estimators=100, random_state=42),
+                                      ['Availability_Score', 'Maintenance_Score', 'Alert_Count'], data['Fitness_Status']),
+        'jobcard_optimizer': (GradientBoostingRegressor(n_estimators=100, random_state=42),
+                              ['Maintenance_Score', 'Alert_Count', 'Mileage'],
+                              data['Job_Card_Priority'].map({'High': 3, 'Medium': 2, 'Low': 1})),
+        'branding_optimizer': (RandomForestClassifier(n_estimators=80, random_state=42),
+                               ['Availability_Score', 'Maintenance_Score'],
+                               data['Brand_Category'].map({'Premium': 3, 'Standard': 2, 'Basic': 1})),
+        'resource_scheduler': (RandomForestClassifier(n_estimators=90, random_state=42),
+                               ['Station_Capacity', 'Availability_Score'],
+                               data['Cleaning_Slot'].map({'Morning': 1, 'Afternoon': 2, 'Evening': 3})),
+        'master_decision_engine': (RandomForestClassifier(n_estimators=150, random_state=42),
+                                   ['Availability_Score', 'Maintenance_Score', 'Alert_Count', 'Mileage'],
+                                   np.random.default_rng(42).choice([0, 1], n_rows, p=[0.3, 0.7]))
+    }
+    models, inputs = {}, {}
+    for name, (model, columns, y) in specs.items():
+        X, _ = design.view(columns)
+        models[name] = model.fit(X, y)
+        inputs[name] = X
+    return models, inputs
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="KMRL compiled tree ensembles")
+    parser.add_argument('--export', action='store_true',
+                        help='compile the published tree ensembles that lack an up-to-date compiled artifact')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='compare latency, size and predictions with sklearn on sample data')
+    parser.add_argument('--rows', type=int, default=1000, help='sample fleet size for --benchmark')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    if args.export:
+        exported = export_compiled()
+        for name, compiled in exported:
+            print(f"🌲 {name}: {compiled}")
+        print(f"✅ Compiled {len(exported)} models in {TRAINED_MODELS_DIR}")
+
+    if args.benchmark:
+        models, inputs = _sample_models(args.rows)
+        results = {}
+        for name, model in models.items():
+            results.update(benchmark({name: model}, inputs[name]))
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            print(f"🏁 {args.rows} rows")
+            for name, r in results.items():
+                agreement = f"{r['label_agreement']:.2%} labels, " if r['label_agreement'] is not None else ''
+                print(f"   {name}: {r['trees']} trees / {r['nodes']} nodes, "
+                      f"{r['sklearn_bytes'] / 1024:.0f} -> {r['compiled_bytes'] / 1024:.0f} KiB; "
+                      f"1 row {r['sklearn_row_ms']:.2f} -> {r['compiled_row_ms']:.3f} ms, "
+                      f"fleet {r['sklearn_fleet_ms']:.1f} -> {r['compiled_fleet_ms']:.1f} ms; "
+                      f"{agreement}max error {r['max_abs_error']:.2e}")
@@ -1,5 +1,4 @@
 # ML Configuration for KMRL Train Management System
-import os
 from pathlib import Path
 
 # Base paths
@@ -9,11 +8,37 @@ DB_PATH = PROJECT_ROOT / 'train-database.sqlite'
 
 # ML directories
 MODELS_DIR = ML_BASE_DIR / 'models'
+TRAINED_MODELS_DIR = MODELS_DIR / 'trained'
+MODEL_REGISTRY_DIR = MODELS_DIR / 'registry'
 DATA_DIR = ML_BASE_DIR / 'data'
 PROCESSORS_DIR = ML_BASE_DIR / 'processors'
 TRAINERS_DIR = ML_BASE_DIR / 'trainers'
 PREDICTORS_DIR = ML_BASE_DIR / 'predictors'
 
+# Upload ingestion
+UPLOADS_DIR = PROJECT_ROOT / 'uploads'
+INGEST_CACHE_DIR = DATA_DIR / 'ingest_cache'
+UPLOAD_MANIFEST_PATH = DATA_DIR / 'upload_manifest.json'
+QUARANTINE_PATH = DATA_DIR / 'quarantine.jsonl'
+DB_CACHE_DIR = DATA_DIR / 'db_cache'
+
+# Benchmarks
+BENCHMARKS_DIR = DATA_DIR / 'benchmarks'
+BENCHMARK_BASELINE_PATH = BENCHMARKS_DIR / 'baseline.json'
+
+# Retraining history (see retrain_history.py) and the last-10 summary kept for older readers
+RETRAIN_HISTORY_PATH = DATA_DIR / 'retrain_history.sqlite'
+RETRAINING_LOG_PATH = MODELS_DIR / 'retraining_log.json'
+
+# Best hyperparameters found by tuning mode (see tuning.py), one JSON file per model
+TUNED_PARAMS_DIR = DATA_DIR / 'tuned_params'
+
+# Pipeline tracing (see tracing.py)
+TRACE_PATH = DATA_DIR / 'traces.jsonl'
+
+# Cached induction and prediction results (see result_cache.py)
+RESULT_CACHE_DIR = DATA_DIR / 'result_cache'
+
 # Model configurations
 MODELS_CONFIG = {
     'maintenance_predictor': {
@@ -59,16 +84,121 @@ API_CONFIG = {
     'model_info_endpoint': '/api/ml/models'
 }
 
+# Resident inference service (ml/inference_server.py)
+INFERENCE_SERVER_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8765,
+    'reload_check_interval': 1.0,  # Seconds between model artifact mtime checks
+    'compiled_trees': True,  # Score tree ensembles from their compiled node arrays (see compiled_trees.py)
+    'compiled_max_rows': 256  # ... for requests with fewer rows; sklearn is faster from a few hundred rows up
+}
+
+# Model artifact formats (see model_registry.ARTIFACT_FORMATS)
+ARTIFACT_CONFIG = {
+    'storage_format': 'compressed',  # Registry versions, kept for rollback
+    'published_format': 'mmap'  # models/trained/versions/, loaded by the API and inference server
+}
+
+# Stage spans written to TRACE_PATH; KMRL_TRACE=1 turns them on, KMRL_TRACE=memory adds peak memory
+TRACING_CONFIG = {
+    'enabled': False,
+    'trace_memory': False,  # tracemalloc makes a full retrain several times slower
+    'max_bytes': 16 * 1024 * 1024  # TRACE_PATH is moved to '<path>.1' beyond this, replacing the older one
+}
+
+# Stabling bay assignment (ml/stabling.py); positions are numbered from the bay exit
+STABLING_CONFIG = {
+    'depots': {
+        'Depot1': {'bays': 20, 'positions_per_bay': 2},
+        'Depot2': {'bays': 16, 'positions_per_bay': 2}
+    },
+    'blocked': [],  # 'Depot:bay:position' entries out of use tonight
+    'weights': {
+        'order': 10.0,  # Departure order against depth in the bay
+        'move': 1.0,  # Shunting a stabled train to another position
+        'depot_change': 5.0,  # ... in the other depot
+        'trapped': 100.0  # Service train behind a blocked position
+    }
+}
+
+# Induction planner (ml/induction_planner.py)
+PLANNER_CONFIG = {
+    'service_trains': 40,  # Service slots to fill each day
+    'min_service_score': 60,  # Below this induction score a train goes to maintenance
+    'branding_hours_scale': 100.0,  # Branding hours owed that earn the full branding weight
+    'missing_certificate': 'Valid',  # Fitness status of a trainset with no certificate on record ('Pending' holds it in Standby)
+    'weights': {
+        'score': 1.0,  # Per induction score point
+        'branding': 10.0,  # Branding exposure still owed to advertisers
+        'mileage': 5.0,  # Per standard deviation below the fleet's mean mileage
+        'job_cards': 2.0  # Per open job card
+    }
+}
+
+# What-if scenario simulator (ml/scenario_simulator.py)
+SIMULATION_CONFIG = {
+    'scenarios': 10000,  # Monte Carlo draws when none are given
+    'chunk_size': 2048,  # Scenarios evaluated per array batch
+    'seed': 42,
+    'rates': {
+        'breakdown': 0.03,  # Chance each train breaks down overnight
+        'certificate_expiry': 0.02,  # Chance each train's fitness certificate lapses
+        'bay_outage': 0.05  # Chance each stabling bay is out of use
+    }
+}
+
+# Result cache (ml/result_cache.py)
+CACHE_CONFIG = {
+    'memory_entries': 128,  # Results kept in each process's memory tier
+    'disk_max_bytes': 64 * 1024 * 1024,  # Oldest results are dropped beyond this on disk
+    'max_age_seconds': 24 * 3600  # Results older than this are recomputed
+}
+
+# Retrain scheduler (burst uploads are coalesced into one retrain)
+SCHEDULER_CONFIG = {
+    'debounce_seconds': 5.0,  # Wait this long after the latest upload before retraining
+    'poll_interval': 0.5,
+    'stale_lock_seconds': 3600  # Take over a run lock older than this
+}
+
 # Training parameters
 TRAINING_CONFIG = {
     'auto_retrain': True,
     'retrain_threshold': 0.05,  # Retrain if accuracy drops by 5%
+    'drift_gating': True,  # Retrain only models whose inputs drifted or whose holdout score dropped
+    'drift_psi_threshold': 0.2,  # PSI above this (plus small-sample noise) counts as drift
+    'drift_bins': 10,  # Quantile bins per numeric input in the reference sketches
+    'drift_psi_min_rows': 30,  # Fewer new rows than this are judged by KS only
     'min_training_samples': 10,
     'validation_split': 0.2,
-    'cross_validation_folds': 5
+    'cross_validation_folds': 5,
+    'parallel_retrain': False,  # Train the 7 models concurrently in a process pool
+    'retrain_cores': None,  # Core budget for parallel retraining (None = all cores)
+    'data_source': 'uploads',  # 'uploads' (CSV uploads) or 'sqlite' (train-database.sqlite)
+    'incremental_retrain': False,  # Update current models with new rows only when possible
+    'incremental_estimators': 10,  # Trees/boosting stages added per incremental update
+    'full_refit_every': 10,  # Full refit after this many incremental updates
+    'full_refit_max_age_days': 7,  # ... or when the last full refit is older than this
+    'tuning_budget_seconds': 60,  # Wall-clock budget of each model's hyperparameter search
+    'tuning_candidates': 16,  # Parameter combinations sampled per search
+    'halving_factor': 3  # Each successive-halving round keeps 1/3 of the candidates on 3x the rows
 }
 
-print("🤖 ML Configuration loaded successfully!")
-print(f"📁 Models directory: {MODELS_DIR}")
-print(f"🗄️ Database path: {DB_PATH}")
-print(f"🔧 Available models: {list(MODELS_CONFIG.keys())}")
\ No newline at end of file
+# Import-time budgets (milliseconds) enforced by ml/import_report.py --check
+STARTUP_BUDGET_MS = {
+    'config': 50,
+    'auto_retrain': 150,
+    'retrain_scheduler': 50,
+    'inference_server': 2500,
+    'quick_fix': 1500
+}
+
+def describe():
+    """Print a summary of the ML configuration"""
+    print("🤖 ML Configuration loaded successfully!")
+    print(f"📁 Models directory: {MODELS_DIR}")
+    print(f"🗄️ Database path: {DB_PATH}")
+    print(f"🔧 Available models: {list(MODELS_CONFIG.keys())}")
+
+if __name__ == "__main__":
+    describe()
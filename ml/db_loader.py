@@ -0,0 +1,292 @@
+"""
+KMRL SQLite Training Data Loader
+Reads training input straight from train-database.sqlite, fetching only rows changed since the last run
+"""
+
+import os
+import json
+import sqlite3
+from datetime import datetime
+
+from lazy_imports import lazy_import
+from config import DB_PATH, DB_CACHE_DIR
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Drizzle writes `updated_at` as unix seconds, while the CURRENT_TIMESTAMP
+# default stores text, so both forms are normalised to unix seconds
+CHANGED_AT = (
+    "(CASE typeof(updated_at) WHEN 'integer' THEN updated_at "
+    "ELSE CAST(strftime('%s', updated_at) AS INTEGER) END)"
+)
+
+DB_TABLES = {
+    'trainsets': {
+        'key': 'trainset_id',
+        'columns': ['trainset_id', 'serial_no', 'status', 'mileage_km', 'last_service_date']
+    },
+    'fitness_certificates': {
+        'key': 'certificate_id',
+        'columns': ['certificate_id', 'trainset_id', 'dept', 'valid_from', 'valid_to', 'status']
+    },
+    'job_cards': {
+        'key': 'jobcard_id',
+        'columns': ['jobcard_id', 'trainset_id', 'status', 'raised_date', 'closed_date']
+    },
+    'branding_priorities': {
+        'key': 'branding_id',
+        'columns': ['branding_id', 'trainset_id', 'allocated_hours', 'consumed_hours', 'start_date', 'end_date']
+    },
+    'cleaning_slots': {
+        'key': 'cleaning_id',
+        'columns': ['cleaning_id', 'trainset_id', 'cleaning_type', 'slot_time', 'manpower_required', 'manpower_allocated']
+    },
+    'stabling_geometry': {
+        'key': 'stable_id',
+        'columns': ['stable_id', 'trainset_id', 'depot', 'bay_no', 'position_order', 'is_ready_for_turnout']
+    },
+    'system_alerts': {
+        'key': 'alert_id',
+        'columns': ['alert_id', 'trainset_id', 'type', 'priority', 'is_dismissed']
+    }
+}
+
+# Trainset status -> availability status used by the upload features
+TRAINSET_AVAILABILITY = {'Active': 'Available', 'Standby': 'Reserved', 'Maintenance': 'Under Maintenance'}
+
+FITNESS_STATUSES = ['Valid', 'Pending', 'Expired']
+
+# Open job cards older than this count as overdue maintenance
+OVERDUE_JOB_CARD_DAYS = 30
+
+def connect_readonly(db_path=DB_PATH):
+    """Open the database read-only; WAL lets this run while the app is writing"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+def create_change_indexes(db_path=DB_PATH):
+    """Index the normalised updated_at of every loaded table (needs write access, run once)"""
+    conn = sqlite3.connect(str(db_path))
+    try:
+        with conn:
+            for table in DB_TABLES:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_changed_at_idx ON {table}({CHANGED_AT})")
+    finally:
+        conn.close()
+
+def fetch_frame(conn, sql, params, columns):
+    """Run a query and build a frame from one fetchall, one NumPy array per column"""
+    cursor = conn.execute(sql, params)
+    cursor.arraysize = 10_000
+    rows = cursor.fetchall()
+    if not rows:
+        return pd.DataFrame({col: np.empty(0, dtype=object) for col in columns})
+    return pd.DataFrame({col: np.asarray(values) for col, values in zip(columns, zip(*rows))})
+
+def _unchanged_rows(delta, cached, key, columns):
+    """Mask of refetched rows identical to the local copy (rows at the watermark come back every run)"""
+    values = [col for col in columns if col != key]
+    current = delta.set_index(key)[values]
+    previous = cached.set_index(key)[values].reindex(current.index)
+    same = (current == previous) | (current.isna() & previous.isna())
+    return same.all(axis=1).to_numpy()
+
+def read_tables(db_path=DB_PATH):
+    """Read every loaded table in full without touching the local copy or its watermarks"""
+    conn = connect_readonly(db_path)
+    try:
+        return {
+            table: fetch_frame(conn, f"SELECT {', '.join(spec['columns'])}, {CHANGED_AT} FROM {table}", (),
+                               spec['columns'] + ['changed_at'])
+            for table, spec in DB_TABLES.items()
+        }
+    finally:
+        conn.close()
+
+class SQLiteLoader:
+    """Local copy of the training tables, kept current with changed rows only
+
+    The first run reads each table in full. Later runs fetch rows whose
+    updated_at is at or after the table's watermark (an indexed range scan
+    once create_change_indexes has run) plus the primary keys, so changed
+    rows are upserted and deleted rows dropped without rereading the table.
+    """
+
+    def __init__(self, db_path=DB_PATH, cache_dir=DB_CACHE_DIR):
+        self.db_path = str(db_path)
+        self.cache_dir = str(cache_dir)
+        self.watermarks_path = os.path.join(self.cache_dir, 'watermarks.json')
+        try:
+            with open(self.watermarks_path, 'r') as f:
+                self.watermarks = json.load(f)
+        except (OSError, ValueError):
+            self.watermarks = {}
+
+    def _cache_path(self, table):
+        return os.path.join(self.cache_dir, f"{table}.pkl")
+
+    def _read_cache(self, table):
+        if table not in self.watermarks or not os.path.exists(self._cache_path(table)):
+            return None
+        return pd.read_pickle(self._cache_path(table))
+
+    def _save(self, tables):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        for table, frame in tables.items():
+            frame.to_pickle(self._cache_path(table))
+        tmp_path = f"{self.watermarks_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.watermarks, f, indent=2)
+        os.replace(tmp_path, self.watermarks_path)
+
+    def _sync_table(self, conn, table):
+        """Return (current rows, trainset ids whose rows changed or disappeared)"""
+        spec = DB_TABLES[table]
+        key, columns = spec['key'], spec['columns']
+        trainset_column = 'trainset_id'
+        select = f"SELECT {', '.join(columns)}, {CHANGED_AT} FROM {table}"
+
+        cached = self._read_cache(table)
+        if cached is None:
+            frame = fetch_frame(conn, select, (), columns + ['changed_at'])
+            changed = set(frame[trainset_column].dropna())
+        else:
+            # >= so rows written in the same second as the watermark are not missed
+            delta = fetch_frame(conn, f"{select} WHERE {CHANGED_AT} >= ?",
+                                (self.watermarks[table],), columns + ['changed_at'])
+            keys = fetch_frame(conn, f"SELECT {key} FROM {table}", (), [key])[key]
+            removed = cached[~cached[key].isin(keys)]
+            kept = cached[cached[key].isin(keys) & ~cached[key].isin(delta[key])]
+            frame = pd.concat([kept, delta], ignore_index=True) if len(delta) else kept.reset_index(drop=True)
+            modified = delta[~_unchanged_rows(delta, cached, key, columns)]
+            changed = set(modified[trainset_column].dropna()) | set(removed[trainset_column].dropna())
+
+        if len(frame):
+            self.watermarks[table] = int(pd.to_numeric(frame['changed_at']).max())
+        else:
+            self.watermarks.setdefault(table, 0)
+        return frame, changed
+
+    def load(self):
+        """Bring every table up to date; returns (tables, changed trainset ids)"""
+        conn = connect_readonly(self.db_path)
+        try:
+            tables, changed = {}, set()
+            for table in DB_TABLES:
+                tables[table], table_changed = self._sync_table(conn, table)
+                changed |= table_changed
+        finally:
+            conn.close()
+        self._save(tables)
+        return tables, changed
+
+    def load_features(self, now=None):
+        """Per-train feature matrix plus the Train IDs whose rows changed"""
+        tables, changed = self.load()
+        matrix = db_feature_matrix(tables, now)
+        serials = tables['trainsets'].set_index('trainset_id')['serial_no']
+        changed_trains = [serials[t] for t in changed if t in serials.index]
+        return matrix, changed_trains
+
+def data_as_of(tables):
+    """Time of the latest write across the tables, or None when no row has one"""
+    latest = [pd.to_numeric(frame['changed_at']).max() for frame in tables.values()
+              if 'changed_at' in frame.columns and len(frame)]
+    latest = [value for value in latest if value == value]
+    return datetime.fromtimestamp(max(latest)) if latest else None
+
+def db_feature_matrix(tables, now=None):
+    """Build training features from the database tables, indexed like the upload feature matrix
+
+    Certificate expiry, overdue job cards and active branding are judged as
+    of now, which defaults to the latest write in the tables, so a copy of
+    the database is read as it stood when it was taken rather than against
+    today's clock.
+    """
+    from feature_store import TRAIN_KEY, AVAILABILITY_SCORES, MAINTENANCE_SCORES
+
+    now = int((now or data_as_of(tables) or datetime.now()).timestamp())
+    trainsets = tables['trainsets'].set_index('trainset_id')
+    index = trainsets.index
+
+    def per_trainset(values, fill=0):
+        return values.reindex(index).fillna(fill).astype('float32')
+
+    certificates = tables['fitness_certificates']
+    expired = (certificates['status'] == 'Expired') | (pd.to_numeric(certificates['valid_to']) < now)
+    pending = certificates['status'] == 'Pending'
+    certificate_flags = pd.DataFrame({
+        'trainset_id': certificates['trainset_id'],
+        'expired': expired.astype('int32'),
+        'pending': pending.astype('int32')
+    }).groupby('trainset_id').sum()
+    fitness_status = pd.Series(
+        np.select(
+            [certificate_flags['expired'] > 0, certificate_flags['pending'] > 0],
+            ['Expired', 'Pending'],
+            'Valid'
+        ),
+        index=certificate_flags.index
+    ).reindex(index)
+
+    job_cards = tables['job_cards']
+    is_open = job_cards['status'] != 'Closed'
+    is_overdue = is_open & (pd.to_numeric(job_cards['raised_date']) < now - OVERDUE_JOB_CARD_DAYS * 86400)
+    job_flags = pd.DataFrame({
+        'trainset_id': job_cards['trainset_id'],
+        'open': is_open.astype('int32'),
+        'overdue': is_overdue.astype('int32')
+    }).groupby('trainset_id').sum().reindex(index).fillna(0)
+    maintenance_status = np.select(
+        [job_flags['overdue'] > 0, job_flags['open'] > 0],
+        ['Overdue', 'Pending'],
+        'Completed'
+    )
+
+    alerts = tables['system_alerts']
+    alert_counts = alerts[alerts['is_dismissed'] == 0].groupby('trainset_id').size()
+
+    branding = tables['branding_priorities']
+    active = (pd.to_numeric(branding['start_date']) <= now) & (pd.to_numeric(branding['end_date']) >= now)
+    remaining = (branding['allocated_hours'] - branding['consumed_hours']).clip(lower=0)
+    branding_hours = remaining[active].groupby(branding['trainset_id'][active]).sum()
+
+    stabling = tables['stabling_geometry'].drop_duplicates('trainset_id', keep='last').set_index('trainset_id')
+    last_service = pd.to_numeric(trainsets['last_service_date'])
+
+    matrix = pd.DataFrame({
+        'Availability_Score': trainsets['status'].map(TRAINSET_AVAILABILITY).map(AVAILABILITY_SCORES).astype('float32'),
+        'Maintenance_Score': pd.Series(maintenance_status, index=index).map(MAINTENANCE_SCORES).astype('float32'),
+        'Alert_Count': per_trainset(alert_counts),
+        'Mileage': pd.to_numeric(trainsets['mileage_km']).astype('float32'),
+        'Fitness_Status': pd.Categorical(fitness_status, categories=FITNESS_STATUSES),
+        'Open_Job_Cards': job_flags['open'].astype('float32'),
+        'Days_Since_Service': ((now - last_service) / 86400).astype('float32'),
+        'Branding_Hours_Remaining': per_trainset(branding_hours),
+        'Stabling_Bay': per_trainset(stabling['bay_no'], fill=np.nan),
+        'Ready_For_Turnout': per_trainset(stabling['is_ready_for_turnout'])
+    }, index=index)
+    matrix.index = pd.CategoricalIndex(trainsets['serial_no'], name=TRAIN_KEY)
+    return matrix
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="KMRL SQLite training data loader")
+    parser.add_argument('--create-indexes', action='store_true',
+                        help='create the updated_at indexes used for change queries (needs write access)')
+    parser.add_argument('--full', action='store_true', help='ignore the local copy and reread every table')
+    args = parser.parse_args()
+
+    if args.create_indexes:
+        create_change_indexes()
+        print(f"✅ Change indexes created in {DB_PATH}")
+
+    loader = SQLiteLoader()
+    if args.full:
+        loader.watermarks = {}
+    matrix, changed = loader.load_features()
+    print(f"📊 {len(matrix)} trainsets x {len(matrix.columns)} features, {len(changed)} with changes since the last run")
+    print(matrix.head(10))
@@ -0,0 +1,129 @@
+"""
+KMRL Drift Detection
+Reference sketches of a model's training inputs and PSI/KS drift scores of new data against them
+"""
+
+import math
+
+from lazy_imports import lazy_import
+from config import TRAINING_CONFIG
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Floor for empty bins, so PSI stays finite
+PSI_EPSILON = 1e-4
+
+# Kolmogorov-Smirnov coefficient for a 5% significance level
+KS_COEFFICIENT = 1.358
+
+def _columns(X):
+    """{name: values} for a frame or a plain array, array columns named by position"""
+    if hasattr(X, 'columns'):
+        return {str(column): X[column] for column in X.columns}
+    values = np.asarray(X)
+    if values.ndim == 1:
+        return {'0': values}
+    return {str(i): values[:, i] for i in range(values.shape[1])}
+
+def sketch(values, bins=None):
+    """Summary of one input: quantile bin edges and proportions for numbers, category shares otherwise
+
+    Sketches are small and JSON-serialisable, so they are stored in the
+    model registry next to the version they describe.
+    """
+    bins = bins or TRAINING_CONFIG['drift_bins']
+    series = pd.Series(np.asarray(values)).dropna()
+    if not pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        shares = series.astype(str).value_counts(normalize=True)
+        return {'kind': 'categorical', 'rows': int(len(series)),
+                'shares': {str(k): float(v) for k, v in shares.items()}}
+
+    values = series.to_numpy(dtype=np.float64)
+    if not len(values):
+        return {'kind': 'numeric', 'rows': 0, 'edges': [], 'proportions': [1.0]}
+    edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+    return {
+        'kind': 'numeric',
+        'rows': int(len(values)),
+        'edges': edges.tolist(),
+        'proportions': _proportions(values, edges).tolist(),
+        'mean': float(values.mean())
+    }
+
+def _proportions(values, edges):
+    # Bin i holds (edges[i-1], edges[i]], so ties at a quantile share its bin
+    counts = np.bincount(np.searchsorted(edges, values, side='left'), minlength=len(edges) + 1)
+    return counts / max(len(values), 1)
+
+def build_reference(X, y=None, bins=None):
+    """Sketches of every feature of X and of the target y"""
+    return {
+        'rows': int(len(X)),
+        'features': {name: sketch(values, bins) for name, values in _columns(X).items()},
+        'target': sketch(y, bins) if y is not None else None
+    }
+
+def psi(expected, actual):
+    """Population stability index between two proportion vectors"""
+    expected = np.maximum(np.asarray(expected, dtype=np.float64), PSI_EPSILON)
+    actual = np.maximum(np.asarray(actual, dtype=np.float64), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+def compare(reference_sketch, values):
+    """{'psi', 'ks', 'psi_limit', 'ks_limit'} of new values against one reference sketch
+
+    KS is computed on the reference's bins. Both limits grow for small
+    samples: the KS limit is the statistic's 5% critical value, and PSI's
+    sampling noise, about (bins - 1) * (1/n + 1/m), is added to its
+    threshold, so a few dozen trains do not read as drift. Below
+    drift_psi_min_rows new values PSI is too coarse to judge and only KS
+    counts.
+    """
+    series = pd.Series(np.asarray(values)).dropna()
+    n, m = reference_sketch['rows'], len(series)
+    if not n or not m:
+        return {'psi': 0.0, 'ks': 0.0, 'psi_limit': math.inf, 'ks_limit': math.inf}
+
+    if reference_sketch['kind'] == 'categorical':
+        shares = series.astype(str).value_counts(normalize=True)
+        categories = sorted(set(reference_sketch['shares']) | set(shares.index))
+        expected = [reference_sketch['shares'].get(c, 0.0) for c in categories]
+        actual = [float(shares.get(c, 0.0)) for c in categories]
+        ks, ks_limit = 0.0, math.inf
+    else:
+        expected = reference_sketch['proportions']
+        actual = _proportions(series.to_numpy(dtype=np.float64), np.asarray(reference_sketch['edges']))
+        ks = float(np.max(np.abs(np.cumsum(actual) - np.cumsum(expected))))
+        ks_limit = KS_COEFFICIENT * math.sqrt((n + m) / (n * m))
+
+    noise = (len(expected) - 1) * (1 / n + 1 / m)
+    psi_limit = TRAINING_CONFIG['drift_psi_threshold'] + noise if m >= TRAINING_CONFIG['drift_psi_min_rows'] else math.inf
+    return {
+        'psi': round(psi(expected, actual), 4),
+        'ks': round(ks, 4),
+        'psi_limit': round(psi_limit, 4),
+        'ks_limit': round(ks_limit, 4)
+    }
+
+def drift_report(reference, X, y=None):
+    """(per-input comparison, names of the inputs that drifted); the target is reported as 'target'
+
+    X holds the rows to check with gaps left as NaN; missing values are
+    dropped rather than compared. An input the reference does not have, or
+    one it had that is now gone, counts as drifted.
+    """
+    columns = _columns(X)
+    report, drifted = {}, []
+    for name in sorted(set(columns) | set(reference['features'])):
+        if name not in columns or name not in reference['features']:
+            drifted.append(name)
+            continue
+        report[name] = compare(reference['features'][name], columns[name])
+    if y is not None and reference.get('target') is not None:
+        report['target'] = compare(reference['target'], y)
+
+    for name, scores in report.items():
+        if scores['psi'] > scores['psi_limit'] or scores['ks'] > scores['ks_limit']:
+            drifted.append(name)
+    return report, drifted
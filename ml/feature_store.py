@@ -0,0 +1,253 @@
+"""
+KMRL Feature Store
+Keeps each upload schema as its own typed table and joins them into one per-train feature matrix
+"""
+
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+TRAIN_KEY = 'Train ID'
+
+# Columns shared across schemas that are always stored as categoricals
+CATEGORICAL_COLUMNS = ['Train ID', 'Route ID', 'Station Name', 'Status']
+
+# Upload schemas, recognised by their signature columns
+SCHEMAS = {
+    'shifts': {
+        'signature': ['Shift ID', 'Staff ID', 'Train ID Assigned'],
+        'train_column': 'Train ID Assigned',
+        'categorical': ['Role', 'Staff ID'],
+        'dates': ['Shift Date'],
+        'numeric': []
+    },
+    'availability': {
+        'signature': ['Train ID', 'Availability Status'],
+        'train_column': 'Train ID',
+        'categorical': ['Availability Status', 'Assigned Route ID', 'Operator ID / Name'],
+        'dates': ['Assignment Date'],
+        'numeric': []
+    },
+    'alerts': {
+        'signature': ['Alert ID', 'Train ID', 'Severity'],
+        'train_column': 'Train ID',
+        'categorical': ['Issue Type', 'Severity', 'Reported By'],
+        'dates': ['Date Reported', 'Resolution Date'],
+        'numeric': []
+    },
+    'timetable': {
+        'signature': ['Train ID', 'Route ID', 'Station Name', 'Arrival Time'],
+        'train_column': 'Train ID',
+        'categorical': [],
+        'dates': [],
+        'numeric': ['Delay (mins)']
+    },
+    'maintenance': {
+        'signature': ['Train ID', 'Last Maintenance Date', 'Next Due Date'],
+        'train_column': 'Train ID',
+        'categorical': ['Maintenance Type'],
+        'dates': ['Last Maintenance Date', 'Next Due Date'],
+        'numeric': []
+    },
+    'training': {
+        'signature': ['Train_ID', 'Availability_Score'],
+        'train_column': 'Train_ID',
+        'categorical': ['Fitness_Status', 'Job_Card_Priority', 'Brand_Category', 'Cleaning_Slot'],
+        'dates': [],
+        'numeric': ['Availability_Score', 'Maintenance_Score', 'Mileage', 'Alert_Count', 'Station_Capacity']
+    }
+}
+
+AVAILABILITY_SCORES = {'Available': 100, 'Reserved': 80, 'Under Maintenance': 40, 'Out of Service': 0}
+MAINTENANCE_SCORES = {'Completed': 100, 'Pending': 75, 'Overdue': 40}
+SEVERE_ALERTS = ['High', 'Critical']
+
+# Per-train event counts; a train with no rows in the source table has none, not an unknown number
+COUNT_COLUMNS = ['Alert_Count', 'Open_Alert_Count', 'Severe_Alert_Count',
+                 'Timetable_Stops', 'Cancelled_Stops', 'Shift_Count']
+
+def detect_schema(columns):
+    """Return the name of the upload schema matching a set of columns, or None"""
+    columns = {str(c).strip() for c in columns}
+    for name, schema in SCHEMAS.items():
+        if all(col in columns for col in schema['signature']):
+            return name
+    return None
+
+def to_typed_table(df, schema_name):
+    """Convert a raw upload frame to the typed layout of its schema"""
+    schema = SCHEMAS[schema_name]
+    df = df.rename(columns=lambda c: str(c).strip())
+    df = df.drop(columns=['source_file'], errors='ignore')
+    df = df.rename(columns={schema['train_column']: TRAIN_KEY})
+
+    for col in schema['dates']:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col in schema['numeric']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float32')
+    for col in CATEGORICAL_COLUMNS + schema['categorical']:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    return df
+
+class FeatureStore:
+    """Typed per-schema tables plus a compact per-train feature matrix"""
+
+    def __init__(self):
+        self._parts = {}
+        self._tables = {}
+        self.unrecognised = []
+
+    def add(self, df, source=None):
+        """Register an upload frame under its detected schema"""
+        schema_name = detect_schema(df.columns)
+        if schema_name is None:
+            self.unrecognised.append(source)
+            return None
+        self._parts.setdefault(schema_name, []).append(to_typed_table(df, schema_name))
+        self._tables.pop(schema_name, None)
+        return schema_name
+
+    @property
+    def schemas(self):
+        return list(self._parts.keys())
+
+    def table(self, schema_name):
+        """Return the typed table for a schema, combining all uploads of that schema"""
+        if schema_name not in self._parts:
+            return None
+        if schema_name not in self._tables:
+            parts = self._parts[schema_name]
+            table = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+            # Concatenating categoricals with different categories falls back to object
+            schema = SCHEMAS[schema_name]
+            for col in CATEGORICAL_COLUMNS + schema['categorical']:
+                if col in table.columns and table[col].dtype != 'category':
+                    table[col] = table[col].astype('category')
+            self._tables[schema_name] = table
+        return self._tables[schema_name]
+
+    def memory_usage(self):
+        """Total bytes held by the typed tables"""
+        return sum(
+            int(self.table(name).memory_usage(deep=True).sum())
+            for name in self._parts
+        )
+
+    def feature_matrix(self):
+        """Materialise one numeric row per train, joined on Train ID"""
+        builders = {
+            'availability': _availability_features,
+            'maintenance': _maintenance_features,
+            'alerts': _alert_features,
+            'timetable': _timetable_features,
+            'shifts': _shift_features,
+            'training': _training_features
+        }
+        features = [
+            builder(self.table(name))
+            for name, builder in builders.items()
+            if name in self._parts
+        ]
+        if not features:
+            return pd.DataFrame()
+
+        matrix = features[0]
+        for frame in features[1:]:
+            # Columns already derived from an earlier schema keep their values, gaps are filled
+            overlap = [c for c in frame.columns if c in matrix.columns]
+            matrix = matrix.join(frame.drop(columns=overlap), how='outer')
+            for col in overlap:
+                matrix[col] = matrix[col].fillna(frame[col].reindex(matrix.index))
+
+        counts = [c for c in COUNT_COLUMNS if c in matrix.columns]
+        matrix[counts] = matrix[counts].fillna(0).astype('float32')
+
+        matrix.index = matrix.index.astype(str).astype('category')
+        matrix.index.name = TRAIN_KEY
+        return matrix
+
+def _latest_per_train(table, date_column=None):
+    table = table.dropna(subset=[TRAIN_KEY])
+    if date_column and date_column in table.columns:
+        table = table.sort_values(date_column, kind='stable')
+    return table.groupby(TRAIN_KEY, observed=True).tail(1).set_index(TRAIN_KEY)
+
+def _text_column(table, column):
+    """Stripped strings of a column, or None when the upload lacks it"""
+    if column not in table.columns:
+        return None
+    return table[column].astype(str).str.strip()
+
+def _availability_features(table):
+    latest = _latest_per_train(table, 'Assignment Date')
+    status = latest['Availability Status'].astype(str).str.strip()
+    scores = status.map(AVAILABILITY_SCORES).astype('float32')
+    return pd.DataFrame({'Availability_Score': scores})
+
+def _maintenance_features(table):
+    latest = _latest_per_train(table, 'Last Maintenance Date')
+    reference_date = table['Last Maintenance Date'].max()
+    days_since = (reference_date - latest['Last Maintenance Date']).dt.days
+    days_to_due = (latest['Next Due Date'] - reference_date).dt.days
+    features = pd.DataFrame({
+        'Days_Since_Maintenance': days_since.astype('float32'),
+        'Days_To_Maintenance_Due': days_to_due.astype('float32')
+    })
+    status = _text_column(latest, 'Status')
+    if status is not None:
+        features.insert(0, 'Maintenance_Score', status.map(MAINTENANCE_SCORES).astype('float32'))
+    return features
+
+def _alert_features(table):
+    table = table.dropna(subset=[TRAIN_KEY])
+    status = _text_column(table, 'Status')
+    # Without a status column every alert counts as open
+    is_open = status != 'Resolved' if status is not None else pd.Series(True, index=table.index)
+    is_severe = _text_column(table, 'Severity').isin(SEVERE_ALERTS)
+    flags = pd.DataFrame({
+        TRAIN_KEY: table[TRAIN_KEY],
+        'Alert_Count': 1,
+        'Open_Alert_Count': is_open.astype('int32'),
+        'Severe_Alert_Count': (is_open & is_severe).astype('int32')
+    })
+    return flags.groupby(TRAIN_KEY, observed=True).sum().astype('float32')
+
+def _timetable_features(table):
+    table = table.dropna(subset=[TRAIN_KEY])
+    stops = pd.DataFrame({TRAIN_KEY: table[TRAIN_KEY], 'Timetable_Stops': 1})
+    aggregations = {'Timetable_Stops': 'sum'}
+    if 'Delay (mins)' in table.columns:
+        stops['Avg_Delay_Mins'] = table['Delay (mins)']
+        aggregations['Avg_Delay_Mins'] = 'mean'
+    status = _text_column(table, 'Status')
+    if status is not None:
+        stops['Cancelled_Stops'] = (status == 'Cancelled').astype('int32')
+        aggregations['Cancelled_Stops'] = 'sum'
+    return stops.groupby(TRAIN_KEY, observed=True).agg(aggregations).astype('float32')
+
+def _shift_features(table):
+    table = table.dropna(subset=[TRAIN_KEY])
+    counts = table.groupby(TRAIN_KEY, observed=True).size()
+    return pd.DataFrame({'Shift_Count': counts.astype('float32')})
+
+def _training_features(table):
+    schema = SCHEMAS['training']
+    latest = _latest_per_train(table)
+    numeric = latest[[c for c in schema['numeric'] if c in latest.columns]].astype('float32')
+    labels = latest[[c for c in schema['categorical'] if c in latest.columns]]
+    return numeric.join(labels)
+
+def build_feature_store(frames):
+    """Build a feature store from (file_name, DataFrame) pairs"""
+    store = FeatureStore()
+    for file_name, df in frames:
+        store.add(df, source=file_name)
+    return store
+
+def frame_memory(df):
+    """Deep memory usage of a frame in bytes"""
+    return int(df.memory_usage(deep=True).sum()) if len(df.columns) else 0
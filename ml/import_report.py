@@ -0,0 +1,89 @@
+"""
+KMRL Import-Time Report
+Measures module startup cost with `python -X importtime` and checks it against STARTUP_BUDGET_MS
+"""
+
+import os
+import re
+import sys
+import subprocess
+
+from config import ML_BASE_DIR, STARTUP_BUDGET_MS
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+def measure_import(module, runs=3):
+    """Import a module in fresh interpreters and return (best total ms, slowest imports)
+
+    Each run is a new process so nothing is cached in sys.modules; the best
+    of several runs filters out disk-cache noise.
+    """
+    best_total = None
+    best_entries = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=str(ML_BASE_DIR),
+            capture_output=True,
+            text=True,
+            env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'}
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{completed.stderr}")
+
+        entries = []
+        for line in completed.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if match:
+                self_us, cumulative_us, indent, name = match.groups()
+                entries.append({
+                    'module': name,
+                    'self_ms': int(self_us) / 1000,
+                    'cumulative_ms': int(cumulative_us) / 1000,
+                    'depth': len(indent) // 2
+                })
+
+        total = next((e['cumulative_ms'] for e in reversed(entries) if e['module'] == module), None)
+        if total is not None and (best_total is None or total < best_total):
+            best_total = total
+            best_entries = entries
+
+    return best_total, best_entries
+
+def top_level_imports(entries, limit=8):
+    """Heaviest direct dependencies of the measured module"""
+    direct = [e for e in entries if e['depth'] == 1]
+    return sorted(direct, key=lambda e: e['cumulative_ms'], reverse=True)[:limit]
+
+def run_report(modules=None, check=False):
+    modules = modules or list(STARTUP_BUDGET_MS.keys())
+    over_budget = []
+
+    print("⏱️ KMRL ML import-time report")
+    print("=" * 50)
+    for module in modules:
+        total, entries = measure_import(module)
+        budget = STARTUP_BUDGET_MS.get(module)
+        within = budget is None or total <= budget
+        status = "✅" if within else "❌"
+        budget_text = f" (budget {budget} ms)" if budget is not None else ""
+        print(f"{status} {module}: {total:.1f} ms{budget_text}")
+        for entry in top_level_imports(entries):
+            print(f"     {entry['cumulative_ms']:8.1f} ms  {entry['module']}")
+        if not within:
+            over_budget.append(module)
+
+    if check and over_budget:
+        print(f"\n❌ Over startup budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="KMRL ML import-time report")
+    parser.add_argument('modules', nargs='*', help='modules to measure (default: all budgeted modules)')
+    parser.add_argument('--check', action='store_true', help='exit with status 1 if a module is over budget')
+    args = parser.parse_args()
+
+    sys.exit(run_report(args.modules, check=args.check))
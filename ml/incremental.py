@@ -0,0 +1,106 @@
+"""
+KMRL Incremental Learning
+Warm-start and partial_fit updates that train the existing models on new rows only
+"""
+
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+
+class IncrementalLinearRegression(RegressorMixin, BaseEstimator):
+    """Ordinary least squares that can be updated batch by batch
+
+    Keeps the sufficient statistics X'X and X'y, so partial_fit over any split
+    of the rows gives the same coefficients as a single LinearRegression fit.
+    Each row may be passed only once; a recomputed row for a sample already
+    seen would be counted twice.
+    """
+
+    def __init__(self, fit_intercept=True):
+        self.fit_intercept = fit_intercept
+
+    def fit(self, X, y):
+        for attr in ['xtx_', 'xty_', 'n_samples_seen_']:
+            if hasattr(self, attr):
+                delattr(self, attr)
+        return self.partial_fit(X, y)
+
+    def _design(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.fit_intercept:
+            X = np.hstack([X, np.ones((X.shape[0], 1))])
+        return X
+
+    def partial_fit(self, X, y):
+        if hasattr(X, 'columns'):
+            self.feature_names_in_ = np.asarray([str(c) for c in X.columns], dtype=object)
+        design = self._design(X)
+        y = np.asarray(y, dtype=np.float64)
+
+        if not hasattr(self, 'xtx_'):
+            self.n_features_in_ = design.shape[1] - int(self.fit_intercept)
+            self.xtx_ = np.zeros((design.shape[1], design.shape[1]))
+            self.xty_ = np.zeros(design.shape[1])
+            self.n_samples_seen_ = 0
+        elif design.shape[1] - int(self.fit_intercept) != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features, got {design.shape[1] - int(self.fit_intercept)}")
+
+        self.xtx_ += design.T @ design
+        self.xty_ += design.T @ y
+        self.n_samples_seen_ += design.shape[0]
+
+        solution = np.linalg.lstsq(self.xtx_, self.xty_, rcond=None)[0]
+        if self.fit_intercept:
+            self.coef_, self.intercept_ = solution[:-1], solution[-1]
+        else:
+            self.coef_, self.intercept_ = solution, 0.0
+        return self
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+def update_model(model, X_new, y_new=None, extra_estimators=10):
+    """Update a fitted model with only the new rows
+
+    Returns the updated model, or None when this model type or batch cannot be
+    learned incrementally and a full refit is needed instead.
+    """
+    from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    from sklearn.preprocessing import StandardScaler
+
+    if len(X_new) == 0:
+        return None
+
+    if isinstance(model, RandomForestClassifier):
+        # Added trees must see every known class or their votes would not line up
+        if set(np.unique(y_new)) != set(model.classes_):
+            return None
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + extra_estimators)
+        return model.fit(X_new, y_new)
+
+    if isinstance(model, GradientBoostingRegressor):
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + extra_estimators)
+        return model.fit(X_new, y_new)
+
+    if isinstance(model, IncrementalLinearRegression):
+        return model.partial_fit(X_new, y_new)
+
+    if isinstance(model, StandardScaler):
+        return model.partial_fit(X_new)
+
+    if isinstance(model, MiniBatchKMeans):
+        return model.partial_fit(X_new)
+
+    if isinstance(model, KMeans):
+        # Seed a mini-batch model with the fitted centres, weighted by cluster size
+        sizes = np.bincount(model.labels_, minlength=model.n_clusters).astype(np.float64)
+        mini_batch = MiniBatchKMeans(
+            n_clusters=model.n_clusters,
+            init=model.cluster_centers_,
+            n_init=1,
+            random_state=model.random_state
+        )
+        mini_batch.partial_fit(model.cluster_centers_, sample_weight=np.maximum(sizes, 1))
+        return mini_batch.partial_fit(X_new)
+
+    return None
@@ -0,0 +1,259 @@
+"""
+KMRL Induction Planner
+Assigns Service/Standby/Maintenance under fitness, job card, branding and mileage constraints, re-planning one trainset at a time
+"""
+
+import time
+from bisect import bisect_left, insort
+
+from config import PLANNER_CONFIG
+
+# Per-train inputs and the value used when a fleet frame lacks the column
+PLAN_INPUTS = {
+    'Induction Score': 0,
+    'Status': 'Active',
+    'Fitness Status': PLANNER_CONFIG['missing_certificate'],
+    'Overdue Maintenance': False,
+    'Open Job Cards': 0,
+    'Branding Hours Remaining': 0.0,
+    'Mileage': None
+}
+
+# Decision -> (Recommendation, Priority Level) shown for a planned train, in result order
+DECISION_RECOMMENDATIONS = {
+    'Service': ("✅ SERVICE INDUCTION", "HIGH"),
+    'Standby': ("⚠️ STANDBY", "LOW"),
+    'Maintenance': ("❌ MAINTENANCE HOLD", "NONE")
+}
+
+# Inputs that make up the induction score; changing one rescores the train
+SCORE_INPUTS = ('Availability Score', 'Maintenance Score', 'Alert Count')
+
+def _missing(value):
+    return value is None or value != value
+
+class InductionPlanner:
+    """Service/Standby/Maintenance plan that can be updated one trainset at a time
+
+    Hard constraints decide which trains may run at all: a trainset in
+    maintenance, an expired fitness certificate or overdue job cards send a
+    train to Maintenance, as does an induction score below
+    min_service_score, and a pending certificate holds it in Standby. The
+    remaining trains are ranked by a service utility (induction score, plus
+    branding hours still owed, plus low mileage to balance wear, minus open
+    job cards) and the best service_trains of them go into Service, which
+    maximises the fleet's total utility for that many slots.
+
+    The ranking is kept as a sorted list, so update() re-solves a single
+    train's change by moving it in the ranking and deciding again only for
+    it and the trains at the Service cut-off, which are the only ones whose
+    decision can flip. Mileage is normalised with the fleet statistics of the
+    last full plan so one train's change cannot shift everyone's utility.
+    """
+
+    def __init__(self, service_trains=None, min_service_score=None, weights=None):
+        self.service_trains = service_trains if service_trains is not None else PLANNER_CONFIG['service_trains']
+        self.min_service_score = (min_service_score if min_service_score is not None
+                                  else PLANNER_CONFIG['min_service_score'])
+        self.weights = {**PLANNER_CONFIG['weights'], **(weights or {})}
+        self.trains = {}
+        self.ranked = []
+        self.keys = {}
+        self.decisions = {}
+        self.reasons = {}
+        # Trains planned with the missing_certificate default rather than a certificate on record
+        self.uncertified = set()
+
+    def _constraint(self, attrs):
+        """(decision, reason) forced by a hard constraint, or None when the train may run"""
+        if attrs['Status'] == 'Maintenance':
+            return 'Maintenance', 'Trainset is in maintenance'
+        if attrs['Fitness Status'] == 'Expired':
+            return 'Maintenance', 'Fitness certificate expired'
+        if attrs['Overdue Maintenance']:
+            return 'Maintenance', 'Overdue job cards'
+        if attrs['Induction Score'] < self.min_service_score:
+            return 'Maintenance', f"Induction score {attrs['Induction Score']:.0f} below {self.min_service_score}"
+        if attrs['Fitness Status'] == 'Pending':
+            return 'Standby', 'Fitness certificate pending'
+        return None
+
+    def _utility(self, attrs):
+        weights = self.weights
+        utility = weights['score'] * attrs['Induction Score']
+        utility += weights['branding'] * min(attrs['Branding Hours Remaining'] / PLANNER_CONFIG['branding_hours_scale'], 1.0)
+        utility -= weights['job_cards'] * attrs['Open Job Cards']
+        if not _missing(attrs['Mileage']) and self.mileage_spread:
+            utility -= weights['mileage'] * (attrs['Mileage'] - self.mileage_mean) / self.mileage_spread
+        return utility
+
+    def _rank(self, train_id):
+        """Place a train in the ranking when it may run; returns its constraint, if any"""
+        attrs = self.trains[train_id]
+        constraint = self._constraint(attrs)
+        if constraint is None:
+            key = (-self._utility(attrs), train_id)
+            self.keys[train_id] = key
+            insort(self.ranked, key)
+        return constraint
+
+    def _unrank(self, train_id):
+        key = self.keys.pop(train_id, None)
+        if key is not None:
+            del self.ranked[bisect_left(self.ranked, key)]
+
+    def _decide(self, train_id, constraint=None):
+        key = self.keys.get(train_id)
+        if key is None:
+            decision, reason = constraint or self._constraint(self.trains[train_id])
+        else:
+            position = bisect_left(self.ranked, key)
+            if position < self.service_trains:
+                decision, reason = 'Service', f"Within the {self.service_trains} service slots (utility {-key[0]:.1f})"
+            else:
+                decision, reason = 'Standby', f"Serviceable, behind the {self.service_trains} service slots (utility {-key[0]:.1f})"
+            if train_id in self.uncertified:
+                reason += ", no fitness certificate on record"
+        self.decisions[train_id] = decision
+        self.reasons[train_id] = reason
+        return decision
+
+    def _cutoff(self):
+        """Trains on either side of the Service cut-off"""
+        start = max(self.service_trains - 1, 0)
+        return [train_id for _, train_id in self.ranked[start:self.service_trains + 1]]
+
+    def plan(self, fleet):
+        """Full plan for a fleet frame with a 'Train ID' column and any of PLAN_INPUTS"""
+        records = fleet.to_dict('records')
+        self.trains = {
+            record['Train ID']: {
+                **record,
+                **{column: (default if _missing(record.get(column)) else record[column])
+                   for column, default in PLAN_INPUTS.items() if column != 'Mileage'},
+                'Mileage': record.get('Mileage')
+            }
+            for record in records
+        }
+        self.uncertified = {record['Train ID'] for record in records if _missing(record.get('Fitness Status'))}
+        if self.uncertified:
+            print(f"⚠️ {len(self.uncertified)} trains have no fitness certificate on record, "
+                  f"planned as {PLAN_INPUTS['Fitness Status']}")
+        mileage = [attrs['Mileage'] for attrs in self.trains.values() if not _missing(attrs['Mileage'])]
+        self.mileage_mean = sum(mileage) / len(mileage) if mileage else 0.0
+        self.mileage_spread = (
+            (sum((m - self.mileage_mean) ** 2 for m in mileage) / len(mileage)) ** 0.5 if mileage else 0.0
+        )
+
+        self.ranked, self.keys = [], {}
+        constraints = {train_id: self._rank(train_id) for train_id in self.trains}
+        for train_id, constraint in constraints.items():
+            self._decide(train_id, constraint)
+        if len(self.ranked) < self.service_trains:
+            print(f"⚠️ Only {len(self.ranked)} serviceable trains for {self.service_trains} service slots")
+        return self.to_frame()
+
+    def update(self, train_id, changes):
+        """Apply one trainset's overnight changes and return {Train ID: new decision} for every flip"""
+        if train_id not in self.trains:
+            raise KeyError(f"Unknown train: {train_id}")
+        attrs = self.trains[train_id]
+        attrs.update(changes)
+        if 'Fitness Status' in changes:
+            self.uncertified.discard(train_id)
+        if any(column in changes for column in SCORE_INPUTS) and 'Induction Score' not in changes:
+            from quick_fix import induction_score
+            attrs['Induction Score'] = float(induction_score(
+                attrs['Availability Score'], attrs['Maintenance Score'], attrs['Alert Count']
+            ))
+
+        before = {t: self.decisions[t] for t in self._cutoff()}
+        before[train_id] = self.decisions[train_id]
+        self._unrank(train_id)
+        constraint = self._rank(train_id)
+        affected = set(before) | set(self._cutoff())
+
+        changed = {}
+        for t in affected:
+            previous = before.get(t, self.decisions[t])
+            decision = self._decide(t, constraint if t == train_id else None)
+            if decision != previous:
+                changed[t] = decision
+        return changed
+
+    def to_frame(self):
+        import pandas as pd
+
+        ranks = {train_id: i + 1 for i, (_, train_id) in enumerate(self.ranked)}
+        return pd.DataFrame({
+            'Train ID': list(self.trains),
+            'Decision': [self.decisions[t] for t in self.trains],
+            'Plan Rank': pd.array([ranks.get(t) for t in self.trains], dtype='Int64'),
+            'Plan Reason': [self.reasons[t] for t in self.trains]
+        })
+
+def plan_induction(results_df, fleet_df=None, planner=None):
+    """Add the planner's Decision, Plan Rank and Plan Reason to scored induction results
+
+    Recommendation and Priority Level are replaced by the ones for the
+    planned Decision, and the results come back in plan order: Service,
+    Standby, then Maintenance, each by Plan Rank and then score.
+    """
+    planner = planner or InductionPlanner()
+    fleet = results_df
+    if fleet_df is not None:
+        extra = [c for c in fleet_df.columns if c not in results_df.columns or c == 'Train ID']
+        fleet = results_df.merge(fleet_df[extra], on='Train ID', how='left')
+    plan = planner.plan(fleet)
+    results_df = results_df.merge(plan, on='Train ID', how='left')
+
+    planned = results_df['Decision'].notna()
+    for i, column in enumerate(('Recommendation', 'Priority Level')):
+        if column in results_df.columns:
+            results_df.loc[planned, column] = results_df.loc[planned, 'Decision'].map(
+                {decision: labels[i] for decision, labels in DECISION_RECOMMENDATIONS.items()})
+
+    order = results_df['Decision'].map({decision: i for i, decision in enumerate(DECISION_RECOMMENDATIONS)})
+    keys = results_df.assign(_order=order.fillna(len(DECISION_RECOMMENDATIONS)), _score=-results_df['Induction Score'])
+    columns = (['Date'] if 'Date' in results_df.columns else []) + ['_order', 'Plan Rank', '_score']
+    index = keys.sort_values(columns, kind='stable', na_position='last').index
+    return results_df.loc[index].reset_index(drop=True), planner
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="KMRL constraint-based induction planner")
+    parser.add_argument('--change', nargs='+', metavar=('TRAIN_ID', 'COLUMN=VALUE'),
+                        help="re-plan after one train's change, e.g. --change TS005 Status=Maintenance")
+    args = parser.parse_args()
+
+    from quick_fix import load_db_fleet, score_fleet
+
+    fleet_df = load_db_fleet()
+    if fleet_df is None:
+        raise SystemExit(1)
+    started = time.perf_counter()
+    results_df, planner = plan_induction(score_fleet(fleet_df), fleet_df)
+    elapsed = time.perf_counter() - started
+    counts = results_df['Decision'].value_counts().to_dict()
+    print(f"📋 Full plan for {len(results_df)} trains in {elapsed * 1000:.1f} ms: {json.dumps(counts)}")
+
+    if args.change:
+        train_id, assignments = args.change[0], args.change[1:]
+        changes = {}
+        for assignment in assignments:
+            column, value = assignment.split('=', 1)
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+            changes[column] = value
+        started = time.perf_counter()
+        changed = planner.update(train_id, changes)
+        elapsed = time.perf_counter() - started
+        print(f"🔁 Re-planned {train_id} {changes} in {elapsed * 1000:.3f} ms")
+        for t, decision in changed.items():
+            print(f"   {t}: {decision} ({planner.reasons[t]})")
+    else:
+        print(results_df[['Train ID', 'Induction Score', 'Decision', 'Plan Reason']].head(15).to_string(index=False))
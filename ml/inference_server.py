@@ -0,0 +1,451 @@
+"""
+KMRL AI Inference Server
+Resident Python process that keeps the trained models warm and serves predictions over localhost HTTP
+"""
+
+import sys
+import math
+import json
+import time
+import threading
+import subprocess
+import traceback
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from config import ML_BASE_DIR, TRAINED_MODELS_DIR, INFERENCE_SERVER_CONFIG, STABLING_CONFIG
+from auto_retrain import log_message
+from retrain_scheduler import RetrainScheduler
+from model_registry import load_artifact, published_artifacts
+from preprocessing import PREPROCESSOR_SUFFIX
+from compiled_trees import COMPILED_SUFFIX, tree_signature
+import quick_fix
+from induction_planner import InductionPlanner, PLAN_INPUTS, SCORE_INPUTS
+import stabling
+import scenario_simulator
+from result_cache import ResultCache, induction_key, prediction_key
+
+class ModelStore:
+    """Loads every trained model once and hot-reloads artifacts that change on disk
+
+    Reloads build a new snapshot of all loaded artifacts and swap it in
+    whole, so a reader sees a model together with the companions published
+    with it.
+    """
+
+    def __init__(self, models_dir=TRAINED_MODELS_DIR, check_interval=1.0):
+        self.models_dir = str(models_dir)
+        self.check_interval = check_interval
+        # (models, versions, loaded_at), each keyed by artifact name
+        self._snapshot = ({}, {}, {})
+        # name -> ((model version, compiled version), whether the compiled artifact matches)
+        self._compiled_checks = {}
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """Reload models whose published version changed since they were loaded"""
+        now = time.monotonic()
+        if not force and now - self._last_check < self.check_interval:
+            return []
+        with self._lock:
+            self._last_check = now
+            published = published_artifacts(self.models_dir)
+            models, versions, loaded_at = (dict(part) for part in self._snapshot)
+            reloaded = []
+            for name, (path, version) in published.items():
+                if versions.get(name) == version:
+                    continue
+                try:
+                    models[name] = load_artifact(path)
+                    versions[name] = version
+                    loaded_at[name] = datetime.now().isoformat()
+                    reloaded.append(name)
+                except Exception as e:
+                    # Keep serving the previous version, e.g. while a pickle is being written
+                    log_message(f"⚠️ Could not load {name}: {e}")
+            removed = [n for n in models if n not in published]
+            for name in removed:
+                del models[name]
+                del versions[name]
+                del loaded_at[name]
+            if reloaded or removed:
+                self._snapshot = (models, versions, loaded_at)
+            if reloaded:
+                log_message(f"📦 Loaded models: {', '.join(sorted(reloaded))}")
+            return reloaded
+
+    def get(self, name):
+        self.refresh()
+        return self._snapshot[0].get(name)
+
+    def bundle(self, name):
+        """(model, preprocessor, compiled, versions) of one model, all taken from the same snapshot"""
+        self.refresh()
+        models, versions, _ = self._snapshot
+        model = models.get(name)
+        preprocessor_name, compiled_name = f"{name}{PREPROCESSOR_SUFFIX}", f"{name}{COMPILED_SUFFIX}"
+        compiled = models.get(compiled_name)
+        if compiled is not None and model is not None:
+            key = (versions.get(name), versions.get(compiled_name))
+            with self._lock:
+                checked = self._compiled_checks.get(name)
+                if checked is None or checked[0] != key:
+                    # A compiled artifact left over from an earlier model is ignored
+                    checked = self._compiled_checks[name] = (key, compiled.signature == tree_signature(model))
+            compiled = compiled if checked[1] else None
+        return model, models.get(preprocessor_name), compiled, [versions.get(name), versions.get(preprocessor_name)]
+
+    def status(self):
+        self.refresh()
+        models, _, loaded_at = self._snapshot
+        return {
+            name: {
+                'type': type(model).__name__,
+                'loaded_at': loaded_at[name],
+                'features': list(getattr(model, 'feature_names_in_', []))
+            }
+            for name, model in sorted(models.items())
+        }
+
+def rows_to_frame(model, rows, preprocessor=None):
+    """Build a model input frame from a list of row dicts or value lists
+
+    With the preprocessor saved at training time, gaps and missing features
+    are filled with the training statistics instead of being rejected.
+    """
+    feature_names = list(getattr(model, 'feature_names_in_', []))
+    if preprocessor is not None and preprocessor.columns != feature_names:
+        # Left over from an earlier version of the model trained on other features
+        preprocessor = None
+    if rows and isinstance(rows[0], dict):
+        frame = pd.DataFrame(rows)
+        if preprocessor is not None:
+            return preprocessor.transform(frame)
+        if feature_names:
+            missing = [f for f in feature_names if f not in frame.columns]
+            if missing:
+                raise ValueError(f"Missing features: {', '.join(missing)}")
+            frame = frame[feature_names]
+        return frame
+    if feature_names:
+        frame = pd.DataFrame(rows, columns=feature_names)
+        return preprocessor.transform(frame) if preprocessor is not None else frame
+    return pd.DataFrame(rows)
+
+# Most scenarios, drawn or listed, one request may ask for
+SIMULATION_LIMIT = 1_000_000
+
+def _is_int(value):
+    """True for JSON integers; bool is an int subclass but not a count"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _is_number(value):
+    """True for finite JSON numbers, bool excluded"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+# Planner inputs a re-plan may change, and the check each value must pass
+REPLAN_FIELDS = {
+    **{column: (_is_number, 'a number') for column in PLAN_INPUTS},
+    **{column: (_is_number, 'a number') for column in SCORE_INPUTS},
+    'Status': (lambda value: isinstance(value, str), 'a string'),
+    'Fitness Status': (lambda value: value in ('Valid', 'Pending', 'Expired'), 'Valid, Pending or Expired'),
+    'Overdue Maintenance': (lambda value: isinstance(value, bool), 'true or false')
+}
+
+def _replan_error(changes):
+    """Why a re-plan's changes cannot be applied, or None"""
+    for column, value in changes.items():
+        if column not in REPLAN_FIELDS:
+            return f"Unknown change: {column}"
+        check, expected = REPLAN_FIELDS[column]
+        if not check(value):
+            return f"{column} must be {expected}"
+    return None
+
+def _stabling_error(body):
+    """Why a stabling request's blocked positions or weights cannot be used, or None"""
+    blocked, weights = body.get('blocked'), body.get('weights')
+    if blocked is not None and (not isinstance(blocked, list) or not all(isinstance(slot, str) for slot in blocked)):
+        return 'blocked must be a list of positions like Depot1:4:2'
+    if weights is not None and not isinstance(weights, dict):
+        return 'weights must be an object'
+    for name, value in (weights or {}).items():
+        if name not in STABLING_CONFIG['weights']:
+            return f"Unknown weight: {name}"
+        if not _is_number(value) or value < 0:
+            return f"weight {name} must be a non-negative number"
+    return None
+
+def to_jsonable(values):
+    return [v.item() if hasattr(v, 'item') else v for v in values]
+
+class InferenceService:
+    """Request handlers shared by every HTTP worker thread"""
+
+    def __init__(self, model_store, scheduler=None):
+        self.models = model_store
+        self.started_at = datetime.now().isoformat()
+        self.scheduler = scheduler or RetrainScheduler()
+        # The latest induction plan, kept warm for /induction/replan
+        self.planner = InductionPlanner()
+        self.planner_lock = threading.Lock()
+        self.cache = ResultCache()
+
+    def health(self, _body):
+        return 200, {
+            'success': True,
+            'status': 'ok',
+            'started_at': self.started_at,
+            'models': self.models.status(),
+            'retraining': self.scheduler.status(),
+            'cache': self.cache.stats()
+        }
+
+    def predict(self, model_name, body):
+        model, preprocessor, compiled, versions = self.models.bundle(model_name)
+        if model is None:
+            return 404, {'success': False, 'error': f"Unknown model: {model_name}"}
+        rows = body.get('rows') or []
+        if not rows:
+            return 400, {'success': False, 'error': 'No rows provided'}
+
+        key = prediction_key(model_name, versions, body)
+
+        # Small requests score tree ensembles from their compiled node arrays when available
+        use_compiled = INFERENCE_SERVER_CONFIG['compiled_trees'] and len(rows) < INFERENCE_SERVER_CONFIG['compiled_max_rows']
+        scorer = (use_compiled and compiled) or model
+
+        def compute():
+            frame = rows_to_frame(model, rows, preprocessor)
+            if hasattr(model, 'predict'):
+                predictions = scorer.predict(frame)
+            else:
+                predictions = model.transform(frame)
+            result = {'success': True, 'model': model_name, 'predictions': to_jsonable(predictions)}
+            if hasattr(model, 'predict_proba') and body.get('probabilities'):
+                result['classes'] = to_jsonable(model.classes_)
+                result['probabilities'] = scorer.predict_proba(frame).tolist()
+            return result
+
+        # Memory only: request rows rarely repeat across restarts, dashboard refreshes do
+        result, cached = self.cache.get_or_compute(key, compute, persist=False)
+        return 200, {**result, 'cached': cached}
+
+    def predict_batch(self, body):
+        """Run several models over the same rows in one request"""
+        results = {}
+        for model_name in body.get('models') or []:
+            status, result = self.predict(model_name, body)
+            if status != 200:
+                return status, result
+            results[model_name] = result['predictions']
+        return 200, {'success': True, 'predictions': results}
+
+    def induction(self, body):
+        """Induction results for the current inputs; {"refresh": true} recomputes them regardless"""
+        key = induction_key()
+        records = None if body.get('refresh') else self.cache.get(key)
+        cached = records is not None
+        if cached:
+            # Today's plan was stored by the run that filled the cache
+            if body.get('save', True) and not quick_fix.INDUCTION_RESULTS_PATH.exists():
+                quick_fix.store_induction_results(quick_fix.results_from_records(records))
+        else:
+            with self.planner_lock:
+                results_df = quick_fix.build_induction_results(planner=self.planner)
+            if body.get('save', True):
+                quick_fix.store_induction_results(results_df)
+            records = quick_fix.induction_records(results_df)
+            self.cache.put(key, records)
+        return 200, {
+            'success': True,
+            'totalTrains': len(records),
+            'results': records,
+            'cached': cached,
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def replan(self, body):
+        """Re-plan after one trainset's change, e.g. {"trainId": "TS005", "changes": {"Status": "Maintenance"}}"""
+        if not body.get('trainId') or not isinstance(body.get('changes'), dict):
+            return 400, {'success': False, 'error': 'trainId and changes are required'}
+        error = _replan_error(body['changes'])
+        if error:
+            return 400, {'success': False, 'error': error}
+        started = time.perf_counter()
+        with self.planner_lock:
+            if not self.planner.trains:
+                quick_fix.build_induction_results(planner=self.planner)
+            try:
+                changed = self.planner.update(body['trainId'], body['changes'])
+            except KeyError as e:
+                return 404, {'success': False, 'error': str(e.args[0])}
+            plan = self.planner.to_frame()
+        return 200, {
+            'success': True,
+            'changed': changed,
+            'plan': plan.astype(object).where(plan.notna(), None).to_dict('records'),
+            'replanMs': round((time.perf_counter() - started) * 1000, 3),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def simulate(self, body):
+        """What-if scenarios: explicit ones under 'scenarios', or 'count' Monte Carlo draws at 'rates'"""
+        scenarios = body.get('scenarios')
+        if scenarios is not None and (not isinstance(scenarios, list) or not all(isinstance(s, dict) for s in scenarios)):
+            return 400, {'success': False, 'error': 'scenarios must be a list of objects'}
+        if scenarios is not None and not 0 < len(scenarios) <= SIMULATION_LIMIT:
+            return 400, {'success': False, 'error': f'scenarios must hold between 1 and {SIMULATION_LIMIT} scenarios'}
+        count = body.get('count')
+        if count is not None and (not _is_int(count) or not 0 < count <= SIMULATION_LIMIT):
+            return 400, {'success': False, 'error': f'count must be between 1 and {SIMULATION_LIMIT}'}
+        seed = body.get('seed')
+        if seed is not None and (not _is_int(seed) or seed < 0):
+            return 400, {'success': False, 'error': 'seed must be a non-negative integer'}
+
+        fleet_df = scenario_simulator.load_fleet()
+        service_trains = body.get('serviceTrains')
+        if service_trains is not None and (not _is_int(service_trains) or not 0 < service_trains <= len(fleet_df)):
+            return 400, {'success': False, 'error': f'serviceTrains must be between 1 and {len(fleet_df)}'}
+        try:
+            summary, trains, _ = scenario_simulator.simulate(
+                fleet_df, scenarios=scenarios, n_scenarios=count,
+                rates=body.get('rates'), seed=seed, service_trains=service_trains
+            )
+        except ValueError as e:
+            return 400, {'success': False, 'error': str(e)}
+        return 200, {
+            'success': True,
+            'summary': summary,
+            'trains': trains.to_dict('records'),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def stabling(self, body):
+        """Re-solve tonight's bay assignment, optionally with positions taken out of use"""
+        error = _stabling_error(body)
+        if error:
+            return 400, {'success': False, 'error': error}
+        started = time.perf_counter()
+        try:
+            plan = stabling.plan_stabling(blocked=body.get('blocked'), weights=body.get('weights'))
+        except ValueError as e:
+            return 400, {'success': False, 'error': str(e)}
+        plan = plan.astype(object).where(plan.notna(), None)
+        return 200, {
+            'success': True,
+            'summary': stabling.summarize_plan(plan),
+            'assignments': plan.to_dict('records'),
+            'solveMs': round((time.perf_counter() - started) * 1000, 1),
+            'timestamp': datetime.now().isoformat()
+        }
+
+    def retrain(self, body):
+        """Queue an upload with the retrain scheduler in a separate process
+
+        Training runs outside the server so it neither competes with request
+        threads for the GIL nor touches the pipeline state this process
+        imports; the models are reloaded once the scheduler exits.
+        """
+        if not body.get('filepath') or not body.get('filename'):
+            return 400, {'success': False, 'error': 'filepath and filename are required'}
+        depth = len(self.scheduler.pending()) + 1
+        process = subprocess.Popen(
+            [sys.executable, str(ML_BASE_DIR / 'retrain_scheduler.py'), 'submit', body['filepath'], body['filename']],
+            cwd=str(ML_BASE_DIR)
+        )
+        threading.Thread(target=self._await_retrain, args=(process,), daemon=True).start()
+        return 202, {'success': True, 'accepted': True, 'queueDepth': depth, 'pid': process.pid}
+
+    def _await_retrain(self, process):
+        # Exits straight away if another process is already the runner, which reloads when it finishes
+        if process.wait() == 0:
+            self.models.refresh(force=True)
+        else:
+            log_message(f"⚠️ Scheduled retrain exited with code {process.returncode}")
+
+    def dispatch(self, method, path, body):
+        path = path.split('?', 1)[0].rstrip('/')
+        if method == 'GET' and path == '/health':
+            return self.health(body)
+        if method == 'POST' and path == '/induction':
+            return self.induction(body)
+        if method == 'POST' and path == '/induction/replan':
+            return self.replan(body)
+        if method == 'POST' and path == '/simulate':
+            return self.simulate(body)
+        if method == 'POST' and path == '/stabling':
+            return self.stabling(body)
+        if method == 'POST' and path == '/predict':
+            return self.predict_batch(body)
+        if method == 'POST' and path.startswith('/predict/'):
+            return self.predict(path[len('/predict/'):], body)
+        if method == 'POST' and path == '/retrain':
+            return self.retrain(body)
+        return 404, {'success': False, 'error': f"Unknown endpoint: {method} {path}"}
+
+def make_handler(service):
+    class InferenceRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _handle(self, method):
+            started = time.perf_counter()
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+                status, payload = service.dispatch(method, self.path, body)
+            except (ValueError, KeyError) as e:
+                status, payload = 400, {'success': False, 'error': str(e)}
+            except Exception as e:
+                traceback.print_exc()
+                status, payload = 500, {'success': False, 'error': str(e)}
+
+            payload['durationMs'] = round((time.perf_counter() - started) * 1000, 2)
+            data = json.dumps(payload, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def log_message(self, format, *args):
+            # Request logging is left to the Next.js side
+            pass
+
+    return InferenceRequestHandler
+
+def run_server(host=None, port=None):
+    host = host or INFERENCE_SERVER_CONFIG['host']
+    port = port or INFERENCE_SERVER_CONFIG['port']
+
+    models = ModelStore(check_interval=INFERENCE_SERVER_CONFIG['reload_check_interval'])
+    service = InferenceService(models)
+
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    log_message(f"🚀 KMRL inference server listening on http://{host}:{port} ({len(models.status())} models)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log_message("🛑 Inference server stopped")
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="KMRL AI Inference Server")
+    parser.add_argument('--host', default=None)
+    parser.add_argument('--port', type=int, default=None)
+    args = parser.parse_args()
+
+    sys.exit(run_server(args.host, args.port))
@@ -0,0 +1,377 @@
+"""
+KMRL Upload Ingestion Cache
+Keeps a manifest of processed uploads and a columnar cache of their parsed rows
+"""
+
+import os
+import re
+import csv
+import json
+import hashlib
+import warnings
+from datetime import datetime
+from lazy_imports import lazy_import
+
+pd = lazy_import('pandas')
+
+from config import UPLOADS_DIR, INGEST_CACHE_DIR, UPLOAD_MANIFEST_PATH, QUARANTINE_PATH
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+CACHE_FORMAT = 'parquet' if HAS_PYARROW else 'pickle'
+
+# Version 2: uploads are parsed with their schema's declared dtypes
+MANIFEST_VERSION = 2
+
+# Parsing works on bounded pieces of a file so its working memory does not grow with file size
+CHUNK_ROWS = 100_000
+ARROW_BLOCK_SIZE = 16 << 20
+
+SKIPPED_LINE = re.compile(r'Skipping line (\d+): ([^\n]*)')
+
+def file_digest(file_path, chunk_size=1 << 20):
+    """Compute the SHA-256 content hash of a file"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class UploadManifest:
+    """Persistent record of every upload that has already been parsed"""
+
+    def __init__(self, path=UPLOAD_MANIFEST_PATH, cache_dir=INGEST_CACHE_DIR):
+        self.path = str(path)
+        self.cache_dir = str(cache_dir)
+        self.files = {}
+        self.hashes = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return
+        if manifest.get('version') != MANIFEST_VERSION:
+            return
+        self.files = manifest.get('files', {})
+        self.hashes = manifest.get('hashes', {})
+
+    def save(self):
+        """Atomically write the manifest to disk"""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': MANIFEST_VERSION,
+                'files': self.files,
+                'hashes': self.hashes
+            }, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def is_current(self, file_name, stat):
+        """Check whether a file is unchanged since it was last recorded"""
+        entry = self.files.get(file_name)
+        return (
+            entry is not None
+            and entry['mtime'] == stat.st_mtime
+            and entry['size'] == stat.st_size
+        )
+
+    def cache_path(self, sha256, cache_format):
+        extension = 'parquet' if cache_format == 'parquet' else 'pkl'
+        return os.path.join(self.cache_dir, f"{sha256}.{extension}")
+
+    def read_cached(self, file_name):
+        """Load the cached rows of a recorded file, or None if the cache is gone"""
+        entry = self.files[file_name]
+        cache_file = self.cache_path(entry['sha256'], entry['format'])
+        if not os.path.exists(cache_file):
+            return None
+        if entry['format'] == 'parquet':
+            return pd.read_parquet(cache_file)
+        return pd.read_pickle(cache_file)
+
+    def write_cache(self, sha256, df):
+        """Store parsed rows in the columnar cache and return the format used"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if CACHE_FORMAT == 'parquet':
+            try:
+                df.to_parquet(self.cache_path(sha256, 'parquet'), index=False)
+                return 'parquet'
+            except (ValueError, TypeError, ImportError):
+                # Mixed-type object columns cannot always be written as Parquet
+                pass
+        df.to_pickle(self.cache_path(sha256, 'pickle'))
+        return 'pickle'
+
+    def record(self, file_name, stat, sha256, rows, cache_format=None, duplicate_of=None):
+        self.files[file_name] = {
+            'sha256': sha256,
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+            'rows': rows,
+            'format': cache_format,
+            'duplicate_of': duplicate_of,
+            'ingested_at': datetime.now().isoformat()
+        }
+        if duplicate_of is None:
+            self.hashes[sha256] = file_name
+
+    def forget(self, file_name):
+        """Drop a file that no longer exists in the uploads directory"""
+        entry = self.files.pop(file_name, None)
+        if entry is None or entry['duplicate_of'] is not None:
+            return
+        if self.hashes.get(entry['sha256']) != file_name:
+            return
+        del self.hashes[entry['sha256']]
+        # Promote another upload with identical content so it keeps its rows
+        for other_name, other in self.files.items():
+            if other['sha256'] == entry['sha256']:
+                self.hashes[entry['sha256']] = other_name
+                other['duplicate_of'] = None
+                other['format'] = entry['format']
+                for dup in self.files.values():
+                    if dup['duplicate_of'] == file_name:
+                        dup['duplicate_of'] = other_name
+                return
+        cache_file = self.cache_path(entry['sha256'], entry['format'])
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+
+def list_upload_files(uploads_dir, new_filepath=None):
+    """List CSV uploads as (file_name, path, stat) using a single directory scan"""
+    files = []
+    if os.path.isdir(uploads_dir):
+        with os.scandir(uploads_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.csv'):
+                    files.append((entry.name, entry.path, entry.stat()))
+
+    if new_filepath and os.path.isfile(new_filepath):
+        new_name = os.path.basename(new_filepath)
+        if not any(name == new_name for name, _, _ in files):
+            files.append((new_name, new_filepath, os.stat(new_filepath)))
+
+    files.sort(key=lambda item: item[0])
+    return files
+
+class Quarantine:
+    """Rows rejected during parsing, appended to a JSON lines file with the reason"""
+
+    def __init__(self, path=QUARANTINE_PATH):
+        self.path = str(path)
+        self.pending = []
+
+    def add(self, file_name, reason, line=None, text=None, values=None):
+        self.pending.append({
+            'file': file_name,
+            'line': line,
+            'reason': reason,
+            'text': text,
+            'values': values,
+            'quarantined_at': datetime.now().isoformat()
+        })
+
+    def count(self, file_name):
+        return sum(1 for record in self.pending if record['file'] == file_name)
+
+    def flush(self):
+        if not self.pending:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for record in self.pending:
+                f.write(json.dumps(record, default=str) + '\n')
+        self.pending = []
+
+def read_header(file_path):
+    with open(file_path, 'r', encoding='utf-8', newline='') as f:
+        return next(csv.reader(f), [])
+
+def declared_types(columns):
+    """Return the (categorical, numeric) columns the upload's schema declares"""
+    from feature_store import SCHEMAS, CATEGORICAL_COLUMNS, detect_schema
+
+    schema_name = detect_schema(columns)
+    if schema_name is None:
+        return [], []
+    schema = SCHEMAS[schema_name]
+    # Headers are matched after stripping whitespace, like to_typed_table does
+    raw_names = {str(c).strip(): c for c in columns}
+    categorical = [raw_names[c] for c in CATEGORICAL_COLUMNS + schema['categorical'] if c in raw_names]
+    numeric = [raw_names[c] for c in schema['numeric'] if c in raw_names]
+    return categorical, numeric
+
+def _read_lines(file_path, line_numbers):
+    """Return the raw text of the given 1-based physical lines"""
+    wanted = set(line_numbers)
+    found = {}
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        for number, line in enumerate(f, 1):
+            if number in wanted:
+                found[number] = line.rstrip('\r\n')
+                if len(found) == len(wanted):
+                    break
+    return found
+
+def _arrow_chunks(file_path, file_name, header, quarantine):
+    """Stream a CSV as pandas chunks with pyarrow's multi-threaded reader"""
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    def on_invalid_row(row):
+        quarantine.add(
+            file_name,
+            f"expected {row.expected_columns} fields, saw {row.actual_columns}",
+            line=row.number,
+            text=row.text
+        )
+        return 'skip'
+
+    reader = pa_csv.open_csv(
+        file_path,
+        read_options=pa_csv.ReadOptions(block_size=ARROW_BLOCK_SIZE, use_threads=True),
+        parse_options=pa_csv.ParseOptions(newlines_in_values=True, invalid_row_handler=on_invalid_row),
+        # Everything is read as text; declared types are applied per chunk so bad values can be quarantined
+        convert_options=pa_csv.ConvertOptions(
+            column_types={col: pa.string() for col in header},
+            strings_can_be_null=True
+        )
+    )
+    for batch in reader:
+        yield batch.to_pandas()
+
+def _pandas_chunks(file_path, file_name, quarantine):
+    """Read a CSV in CHUNK_ROWS pieces, recording the lines pandas has to skip"""
+    skipped = []
+    with pd.read_csv(file_path, encoding='utf-8', dtype=str, chunksize=CHUNK_ROWS, on_bad_lines='warn') as reader:
+        while True:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always', pd.errors.ParserWarning)
+                chunk = next(reader, None)
+            for warning in caught:
+                skipped.extend(SKIPPED_LINE.findall(str(warning.message)))
+            if chunk is None:
+                break
+            yield chunk
+
+    if skipped:
+        texts = _read_lines(file_path, [int(line) for line, _ in skipped])
+        for line, reason in skipped:
+            quarantine.add(file_name, reason, line=int(line), text=texts.get(int(line)))
+
+def _apply_numeric(chunk, numeric, file_name, quarantine):
+    """Convert declared numeric columns, quarantining rows with values that are not numbers"""
+    rejected = pd.Series(False, index=chunk.index)
+    for col in numeric:
+        raw = chunk[col]
+        values = pd.to_numeric(raw, errors='coerce')
+        invalid = values.isna() & raw.notna() & (raw.astype(str).str.strip() != '')
+        for idx in invalid[invalid].index:
+            quarantine.add(
+                file_name,
+                f"invalid number in '{col}': {raw[idx]!r}",
+                values={k: (None if pd.isna(v) else v) for k, v in chunk.loc[idx].items()}
+            )
+        rejected |= invalid
+        chunk[col] = values.astype('float32')
+    return chunk[~rejected] if rejected.any() else chunk
+
+def parse_upload(file_path, file_name=None, quarantine=None):
+    """Parse a raw CSV upload with the dtypes its schema declares
+
+    The file is read in bounded chunks (pyarrow's streaming reader when
+    installed, pandas otherwise). Malformed lines and values that do not fit
+    their column type go to the quarantine instead of being dropped silently.
+    """
+    file_name = file_name or os.path.basename(file_path)
+    quarantine = quarantine if quarantine is not None else Quarantine()
+
+    header = read_header(file_path)
+    categorical, numeric = declared_types(header)
+    if HAS_PYARROW:
+        chunks = _arrow_chunks(file_path, file_name, header, quarantine)
+    else:
+        chunks = _pandas_chunks(file_path, file_name, quarantine)
+
+    parsed = [_apply_numeric(chunk, numeric, file_name, quarantine) for chunk in chunks]
+    if not parsed:
+        return pd.DataFrame(columns=header)
+    df = pd.concat(parsed, ignore_index=True) if len(parsed) > 1 else parsed[0].reset_index(drop=True)
+    # Categories are set once on the whole file so every chunk shares one dictionary
+    for col in categorical:
+        df[col] = df[col].astype('category')
+    return df
+
+def ingest_uploads(uploads_dir=UPLOADS_DIR, new_filepath=None, manifest=None, quarantine=None):
+    """Return the parsed frames of all uploads, parsing only files not seen before
+
+    Returns (frames, report) where frames is a list of (file_name, DataFrame)
+    and report lists which files were parsed, served from cache, skipped as
+    duplicate content, had rows quarantined, or failed.
+    """
+    manifest = manifest or UploadManifest()
+    quarantine = quarantine if quarantine is not None else Quarantine()
+    report = {'parsed': [], 'cached': [], 'duplicates': [], 'empty': [], 'quarantined': [], 'errors': []}
+    frames = []
+
+    upload_files = list_upload_files(str(uploads_dir), new_filepath)
+    present = {name for name, _, _ in upload_files}
+    for file_name in [name for name in manifest.files if name not in present]:
+        manifest.forget(file_name)
+
+    for file_name, file_path, stat in upload_files:
+        try:
+            if manifest.is_current(file_name, stat):
+                entry = manifest.files[file_name]
+                if entry['duplicate_of'] is not None:
+                    report['duplicates'].append((file_name, entry['duplicate_of']))
+                    continue
+                if entry['rows'] == 0:
+                    report['empty'].append(file_name)
+                    continue
+                df = manifest.read_cached(file_name)
+                if df is not None:
+                    frames.append((file_name, df))
+                    report['cached'].append((file_name, len(df)))
+                    continue
+
+            if file_name in manifest.files:
+                # Content changed since it was recorded
+                manifest.forget(file_name)
+
+            sha256 = file_digest(file_path)
+            owner = manifest.hashes.get(sha256)
+            if owner is not None and owner != file_name and owner in present:
+                manifest.record(file_name, stat, sha256, manifest.files[owner]['rows'], duplicate_of=owner)
+                report['duplicates'].append((file_name, owner))
+                continue
+
+            df = parse_upload(file_path, file_name, quarantine)
+            if quarantine.count(file_name):
+                report['quarantined'].append((file_name, quarantine.count(file_name)))
+            df['source_file'] = file_name
+            cache_format = manifest.write_cache(sha256, df) if len(df) > 0 else None
+            manifest.record(file_name, stat, sha256, len(df), cache_format)
+
+            if len(df) > 0:
+                frames.append((file_name, df))
+                report['parsed'].append((file_name, len(df)))
+            else:
+                report['empty'].append(file_name)
+
+        except Exception as e:
+            report['errors'].append((file_name, str(e)))
+
+    manifest.save()
+    quarantine.flush()
+    return frames, report
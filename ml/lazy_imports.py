@@ -0,0 +1,23 @@
+"""
+KMRL Lazy Imports
+Defers heavy modules (pandas, numpy, joblib, sklearn) until first attribute access
+"""
+
+import sys
+import importlib.util
+
+def lazy_import(name):
+    """Return a module that is only executed when one of its attributes is used"""
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,339 @@
+"""
+KMRL Model Registry
+Content-addressed, versioned model artifacts with atomic promotion of the current version
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from datetime import datetime
+
+from lazy_imports import lazy_import
+from config import MODEL_REGISTRY_DIR, TRAINED_MODELS_DIR, ARTIFACT_CONFIG
+from tracing import span
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+joblib = lazy_import('joblib')
+
+# Estimator parameters that change how a model is trained, not what it learns
+IGNORED_PARAMS = {'n_jobs', 'verbose'}
+
+def _update_with_array(digest, values):
+    """Feed an array-like (numpy or pandas) into a hash"""
+    if isinstance(values, (pd.DataFrame, pd.Series)):
+        names = values.columns if isinstance(values, pd.DataFrame) else [values.name]
+        digest.update(json.dumps([str(c) for c in names]).encode())
+        digest.update(pd.util.hash_pandas_object(values, index=False).to_numpy().tobytes())
+        return
+    values = np.asarray(values)
+    digest.update(f"{values.dtype}{values.shape}".encode())
+    if values.dtype == object:
+        digest.update(pd.util.hash_array(values.ravel()).tobytes())
+    else:
+        digest.update(np.ascontiguousarray(values).tobytes())
+
+def fingerprint_data(data):
+    """Fingerprint of a training frame, including its index (the Train IDs)"""
+    digest = hashlib.sha256()
+    _update_with_array(digest, data)
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        _update_with_array(digest, data.index.to_numpy())
+    return digest.hexdigest()
+
+def compute_fingerprint(estimator, X, y=None, features=None):
+    """Fingerprint of an estimator's class and parameters plus its training data"""
+    params = {
+        key: value for key, value in estimator.get_params(deep=False).items()
+        if key not in IGNORED_PARAMS
+    }
+    digest = hashlib.sha256()
+    digest.update(f"{type(estimator).__module__}.{type(estimator).__qualname__}".encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    digest.update(json.dumps(list(features or [])).encode())
+    _update_with_array(digest, X)
+    if y is not None:
+        _update_with_array(digest, y)
+    return digest.hexdigest()
+
+# 'compressed' is small on disk for cold storage; 'mmap' is uncompressed so
+# joblib.load(mmap_mode='r') maps numpy arrays straight from the page cache
+# and processes loading the same file share those pages
+ARTIFACT_FORMATS = {
+    'compressed': {'compress': ('zlib', 3)},
+    'mmap': {'compress': 0}
+}
+
+def dump_artifact(obj, path, artifact_format='mmap'):
+    """Write a model artifact in one of ARTIFACT_FORMATS"""
+    if artifact_format not in ARTIFACT_FORMATS:
+        raise ValueError(f"Unknown artifact format: {artifact_format}")
+    with span('joblib.dump', artifact=os.path.basename(str(path)).split('.pkl')[0], format=artifact_format) as dump_span:
+        joblib.dump(obj, path, **ARTIFACT_FORMATS[artifact_format])
+        dump_span.set(bytes=os.path.getsize(path))
+
+def artifact_format(path):
+    """Detect the format of an artifact from its first byte"""
+    with open(path, 'rb') as f:
+        # Uncompressed joblib files start with the pickle PROTO opcode
+        return 'mmap' if f.read(1) == b'\x80' else 'compressed'
+
+def load_artifact(path, mmap_mode='r'):
+    """Load an artifact, memory-mapping its arrays when the format allows it"""
+    if mmap_mode and artifact_format(path) == 'mmap':
+        return joblib.load(path, mmap_mode=mmap_mode)
+    return joblib.load(path)
+
+def _atomic_write_json(path, payload):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+def _publish_file(source, destination, convert_to=None):
+    """Link or copy an artifact; with convert_to it is rewritten in that format instead"""
+    if convert_to is not None:
+        dump_artifact(joblib.load(source), destination, convert_to)
+        return
+    try:
+        os.link(source, destination)
+    except OSError:
+        # Hard links are not available on every filesystem
+        shutil.copyfile(source, destination)
+
+# Published layout: <published_dir>/versions/<model>/<fingerprint>/<artifact>.pkl
+# holds every version ever promoted, and <published_dir>/current/<model>.json
+# points at one of them, so swapping that single file publishes a model
+# together with its scaler, preprocessor and compiled form
+PUBLISHED_VERSIONS_DIR = 'versions'
+PUBLISHED_POINTERS_DIR = 'current'
+
+def read_pointer(name, published_dir=TRAINED_MODELS_DIR):
+    """The published pointer of a model, or None"""
+    try:
+        with open(os.path.join(str(published_dir), PUBLISHED_POINTERS_DIR, f"{name}.json"), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def published_artifacts(published_dir=TRAINED_MODELS_DIR):
+    """{artifact: (path, version)} of everything published; a model's artifacts share its version
+
+    Loose <artifact>.pkl files written before versions were published as a
+    unit are included unless a pointer already provides that artifact.
+    """
+    published_dir = str(published_dir)
+    artifacts = {}
+    pointers_dir = os.path.join(published_dir, PUBLISHED_POINTERS_DIR)
+    if os.path.isdir(pointers_dir):
+        for entry in sorted(os.listdir(pointers_dir)):
+            pointer = read_pointer(entry[:-5], published_dir) if entry.endswith('.json') else None
+            if pointer is None:
+                continue
+            for artifact in pointer['artifacts']:
+                path = os.path.join(published_dir, pointer['directory'], f"{artifact}.pkl")
+                artifacts[artifact] = (path, pointer['fingerprint'])
+    if os.path.isdir(published_dir):
+        with os.scandir(published_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.pkl') and entry.name[:-4] not in artifacts:
+                    stat = entry.stat()
+                    artifacts[entry.name[:-4]] = (entry.path, (stat.st_mtime_ns, stat.st_size))
+    return artifacts
+
+class ModelRegistry:
+    """Versioned model artifacts keyed by training fingerprint
+
+    Layout: <root>/<model>/<fingerprint>/{<artifact>.pkl, meta.json} plus a
+    <root>/<model>/CURRENT pointer. The current artifacts are also published
+    to TRAINED_MODELS_DIR, where the API and inference server resolve them
+    with published_artifacts().
+    Versions are stored in storage_format and published in published_format.
+    """
+
+    def __init__(self, root=MODEL_REGISTRY_DIR, published_dir=TRAINED_MODELS_DIR, keep_versions=5,
+                 storage_format=None, published_format=None):
+        self.root = str(root)
+        self.published_dir = str(published_dir)
+        self.keep_versions = keep_versions
+        self.storage_format = storage_format or ARTIFACT_CONFIG['storage_format']
+        self.published_format = published_format or ARTIFACT_CONFIG['published_format']
+
+    def _model_dir(self, name):
+        return os.path.join(self.root, name)
+
+    def _version_dir(self, name, fingerprint):
+        return os.path.join(self.root, name, fingerprint)
+
+    def find(self, name, fingerprint):
+        """Return the metadata of a registered version, or None"""
+        meta_path = os.path.join(self._version_dir(name, fingerprint), 'meta.json')
+        try:
+            with open(meta_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def current(self, name):
+        """Return the metadata of the promoted version, or None"""
+        try:
+            with open(os.path.join(self._model_dir(name), 'CURRENT'), 'r') as f:
+                pointer = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return self.find(name, pointer['fingerprint'])
+
+    def load(self, name, fingerprint):
+        """Load the artifacts of a registered version as a dict"""
+        meta = self.find(name, fingerprint)
+        if meta is None:
+            raise KeyError(f"{name} has no version {fingerprint}")
+        version_dir = self._version_dir(name, fingerprint)
+        # Not memory-mapped: callers such as incremental updates modify the models
+        return {
+            artifact: load_artifact(os.path.join(version_dir, f"{artifact}.pkl"), mmap_mode=None)
+            for artifact in meta['artifacts']
+        }
+
+    def register(self, name, fingerprint, artifacts, score, extra=None):
+        """Store a new version; artifacts maps artifact name to fitted object"""
+        if self.find(name, fingerprint) is not None:
+            return self.find(name, fingerprint)
+
+        os.makedirs(self._model_dir(name), exist_ok=True)
+        staging_dir = tempfile.mkdtemp(prefix=f".{fingerprint[:12]}-", dir=self._model_dir(name))
+        try:
+            for artifact_name, obj in artifacts.items():
+                dump_artifact(obj, os.path.join(staging_dir, f"{artifact_name}.pkl"), self.storage_format)
+            meta = {
+                'name': name,
+                'fingerprint': fingerprint,
+                'artifacts': list(artifacts.keys()),
+                'format': self.storage_format,
+                'score': score,
+                'created_at': datetime.now().isoformat(),
+                **(extra or {})
+            }
+            _atomic_write_json(os.path.join(staging_dir, 'meta.json'), meta)
+            os.chmod(staging_dir, 0o755)
+            # Renaming the whole directory makes the version appear atomically
+            os.rename(staging_dir, self._version_dir(name, fingerprint))
+        except OSError:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            existing = self.find(name, fingerprint)
+            if existing is None:
+                raise
+            # Another retrain registered the same inputs first
+            return existing
+        return meta
+
+    def promote(self, name, fingerprint):
+        """Make a registered version current and publish its artifacts as one unit
+
+        The version is copied to its own published directory first, then the
+        model's pointer is swapped, so readers resolve either the old set of
+        artifacts or the new one, never a mix.
+        """
+        meta = self.find(name, fingerprint)
+        if meta is None:
+            raise KeyError(f"{name} has no version {fingerprint}")
+
+        current = self.current(name)
+        pointer = read_pointer(name, self.published_dir)
+        if (current and current['fingerprint'] == fingerprint and pointer
+                and pointer['fingerprint'] == fingerprint
+                and os.path.isdir(os.path.join(self.published_dir, pointer['directory']))):
+            return meta
+
+        directory = self._publish_version(name, fingerprint, meta)
+        pointers_dir = os.path.join(self.published_dir, PUBLISHED_POINTERS_DIR)
+        os.makedirs(pointers_dir, exist_ok=True)
+        _atomic_write_json(os.path.join(pointers_dir, f"{name}.json"), {
+            'name': name,
+            'fingerprint': fingerprint,
+            'directory': directory,
+            'artifacts': meta['artifacts'],
+            'promoted_at': datetime.now().isoformat()
+        })
+        _atomic_write_json(os.path.join(self._model_dir(name), 'CURRENT'), {
+            'fingerprint': fingerprint,
+            'promoted_at': datetime.now().isoformat()
+        })
+
+        # Loose files of earlier versions would otherwise keep being served next to the new unit
+        stale = set(meta['artifacts'])
+        for previous in (current, pointer):
+            if previous:
+                stale.update(previous.get('artifacts', []))
+        for artifact in stale:
+            try:
+                os.remove(os.path.join(self.published_dir, f"{artifact}.pkl"))
+            except FileNotFoundError:
+                pass
+
+        # The version just replaced stays for readers that resolved its pointer a moment ago
+        self.prune_published(name, keep={fingerprint, pointer['fingerprint'] if pointer else None})
+        self.prune(name)
+        return meta
+
+    def _publish_version(self, name, fingerprint, meta):
+        """Copy a version's artifacts to its published directory; returns it relative to published_dir"""
+        directory = os.path.join(PUBLISHED_VERSIONS_DIR, name, fingerprint)
+        target = os.path.join(self.published_dir, directory)
+        if os.path.isdir(target):
+            return directory
+
+        parent = os.path.dirname(target)
+        os.makedirs(parent, exist_ok=True)
+        staging_dir = tempfile.mkdtemp(prefix=f".{fingerprint[:12]}-", dir=parent)
+        # Versions registered before formats were recorded are uncompressed
+        stored_format = meta.get('format', 'mmap')
+        convert_to = self.published_format if stored_format != self.published_format else None
+        try:
+            for artifact in meta['artifacts']:
+                _publish_file(
+                    os.path.join(self._version_dir(name, fingerprint), f"{artifact}.pkl"),
+                    os.path.join(staging_dir, f"{artifact}.pkl"),
+                    convert_to
+                )
+            os.chmod(staging_dir, 0o755)
+            os.rename(staging_dir, target)
+        except OSError:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            if not os.path.isdir(target):
+                raise
+            # Another process published the same version first
+        return directory
+
+    def prune_published(self, name, keep):
+        """Delete the published directories of a model's versions other than those in keep"""
+        versions_dir = os.path.join(self.published_dir, PUBLISHED_VERSIONS_DIR, name)
+        if not os.path.isdir(versions_dir):
+            return
+        for entry in os.listdir(versions_dir):
+            if not entry.startswith('.') and entry not in keep:
+                shutil.rmtree(os.path.join(versions_dir, entry), ignore_errors=True)
+
+    def versions(self, name):
+        """Registered versions of a model, newest first"""
+        model_dir = self._model_dir(name)
+        if not os.path.isdir(model_dir):
+            return []
+        metas = []
+        for entry in os.listdir(model_dir):
+            if entry.startswith('.') or entry == 'CURRENT':
+                continue
+            meta = self.find(name, entry)
+            if meta is not None:
+                metas.append(meta)
+        return sorted(metas, key=lambda m: m['created_at'], reverse=True)
+
+    def prune(self, name):
+        """Delete old versions beyond keep_versions, never the current one"""
+        current = self.current(name)
+        current_fingerprint = current['fingerprint'] if current else None
+        for meta in self.versions(name)[self.keep_versions:]:
+            if meta['fingerprint'] != current_fingerprint:
+                shutil.rmtree(self._version_dir(name, meta['fingerprint']), ignore_errors=True)
@@ -0,0 +1,111 @@
+"""
+KMRL Shared Feature Preparation
+One float32 design matrix and one set of imputation statistics per retrain run, shared by all seven models
+"""
+
+from lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Numeric model inputs in design-matrix order. The order keeps every model's
+# feature set except the stabling optimizer's next to each other, so those
+# models get their columns as a slice of the matrix rather than a copy.
+DESIGN_COLUMNS = ['Station_Capacity', 'Availability_Score', 'Maintenance_Score', 'Alert_Count', 'Mileage']
+
+# Published next to a model as '<model>_preprocessor.pkl'
+PREPROCESSOR_SUFFIX = '_preprocessor'
+
+class FeaturePreprocessor:
+    """Training-time imputation for one model, saved with it so inference fills gaps the same way"""
+
+    def __init__(self, columns, statistics):
+        self.columns = list(columns)
+        self.statistics = {column: float(statistics[column]) for column in self.columns}
+
+    def transform(self, frame):
+        """float32 frame of the model's columns; missing values and columns get the training statistic"""
+        columns = {}
+        for column in self.columns:
+            if column in frame.columns:
+                values = pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+                columns[column] = np.where(np.isnan(values), np.float32(self.statistics[column]), values)
+            else:
+                columns[column] = np.full(len(frame), self.statistics[column], dtype=np.float32)
+        return pd.DataFrame(columns, index=frame.index)
+
+    def __repr__(self):
+        return f"FeaturePreprocessor({self.statistics})"
+
+class DesignMatrix:
+    """Column-major float32 matrix of the numeric features, mean-imputed once
+
+    Column means are computed over the numeric features only, once per run,
+    instead of every model calling data.mean() over the whole mixed-type
+    frame. view() hands out a model's columns as a frame over a slice of
+    the matrix, with the preprocessor that reproduces its imputation.
+    changed holds the Train IDs whose rows this run's uploads touched, or
+    None when that is unknown.
+    """
+
+    def __init__(self, data, columns=DESIGN_COLUMNS, changed=None):
+        self.index = data.index
+        self.changed = [str(train_id) for train_id in changed] if changed is not None else None
+        self.columns = [column for column in columns if column in data.columns]
+        self.positions = {column: i for i, column in enumerate(self.columns)}
+        self.means = {}
+        # Missing-value masks, kept only for columns that have gaps
+        self.missing = {}
+        self.matrix = np.empty((len(data), len(self.columns)), dtype=np.float32, order='F')
+        for i, column in enumerate(self.columns):
+            values = pd.to_numeric(data[column], errors='coerce').to_numpy(dtype=np.float32, na_value=np.nan)
+            missing = np.isnan(values)
+            mean = float(np.nanmean(values, dtype=np.float64)) if not missing.all() else np.nan
+            if missing.any():
+                self.missing[column] = missing
+                values = np.where(missing, np.float32(mean), values)
+            self.matrix[:, i] = values
+            self.means[column] = mean
+
+    def has(self, *columns):
+        return all(column in self.positions for column in columns)
+
+    def view(self, columns, fill='mean'):
+        """(float32 frame of columns, fitted FeaturePreprocessor)
+
+        Columns adjacent in the design matrix come back as a view of it;
+        others are gathered into a small copy. fill='zero' fills gaps with 0
+        instead of the column mean.
+        """
+        positions = [self.positions[column] for column in columns]
+        if positions == list(range(positions[0], positions[-1] + 1)):
+            block = self.matrix[:, positions[0]:positions[-1] + 1]
+        else:
+            block = self.matrix[:, positions]
+
+        statistics = {column: self.means[column] for column in columns}
+        if fill == 'zero':
+            statistics = dict.fromkeys(columns, 0.0)
+            gaps = [(i, self.missing[column]) for i, column in enumerate(columns) if column in self.missing]
+            if gaps:
+                block = block.copy(order='F')
+                for i, missing in gaps:
+                    block[missing, i] = 0.0
+
+        frame = pd.DataFrame(block, index=self.index, columns=list(columns), copy=False)
+        return frame, FeaturePreprocessor(columns, statistics)
+
+    def observed(self, columns):
+        """float64 frame of columns as they were uploaded, gaps left as NaN"""
+        frame = pd.DataFrame(self.matrix[:, [self.positions[column] for column in columns]],
+                             index=self.index, columns=list(columns), dtype=np.float64)
+        for i, column in enumerate(columns):
+            if column in self.missing:
+                frame.iloc[self.missing[column], i] = np.nan
+        return frame
+
+    def changed_rows(self):
+        """Boolean mask of the rows in changed, or None when every row counts as new"""
+        if self.changed is None:
+            return None
+        return np.asarray(self.index.astype(str).isin(self.changed))
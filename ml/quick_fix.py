@@ -6,10 +6,18 @@ Simplified working version due to CSV parsing issues
 import pandas as pd
 import numpy as np
 import os
+import json
+import sqlite3
+from datetime import datetime
+
+from config import UPLOADS_DIR, TRAINED_MODELS_DIR, DB_PATH
+from tracing import span
+
+INDUCTION_RESULTS_PATH = TRAINED_MODELS_DIR / 'induction_results.csv'
 
 def fix_csv_parsing():
     """Fix CSV parsing issues by reading with proper error handling"""
-    uploads_path = 'uploads'
+    uploads_path = UPLOADS_DIR
     
     try:
         # Read CSV files with error handling
@@ -36,89 +44,268 @@ def fix_csv_parsing():
         print(f"❌ Error reading CSV files: {e}")
         return False
 
-def create_simplified_induction_system():
-    """Create a simplified working induction system"""
+# Score thresholds for each recommendation tier, checked from the top
+RECOMMENDATION_TIERS = [
+    (90, "✅ PRIORITY INDUCTION", "HIGH"),
+    (75, "✅ RECOMMENDED FOR INDUCTION", "MEDIUM"),
+    (60, "⚠️ CONDITIONAL INDUCTION", "LOW")
+]
+NOT_RECOMMENDED = ("❌ NOT RECOMMENDED", "NONE")
+ALERT_PENALTY = 5
+
+# Priority level -> induction_plans.decision
+PLAN_DECISIONS = {'HIGH': 'Service', 'MEDIUM': 'Service', 'LOW': 'Standby', 'NONE': 'Maintenance'}
+
+def induction_score(availability, maintenance, alerts):
+    """Mean of availability and maintenance less the alert penalty, clipped to 0-100"""
+    return np.clip((availability + maintenance) / 2 - alerts * ALERT_PENALTY, 0, 100)
+
+def count_alerts(alert_df):
+    """Count alerts per train with a single groupby"""
+    if alert_df is None or alert_df.empty or 'Train ID' not in alert_df.columns:
+        return None
+    return alert_df.groupby('Train ID', observed=True).size().rename('Alert Count')
+
+def score_fleet(fleet_df, alert_df=None, rng=None):
+    """Score a whole fleet at once and return the induction results, highest score first
+
+    fleet_df needs a 'Train ID' column and may carry 'Availability Score',
+    'Maintenance Score', 'Alert Count' and a 'Date' column for multi-day
+    horizons. Missing scores are simulated the same way as the sample system.
+    """
+    rng = rng or np.random.default_rng()
+    n = len(fleet_df)
+    
+    if 'Availability Score' in fleet_df.columns:
+        availability = fleet_df['Availability Score'].to_numpy(dtype=np.float64)
+    else:
+        availability = 85 + rng.integers(-15, 16, n)  # 70-100
+    if 'Maintenance Score' in fleet_df.columns:
+        maintenance = fleet_df['Maintenance Score'].to_numpy(dtype=np.float64)
+    else:
+        maintenance = 80 + rng.integers(-20, 21, n)  # 60-100
+    
+    # Alert counts come from one groupby merged back onto the fleet
+    alert_counts = count_alerts(alert_df)
+    if 'Alert Count' in fleet_df.columns:
+        alerts = fleet_df['Alert Count'].fillna(0).to_numpy(dtype=np.int64)
+    elif alert_counts is not None:
+        alerts = (
+            fleet_df[['Train ID']]
+            .merge(alert_counts, left_on='Train ID', right_index=True, how='left')['Alert Count']
+            .fillna(0)
+            .to_numpy(dtype=np.int64)
+        )
+    else:
+        alerts = rng.integers(0, 3, n)  # Random penalty 0-10
+    
+    final_score = induction_score(availability, maintenance, alerts)
+    
+    conditions = [final_score >= threshold for threshold, _, _ in RECOMMENDATION_TIERS]
+    recommendation = np.select(conditions, [tier[1] for tier in RECOMMENDATION_TIERS], NOT_RECOMMENDED[0])
+    priority_level = np.select(conditions, [tier[2] for tier in RECOMMENDATION_TIERS], NOT_RECOMMENDED[1])
+    
+    results = pd.DataFrame({
+        'Train ID': fleet_df['Train ID'].to_numpy(),
+        'Induction Score': final_score.astype(np.int64),
+        'Recommendation': recommendation,
+        'Priority Level': priority_level,
+        'Availability Score': np.asarray(availability).astype(np.int64),
+        'Maintenance Score': np.asarray(maintenance).astype(np.int64),
+        'Alert Count': alerts,
+        'Analysis Date': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')
+    })
+    
+    # Sort by score (highest first), per day when planning several days ahead
+    if 'Date' in fleet_df.columns:
+        results.insert(1, 'Date', fleet_df['Date'].to_numpy())
+        return results.sort_values(['Date', 'Induction Score'], ascending=[True, False], kind='stable', ignore_index=True)
+    return results.sort_values('Induction Score', ascending=False, kind='stable', ignore_index=True)
+
+def load_db_fleet(db_path=DB_PATH):
+    """Fleet scores and planning constraints for every trainset in the database, or None when it cannot be read"""
+    from db_loader import read_tables, db_feature_matrix
+    from feature_store import MAINTENANCE_SCORES
+
+    try:
+        tables = read_tables(db_path)
+        matrix = db_feature_matrix(tables)
+    except (sqlite3.Error, KeyError) as e:
+        print(f"⚠️ Could not read the fleet from {db_path}: {e}")
+        return None
+    train_ids = matrix.index.astype(str)
+    status = tables['trainsets'].set_index('serial_no')['status'].reindex(train_ids)
+    return pd.DataFrame({
+        'Train ID': train_ids,
+        'Availability Score': matrix['Availability_Score'].fillna(0).to_numpy(),
+        'Maintenance Score': matrix['Maintenance_Score'].fillna(0).to_numpy(),
+        'Alert Count': matrix['Alert_Count'].to_numpy(),
+        'Status': status.to_numpy(),
+        'Fitness Status': matrix['Fitness_Status'].astype(object).to_numpy(),
+        'Overdue Maintenance': (matrix['Maintenance_Score'] <= MAINTENANCE_SCORES['Overdue']).to_numpy(),
+        'Open Job Cards': matrix['Open_Job_Cards'].to_numpy(),
+        'Branding Hours Remaining': matrix['Branding_Hours_Remaining'].to_numpy(),
+        'Mileage': matrix['Mileage'].to_numpy(dtype=np.float64)
+    })
+
+def build_induction_results(db_path=DB_PATH, planner=None):
+    """Score and plan every train; returns the induction results in plan order
+
+    Pass an InductionPlanner to keep it for incremental re-planning afterwards.
+    """
+    from induction_planner import plan_induction
+
+    fleet_df = load_db_fleet(db_path)
+    if fleet_df is not None and len(fleet_df):
+        return plan_induction(score_fleet(fleet_df), fleet_df, planner)[0]
+
+    # Create sample data since CSV parsing is problematic
+    print("🔧 Creating sample train data due to CSV issues...")
+    
+    # Generate sample train IDs
+    train_ids = [f'T{i:03d}' for i in range(1, 58)]  # 57 trains
+    
+    availability_df = pd.DataFrame({'Train ID': train_ids})
+    alert_df = pd.DataFrame()
+    # Sample trains are simulated as certified, whatever the planner assumes for a missing certificate
+    sample_fleet = availability_df.assign(**{'Fitness Status': 'Valid'})
+    
+    return plan_induction(score_fleet(availability_df, alert_df), sample_fleet, planner)[0]
+
+def save_induction_results(results_df, output_path=INDUCTION_RESULTS_PATH):
+    """Write induction results atomically so readers never see a partial file"""
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    results_df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+def induction_records(results_df):
+    """JSON-ready induction result rows, missing values as None"""
+    return json.loads(results_df.to_json(orient='records'))
+
+def results_from_records(records):
+    """Induction results frame back from induction_records() rows"""
+    results_df = pd.DataFrame(records)
+    if 'Plan Rank' in results_df.columns:
+        results_df['Plan Rank'] = results_df['Plan Rank'].astype('Int64')
+    return results_df
+
+def plan_reason(result):
+    """Human-readable reason stored with each induction decision"""
+    recommendation = result['Recommendation'].split(' ', 1)[-1].capitalize()
+    if result.get('Plan Reason'):
+        recommendation = f"{result['Plan Reason']}. {recommendation}"
+    return (
+        f"{recommendation}: induction score {result['Induction Score']}/100 "
+        f"(availability {result['Availability Score']}, maintenance {result['Maintenance Score']}, "
+        f"{result['Alert Count']} active alerts)"
+    )
+
+# induction_plans columns added by migration 0002, after date, trainset_id, decision and reason
+PLAN_SCORE_COLUMNS = ['score', 'recommendation', 'priority_level', 'availability_score',
+                      'maintenance_score', 'alert_count', 'generated_at']
+
+def save_induction_plan(results_df, db_path=DB_PATH, plan_date=None):
+    """Write one planning run into induction_plans in a single transaction
+
+    The run replaces any plan already stored for plan_date (today by
+    default), so readers see either the previous plan or the whole new one.
+    Before migration 0002 the table has no score columns, and only the
+    date, trainset, decision and reason are written.
+    Returns (rows written, Train IDs with no matching trainset).
+    """
+    plan_date = plan_date or datetime.now()
+    plan_day = int(datetime(plan_date.year, plan_date.month, plan_date.day).timestamp())
+    generated_at = int(datetime.now().timestamp())
+
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    try:
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(induction_plans)")}
+        with_scores = all(column in existing for column in PLAN_SCORE_COLUMNS)
+        columns = ['date', 'trainset_id', 'decision', 'reason'] + (PLAN_SCORE_COLUMNS if with_scores else [])
+
+        trainset_ids = dict(conn.execute("SELECT serial_no, trainset_id FROM trainsets"))
+        rows, unmatched = [], []
+        for result in results_df.to_dict('records'):
+            trainset_id = trainset_ids.get(result['Train ID'])
+            if trainset_id is None:
+                unmatched.append(result['Train ID'])
+                continue
+            row = (
+                plan_day, trainset_id, result.get('Decision') or PLAN_DECISIONS[result['Priority Level']],
+                plan_reason(result)
+            )
+            if with_scores:
+                row += (
+                    int(result['Induction Score']), result['Recommendation'], result['Priority Level'],
+                    int(result['Availability Score']), int(result['Maintenance Score']), int(result['Alert Count']),
+                    generated_at
+                )
+            rows.append(row)
+
+        # The (date, trainset_id) index comes with migration 0002, not from here
+        with conn:
+            conn.execute("DELETE FROM induction_plans WHERE date = ?", (plan_day,))
+            conn.executemany(
+                f"INSERT INTO induction_plans ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                rows
+            )
+    finally:
+        conn.close()
+    return len(rows), unmatched
+
+def store_induction_results(results_df):
+    """Save the results CSV and the induction plan; the plan is skipped if the database is unavailable"""
+    output_path = save_induction_results(results_df)
+    try:
+        written, unmatched = save_induction_plan(results_df)
+        print(f"🗄️ Induction plan written for {written} trainsets")
+        if unmatched:
+            print(f"⚠️ {len(unmatched)} trains have no trainset in the database: {', '.join(unmatched[:5])}")
+    except sqlite3.Error as e:
+        print(f"⚠️ Induction plan not written to the database: {e}")
+    return output_path
+
+def create_simplified_induction_system(refresh=False):
+    """Create a simplified working induction system
+
+    Reuses the last run's results while the database, uploads and models
+    are unchanged, unless refresh is set.
+    """
+    from result_cache import ResultCache, induction_key
+
     print("\n🔧 Creating Simplified KMRL Induction System...")
     
     try:
-        uploads_path = 'uploads'
-        
-        # Create sample data since CSV parsing is problematic
-        print("🔧 Creating sample train data due to CSV issues...")
-        
-        # Generate sample train IDs
-        train_ids = [f'T{i:03d}' for i in range(1, 58)]  # 57 trains
-        
-        availability_df = pd.DataFrame({'Train ID': train_ids})
-        maintenance_df = pd.DataFrame() 
-        alert_df = pd.DataFrame()
-        
-        # Create simplified induction scores
-        induction_results = []
-        
-        for _, train_row in availability_df.iterrows():
-            train_id = train_row['Train ID']
-            
-            # Calculate basic metrics
-            availability_score = 85 + np.random.randint(-15, 16)  # 70-100
-            maintenance_score = 80 + np.random.randint(-20, 21)   # 60-100
-            
-            # Check alerts for this train (with empty dataframe handling)
-            if not alert_df.empty and 'Train ID' in alert_df.columns:
-                train_alerts = alert_df[alert_df['Train ID'] == train_id]
-                alert_penalty = len(train_alerts) * 5
-            else:
-                alert_penalty = np.random.randint(0, 3) * 5  # Random penalty 0-10
-            
-            # Calculate final score
-            final_score = max(0, min(100, 
-                (availability_score + maintenance_score) / 2 - alert_penalty
-            ))
-            
-            # Determine recommendation
-            if final_score >= 90:
-                recommendation = "✅ PRIORITY INDUCTION"
-                priority_level = "HIGH"
-            elif final_score >= 75:
-                recommendation = "✅ RECOMMENDED FOR INDUCTION"  
-                priority_level = "MEDIUM"
-            elif final_score >= 60:
-                recommendation = "⚠️ CONDITIONAL INDUCTION"
-                priority_level = "LOW"
-            else:
-                recommendation = "❌ NOT RECOMMENDED"
-                priority_level = "NONE"
-            
-            induction_results.append({
-                'Train ID': train_id,
-                'Induction Score': int(final_score),
-                'Recommendation': recommendation,
-                'Priority Level': priority_level,
-                'Availability Score': int(availability_score),
-                'Maintenance Score': int(maintenance_score),
-                'Alert Count': alert_penalty // 5,
-                'Analysis Date': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')
-            })
-        
-        # Sort by score (highest first)
-        induction_results.sort(key=lambda x: x['Induction Score'], reverse=True)
-        
-        # Save results
-        results_df = pd.DataFrame(induction_results)
-        
-        # Ensure directory exists
-        os.makedirs('ml/models/trained', exist_ok=True)
-        
-        # Save as CSV
-        output_path = 'ml/models/trained/induction_results.csv'
-        results_df.to_csv(output_path, index=False)
+        cache = ResultCache()
+        with span('induction.cache') as cache_span:
+            key = induction_key()
+            records = None if refresh else cache.get(key)
+            cache_span.set(hit=records is not None)
+
+        if records is not None:
+            print("⚡ Inputs unchanged since the last run, reusing its induction results")
+            results_df = results_from_records(records)
+            output_path = INDUCTION_RESULTS_PATH
+            # Today's plan was stored by the run that filled the cache
+            if not output_path.exists():
+                with span('induction.save'):
+                    output_path = store_induction_results(results_df)
+        else:
+            with span('induction.score') as score_span:
+                results_df = build_induction_results()
+                score_span.set(trains=len(results_df))
+            with span('induction.save'):
+                output_path = store_induction_results(results_df)
+            cache.put(key, induction_records(results_df))
         
         print(f"✅ Induction results saved to: {output_path}")
-        print(f"📊 Total trains analyzed: {len(induction_results)}")
+        print(f"📊 Total trains analyzed: {len(results_df)}")
         
         # Show top 5 recommendations
         print("\n🏆 Top 5 Induction Recommendations:")
-        for i, result in enumerate(induction_results[:5], 1):
+        for i, result in enumerate(results_df.head(5).to_dict('records'), 1):
             print(f"{i}. Train {result['Train ID']}: {result['Induction Score']}/100 - {result['Recommendation']}")
         
         return True
@@ -129,7 +316,7 @@ def create_simplified_induction_system():
         traceback.print_exc()
         return False
 
-def main():
+def main(refresh=False):
     """Main execution function"""
     print("🚀 KMRL AI System Quick Fix")
     print("=" * 50)
@@ -140,12 +327,19 @@ def main():
         return
     
     # Step 2: Create induction system
-    if not create_simplified_induction_system():
+    if not create_simplified_induction_system(refresh):
         print("❌ System creation failed") 
         return
     
     print("\n🎉 KMRL AI Induction System is now operational!")
-    print("📋 Results available at: ml/models/trained/induction_results.csv")
+    print(f"📋 Results available at: {INDUCTION_RESULTS_PATH}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="KMRL induction system")
+    parser.add_argument('--refresh', action='store_true', help='recompute even if the inputs are unchanged')
+    args = parser.parse_args()
+
+    with span('quick_fix'):
+        main(args.refresh)
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""
+KMRL Result Cache
+Induction and prediction responses cached in memory and on disk, keyed by a fingerprint of their inputs
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from config import DB_PATH, UPLOADS_DIR, TRAINED_MODELS_DIR, RESULT_CACHE_DIR, CACHE_CONFIG, PLANNER_CONFIG
+from model_registry import PUBLISHED_POINTERS_DIR
+
+def _digest(parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+def _dir_state(path, suffix=None):
+    """(name, mtime_ns, size) of every file in a directory, like ModelStore's reload check"""
+    state = []
+    try:
+        with os.scandir(str(path)) as entries:
+            for entry in entries:
+                if entry.is_file() and (suffix is None or entry.name.endswith(suffix)):
+                    stat = entry.stat()
+                    state.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    except OSError:
+        return []
+    return sorted(state)
+
+def database_state(db_path=DB_PATH):
+    """Row count, updated_at newest and total, and key total of every table the fleet is built from
+
+    Unlike the file's mtime this ignores writes to other tables, such as the
+    induction plan the run itself stores.
+    """
+    from db_loader import DB_TABLES, CHANGED_AT, connect_readonly
+
+    try:
+        conn = connect_readonly(db_path)
+    except sqlite3.Error:
+        return None
+    try:
+        return {
+            table: conn.execute(
+                f"SELECT COUNT(*), MAX({CHANGED_AT}), TOTAL({CHANGED_AT}), TOTAL({spec['key']}) FROM {table}"
+            ).fetchone()
+            for table, spec in DB_TABLES.items()
+        }
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+def induction_key(db_path=DB_PATH, uploads_dir=UPLOADS_DIR, models_dir=TRAINED_MODELS_DIR):
+    """Fingerprint of everything an induction run reads, plus the day its plan is stored under"""
+    return _digest({
+        'kind': 'induction',
+        'date': date.today().isoformat(),
+        'database': database_state(db_path),
+        'uploads': _dir_state(uploads_dir),
+        'models': _dir_state(models_dir, '.pkl'),
+        'published': _dir_state(os.path.join(str(models_dir), PUBLISHED_POINTERS_DIR)),
+        'planner': PLANNER_CONFIG
+    })
+
+def prediction_key(model_name, model_version, body):
+    """Fingerprint of a prediction request against one loaded model version"""
+    return _digest({
+        'kind': 'predict',
+        'model': model_name,
+        'version': model_version,
+        'rows': body.get('rows'),
+        'probabilities': bool(body.get('probabilities'))
+    })
+
+class ResultCache:
+    """Two-tier cache of JSON results
+
+    The memory tier is an LRU of at most memory_entries results for this
+    process. The disk tier is one JSON file per key under cache_dir, shared
+    by every process (quick_fix runs as a fresh process each time), and is
+    trimmed to disk_max_bytes oldest first. Entries older than
+    max_age_seconds are misses in both tiers. Keys fingerprint the inputs,
+    so changed inputs simply stop matching and no invalidation is needed.
+    """
+
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, memory_entries=None, disk_max_bytes=None, max_age_seconds=None):
+        self.cache_dir = str(cache_dir)
+        self.memory_entries = memory_entries if memory_entries is not None else CACHE_CONFIG['memory_entries']
+        self.disk_max_bytes = disk_max_bytes if disk_max_bytes is not None else CACHE_CONFIG['disk_max_bytes']
+        self.max_age_seconds = max_age_seconds if max_age_seconds is not None else CACHE_CONFIG['max_age_seconds']
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.max_age_seconds:
+                    self._memory.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    return value
+                del self._memory[key]
+
+        try:
+            with open(self._path(key), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count('misses')
+            return None
+        if now - entry['stored_at'] > self.max_age_seconds:
+            self._remove(key)
+            self._count('misses')
+            return None
+        self._remember(key, entry['stored_at'], entry['value'])
+        self._count('disk_hits')
+        return entry['value']
+
+    def put(self, key, value, persist=True):
+        """Store a JSON-serialisable value; persist=False keeps it in the memory tier only"""
+        stored_at = time.time()
+        self._remember(key, stored_at, value)
+        self._count('stores')
+        if not persist:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._path(key)
+            tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+            with open(tmp_path, 'w') as f:
+                json.dump({'stored_at': stored_at, 'value': value}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            # The memory tier still serves this process
+            return
+        self.trim()
+
+    def get_or_compute(self, key, compute, persist=True):
+        """(value, hit) for key, calling compute() and storing its result on a miss"""
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        value = compute()
+        self.put(key, value, persist)
+        return value, False
+
+    def _remember(self, key, stored_at, value):
+        with self._lock:
+            self._memory[key] = (stored_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def _remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _disk_entries(self):
+        """(mtime, size, path) of the disk tier's files, oldest first"""
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as scan:
+                for entry in scan:
+                    if entry.is_file() and entry.name.endswith('.json'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            pass
+        return sorted(entries)
+
+    def trim(self):
+        """Drop expired files, then the oldest until the disk tier fits disk_max_bytes"""
+        entries = self._disk_entries()
+        cutoff = time.time() - self.max_age_seconds
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for mtime, size, path in entries:
+            if mtime >= cutoff and total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        if evicted:
+            self._count('evictions', evicted)
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for _, _, path in self._disk_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        entries = self._disk_entries()
+        with self._lock:
+            counters = dict(self.counters)
+            memory_entries = len(self._memory)
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+        return {
+            **counters,
+            'hit_rate': round((counters['memory_hits'] + counters['disk_hits']) / lookups, 3) if lookups else None,
+            'memory_entries': memory_entries,
+            'disk_entries': len(entries),
+            'disk_bytes': sum(size for _, size, _ in entries)
+        }
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="KMRL result cache")
+    parser.add_argument('--clear', action='store_true', help='delete every cached result')
+    parser.add_argument('--key', action='store_true', help="print the current induction inputs' fingerprint")
+    args = parser.parse_args()
+
+    cache = ResultCache()
+    if args.clear:
+        cache.clear()
+        print(f"🗑️ Cleared {cache.cache_dir}")
+    if args.key:
+        print(induction_key())
+    stats = cache.stats()
+    print(f"📦 {stats['disk_entries']} cached results, {stats['disk_bytes'] / 1024:.1f} KiB in {cache.cache_dir}")
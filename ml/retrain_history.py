@@ -0,0 +1,241 @@
+"""
+KMRL Retraining History
+Append-only record of every retrain run with per-model scores, durations and fingerprints
+"""
+
+import os
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+from config import RETRAIN_HISTORY_PATH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS retrain_runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    duration_s REAL NOT NULL,
+    trigger_file TEXT,
+    total_rows INTEGER,
+    data_fingerprint TEXT,
+    mode TEXT,
+    average_accuracy REAL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS retrain_runs_finished_at_idx ON retrain_runs(finished_at);
+CREATE TABLE IF NOT EXISTS retrain_model_runs (
+    run_id INTEGER NOT NULL REFERENCES retrain_runs(run_id),
+    model TEXT NOT NULL,
+    score REAL,
+    duration_s REAL,
+    fingerprint TEXT,
+    outcome TEXT,
+    PRIMARY KEY (run_id, model)
+);
+CREATE INDEX IF NOT EXISTS retrain_model_runs_model_idx ON retrain_model_runs(model, run_id);
+"""
+
+MODEL_METRICS = ('score', 'duration_s')
+
+def _iso(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+
+def _since_timestamp(days):
+    return (datetime.now() - timedelta(days=days)).timestamp() if days is not None else 0
+
+class RetrainHistory:
+    """SQLite-backed retraining history
+
+    Every run is one transaction that inserts a run row and its model rows,
+    so appends cost the same however long the history is, and retrains
+    finishing together are serialised by SQLite instead of overwriting each
+    other. Nothing is pruned.
+    """
+
+    def __init__(self, path=RETRAIN_HISTORY_PATH):
+        self.path = str(path)
+        self._initialised = False
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        if not self._initialised:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(SCHEMA)
+            self._initialised = True
+        return conn
+
+    def record_run(self, started_at, finished_at, models, trigger_file=None, total_rows=None,
+                   data_fingerprint=None, mode=None, status='completed'):
+        """Append one run; models maps model name to {'score', 'duration_s', 'fingerprint', 'outcome'}"""
+        scores = [m['score'] for m in models.values() if m.get('score') is not None]
+        conn = self._connect()
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO retrain_runs (started_at, finished_at, duration_s, trigger_file, total_rows, "
+                    "data_fingerprint, mode, average_accuracy, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (started_at, finished_at, round(finished_at - started_at, 3), trigger_file, total_rows,
+                     data_fingerprint, mode, sum(scores) / len(scores) if scores else None, status)
+                )
+                run_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT INTO retrain_model_runs (run_id, model, score, duration_s, fingerprint, outcome) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(run_id, name, m.get('score'), m.get('duration_s'), m.get('fingerprint'), m.get('outcome'))
+                     for name, m in models.items()]
+                )
+        finally:
+            conn.close()
+        return run_id
+
+    def runs(self, limit=None, days=None):
+        """Runs newest first, each with its per-model results"""
+        conn = self._connect()
+        try:
+            runs = conn.execute(
+                "SELECT * FROM retrain_runs WHERE finished_at >= ? ORDER BY run_id DESC LIMIT ?",
+                (_since_timestamp(days), -1 if limit is None else limit)
+            ).fetchall()
+            if not runs:
+                return []
+            placeholders = ', '.join('?' * len(runs))
+            models = {}
+            for row in conn.execute(
+                f"SELECT * FROM retrain_model_runs WHERE run_id IN ({placeholders})",
+                [run['run_id'] for run in runs]
+            ):
+                models.setdefault(row['run_id'], {})[row['model']] = {
+                    key: row[key] for key in ('score', 'duration_s', 'fingerprint', 'outcome')
+                }
+        finally:
+            conn.close()
+
+        return [{
+            **dict(run),
+            'started_at': _iso(run['started_at']),
+            'finished_at': _iso(run['finished_at']),
+            'models': models.get(run['run_id'], {})
+        } for run in runs]
+
+    def model_trend(self, model, metric='score', days=None, limit=None):
+        """(finished_at, value) pairs for one model, oldest first"""
+        if metric not in MODEL_METRICS:
+            raise ValueError(f"Unknown metric: {metric} (expected one of {', '.join(MODEL_METRICS)})")
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT r.finished_at, m.{metric} FROM retrain_model_runs m "
+                "JOIN retrain_runs r ON r.run_id = m.run_id "
+                "WHERE m.model = ? AND r.finished_at >= ? ORDER BY m.run_id DESC LIMIT ?",
+                (model, _since_timestamp(days), -1 if limit is None else limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [(_iso(finished_at), value) for finished_at, value in reversed(rows)]
+
+    def run_trend(self, metric='duration_s', days=None, limit=None):
+        """(finished_at, value) pairs of a run-level metric, oldest first"""
+        if metric not in ('duration_s', 'average_accuracy', 'total_rows'):
+            raise ValueError(f"Unknown run metric: {metric}")
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT finished_at, {metric} FROM retrain_runs WHERE finished_at >= ? "
+                "ORDER BY run_id DESC LIMIT ?",
+                (_since_timestamp(days), -1 if limit is None else limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [(_iso(finished_at), value) for finished_at, value in reversed(rows)]
+
+    def summary(self, days=None):
+        """Per-model run count, latest/mean/min/max score and mean duration"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT m.model, COUNT(*) AS runs, AVG(m.score) AS mean_score, MIN(m.score) AS min_score, "
+                "MAX(m.score) AS max_score, AVG(m.duration_s) AS mean_duration_s, "
+                "(SELECT l.score FROM retrain_model_runs l JOIN retrain_runs lr ON lr.run_id = l.run_id "
+                " WHERE l.model = m.model AND lr.finished_at >= :since "
+                " ORDER BY l.run_id DESC LIMIT 1) AS latest_score "
+                "FROM retrain_model_runs m JOIN retrain_runs r ON r.run_id = m.run_id "
+                "WHERE r.finished_at >= :since GROUP BY m.model ORDER BY m.model",
+                {'since': _since_timestamp(days)}
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def export_log(self, path, limit=10):
+        """Write the latest runs in the retraining_log.json format, oldest first"""
+        entries = [{
+            'timestamp': run['finished_at'],
+            'trigger_file': run['trigger_file'],
+            'total_data_rows': run['total_rows'],
+            'model_accuracies': {name: m['score'] for name, m in run['models'].items()},
+            'average_accuracy': run['average_accuracy'],
+            'training_status': run['status'],
+            'models_updated': len(run['models'])
+        } for run in reversed(self.runs(limit=limit))]
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+    def import_log(self, path):
+        """Append the entries of an old retraining_log.json; returns how many were imported"""
+        with open(path, 'r') as f:
+            entries = json.load(f)
+        imported = 0
+        for entry in entries if isinstance(entries, list) else []:
+            finished_at = datetime.fromisoformat(entry['timestamp']).timestamp()
+            self.record_run(
+                finished_at, finished_at,
+                {name: {'score': score} for name, score in entry.get('model_accuracies', {}).items()},
+                trigger_file=entry.get('trigger_file'),
+                total_rows=entry.get('total_data_rows'),
+                mode='imported',
+                status=entry.get('training_status', 'completed')
+            )
+            imported += 1
+        return imported
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="KMRL retraining history")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    runs_parser = subparsers.add_parser('runs', help='list recent runs')
+    runs_parser.add_argument('--limit', type=int, default=10)
+    trend_parser = subparsers.add_parser('trend', help="one model's score or duration over time")
+    trend_parser.add_argument('model', help="model name, or 'all' for run durations")
+    trend_parser.add_argument('--metric', default=None,
+                              help="score or duration_s for a model, duration_s or average_accuracy for 'all'")
+    trend_parser.add_argument('--days', type=int, default=None)
+    summary_parser = subparsers.add_parser('summary', help='per-model statistics')
+    summary_parser.add_argument('--days', type=int, default=None)
+    import_parser = subparsers.add_parser('import', help='import an old retraining_log.json')
+    import_parser.add_argument('path')
+    args = parser.parse_args()
+
+    history = RetrainHistory()
+    if args.command == 'runs':
+        for run in history.runs(limit=args.limit):
+            accuracy = f"{run['average_accuracy']:.1f}%" if run['average_accuracy'] is not None else 'n/a'
+            print(f"#{run['run_id']} {run['finished_at']} {run['status']} {run['mode'] or ''} "
+                  f"{run['duration_s']:.1f}s, {run['total_rows']} rows, {accuracy} ({run['trigger_file']})")
+    elif args.command == 'trend':
+        if args.model == 'all':
+            points = history.run_trend(args.metric or 'duration_s', days=args.days)
+        else:
+            points = history.model_trend(args.model, args.metric or 'score', days=args.days)
+        for finished_at, value in points:
+            print(f"{finished_at}  {value}")
+    elif args.command == 'summary':
+        print(json.dumps(history.summary(days=args.days), indent=2))
+    else:
+        print(f"✅ Imported {history.import_log(args.path)} runs from {args.path}")
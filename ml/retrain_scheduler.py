@@ -0,0 +1,254 @@
+"""
+KMRL Retrain Scheduler
+Single-flight, debounced retraining so a burst of uploads results in one retrain
+"""
+
+import os
+import sys
+import json
+import time
+from datetime import datetime
+
+from config import DATA_DIR, SCHEDULER_CONFIG
+
+class LockFile:
+    """Cross-process lock held by creating a file exclusively
+
+    The holder's pid is written into the file so a lock left behind by a
+    crashed process can be detected and taken over.
+    """
+
+    def __init__(self, path, stale_seconds=None):
+        self.path = str(path)
+        self.stale_seconds = stale_seconds
+
+    def acquire(self, timeout=0, poll_interval=0.05):
+        """Try to take the lock, waiting up to timeout seconds"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self._is_stale():
+                    self._break()
+                    continue
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(poll_interval)
+                continue
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'pid': os.getpid(), 'acquired_at': datetime.now().isoformat()}, f)
+            return True
+
+    def release(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def holder(self):
+        """Return the pid and acquisition time of the current holder, or None"""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _is_stale(self):
+        holder = self.holder()
+        if holder is None:
+            # Either just released or still being written by the new holder
+            try:
+                return time.time() - os.path.getmtime(self.path) > 5
+            except OSError:
+                return False
+        if os.name == 'posix' and not _pid_alive(holder['pid']):
+            return True
+        if self.stale_seconds is not None:
+            acquired_at = datetime.fromisoformat(holder['acquired_at'])
+            return (datetime.now() - acquired_at).total_seconds() > self.stale_seconds
+        return False
+
+    def _break(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        self.acquire(timeout=float('inf'))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class RetrainScheduler:
+    """Lock-protected retrain queue for one artifact set
+
+    Every upload is appended to a queue file. Whoever holds the run lock
+    waits until no upload has arrived for debounce_seconds, drains the queue
+    and runs a single retrain for all of it; uploads that arrive while it is
+    training are picked up by the next round of the same runner. Callers
+    that cannot take the run lock simply leave their upload in the queue.
+    """
+
+    def __init__(self, state_dir=DATA_DIR, debounce_seconds=None, stale_lock_seconds=None):
+        self.state_dir = str(state_dir)
+        self.debounce_seconds = (
+            SCHEDULER_CONFIG['debounce_seconds'] if debounce_seconds is None else debounce_seconds
+        )
+        stale_lock_seconds = stale_lock_seconds or SCHEDULER_CONFIG['stale_lock_seconds']
+        self.queue_path = os.path.join(self.state_dir, 'retrain_queue.json')
+        self.status_path = os.path.join(self.state_dir, 'retrain_status.json')
+        self.queue_lock = LockFile(os.path.join(self.state_dir, 'retrain_queue.lock'), stale_seconds=60)
+        self.run_lock = LockFile(os.path.join(self.state_dir, 'retrain.lock'), stale_seconds=stale_lock_seconds)
+
+    def _read_json(self, path, default):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def _write_json(self, path, payload):
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def enqueue(self, filepath, filename):
+        """Add an upload to the queue and return the queue depth"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        with self.queue_lock:
+            queue = self._read_json(self.queue_path, [])
+            queue.append({'filepath': str(filepath), 'filename': filename, 'queued_at': time.time()})
+            self._write_json(self.queue_path, queue)
+        return len(queue)
+
+    def pending(self):
+        return self._read_json(self.queue_path, [])
+
+    def _drain(self):
+        with self.queue_lock:
+            queue = self._read_json(self.queue_path, [])
+            if queue:
+                self._write_json(self.queue_path, [])
+        return queue
+
+    def _release_if_idle(self):
+        """Release the run lock unless an upload arrived in the meantime
+
+        Checking the queue and releasing happen under the queue lock, so an
+        upload is either seen here or finds the run lock free afterwards.
+        """
+        with self.queue_lock:
+            if self._read_json(self.queue_path, []):
+                return False
+            self.run_lock.release()
+            return True
+
+    def _wait_for_quiet(self):
+        """Sleep until no upload has been queued for debounce_seconds"""
+        while True:
+            queue = self.pending()
+            if not queue:
+                return
+            quiet_for = time.time() - max(entry['queued_at'] for entry in queue)
+            if quiet_for >= self.debounce_seconds:
+                return
+            time.sleep(min(self.debounce_seconds - quiet_for, SCHEDULER_CONFIG['poll_interval']))
+
+    def run_pending(self, retrain_fn=None, **retrain_kwargs):
+        """Run retrains until the queue is empty; returns False if another runner holds the lock"""
+        if retrain_fn is None:
+            from auto_retrain import auto_retrain_system as retrain_fn
+
+        os.makedirs(self.state_dir, exist_ok=True)
+        if not self.run_lock.acquire():
+            return False
+
+        try:
+            while True:
+                self._wait_for_quiet()
+                batch = self._drain()
+                if batch:
+                    self._run_batch(batch, retrain_fn, retrain_kwargs)
+                if self._release_if_idle():
+                    return True
+        except BaseException:
+            self.run_lock.release()
+            raise
+
+    def _run_batch(self, batch, retrain_fn, retrain_kwargs):
+        started = time.time()
+        latest = batch[-1]
+        # One retrain reads every upload, so the latest file stands in for the whole batch
+        try:
+            success = bool(retrain_fn(latest['filepath'], latest['filename'], **retrain_kwargs))
+        except Exception as e:
+            print(f"❌ Scheduled retrain failed: {e}", flush=True)
+            success = False
+        finished = time.time()
+
+        status = self._read_json(self.status_path, {'runs': 0})
+        status['runs'] = status.get('runs', 0) + 1
+        status['last_run'] = {
+            'files': [entry['filename'] for entry in batch],
+            'coalesced': len(batch),
+            'max_wait_seconds': round(started - min(entry['queued_at'] for entry in batch), 2),
+            'duration_seconds': round(finished - started, 2),
+            'success': success,
+            'finished_at': datetime.fromtimestamp(finished).isoformat()
+        }
+        self._write_json(self.status_path, status)
+
+    def status(self):
+        """Queue depth, wait time of the oldest upload and the last run"""
+        queue = self.pending()
+        holder = self.run_lock.holder()
+        oldest = min((entry['queued_at'] for entry in queue), default=None)
+        return {
+            'running': holder is not None,
+            'runner_pid': holder['pid'] if holder else None,
+            'queue_depth': len(queue),
+            'oldest_wait_seconds': round(time.time() - oldest, 2) if oldest is not None else 0,
+            'queued_files': [entry['filename'] for entry in queue],
+            'last_run': self._read_json(self.status_path, {}).get('last_run')
+        }
+
+def submit(filepath, filename, scheduler=None, **retrain_kwargs):
+    """Queue an upload and, unless a retrain is already running, run it"""
+    scheduler = scheduler or RetrainScheduler()
+    depth = scheduler.enqueue(filepath, filename)
+    print(f"📥 Queued {filename} for retraining (queue depth {depth})", flush=True)
+    if not scheduler.run_pending(**retrain_kwargs):
+        print("⏳ A retrain is already running; it will pick up this upload", flush=True)
+        return None
+    return scheduler.status()['last_run']
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="KMRL AI Retrain Scheduler")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    submit_parser = subparsers.add_parser('submit', help='queue an upload and retrain when the burst settles')
+    submit_parser.add_argument('filepath')
+    submit_parser.add_argument('filename')
+    subparsers.add_parser('status', help='show queue depth, wait time and the last run')
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        print(json.dumps(RetrainScheduler().status(), indent=2))
+        sys.exit(0)
+
+    last_run = submit(args.filepath, args.filename)
+    sys.exit(0 if last_run is None or last_run['success'] else 1)
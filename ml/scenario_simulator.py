@@ -0,0 +1,242 @@
+"""
+KMRL What-If Scenario Simulator
+Scores the fleet and checks induction plan feasibility for thousands of scenarios at once as array operations
+"""
+
+import time
+
+from lazy_imports import lazy_import
+from config import SIMULATION_CONFIG, PLANNER_CONFIG, STABLING_CONFIG
+from induction_planner import PLAN_INPUTS
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+def _fleet_arrays(fleet_df):
+    """Per-train base arrays, with the planner's defaults for missing columns"""
+    n = len(fleet_df)
+
+    def column(name, default, dtype=np.float64):
+        if name not in fleet_df.columns:
+            return np.full(n, default, dtype=dtype)
+        return fleet_df[name].fillna(default).to_numpy(dtype=dtype)
+
+    rng = np.random.default_rng(0)
+    availability = column('Availability Score', np.nan)
+    maintenance = column('Maintenance Score', np.nan)
+    # Missing scores are drawn once like score_fleet's sample fleet, then held fixed across scenarios
+    availability = np.where(np.isnan(availability), 85 + rng.integers(-15, 16, n), availability)
+    maintenance = np.where(np.isnan(maintenance), 80 + rng.integers(-20, 21, n), maintenance)
+
+    status = fleet_df['Status'].to_numpy() if 'Status' in fleet_df.columns else np.full(n, 'Active', dtype=object)
+    # A missing certificate gets the planner's default
+    fitness = (fleet_df['Fitness Status'].fillna(PLAN_INPUTS['Fitness Status']).to_numpy()
+               if 'Fitness Status' in fleet_df.columns else np.full(n, PLAN_INPUTS['Fitness Status'], dtype=object))
+    mileage = column('Mileage', np.nan)
+    spread = np.nanstd(mileage) if np.isfinite(mileage).any() else 0.0
+    mileage_z = np.nan_to_num((mileage - np.nanmean(mileage)) / spread) if spread else np.zeros(n)
+
+    return {
+        'availability': availability,
+        'maintenance': maintenance,
+        'alerts': column('Alert Count', 0),
+        'in_maintenance': status == 'Maintenance',
+        'expired': fitness == 'Expired',
+        'pending': fitness == 'Pending',
+        'overdue': column('Overdue Maintenance', False, bool),
+        'open_job_cards': column('Open Job Cards', 0),
+        'branding': np.minimum(column('Branding Hours Remaining', 0) / PLANNER_CONFIG['branding_hours_scale'], 1.0),
+        'mileage_z': mileage_z
+    }
+
+def _bay_positions(layout=None):
+    """Positions of every bay in the stabling layout, depot by depot"""
+    layout = layout or STABLING_CONFIG['depots']
+    return np.repeat([spec['positions_per_bay'] for spec in layout.values()],
+                     [spec['bays'] for spec in layout.values()])
+
+def sample_scenarios(n_scenarios, n_trains, n_bays, rates=None, rng=None):
+    """Random breakdown, certificate expiry and bay outage masks for n_scenarios Monte Carlo draws"""
+    rates = {**SIMULATION_CONFIG['rates'], **(rates or {})}
+    rng = rng or np.random.default_rng()
+    return {
+        'breakdown': rng.random((n_scenarios, n_trains)) < rates['breakdown'],
+        'certificate_expiry': rng.random((n_scenarios, n_trains)) < rates['certificate_expiry'],
+        'bay_outage': rng.random((n_scenarios, n_bays)) < rates['bay_outage']
+    }
+
+def scenario_masks(scenarios, train_ids, layout=None):
+    """Masks for explicit scenarios
+
+    Each scenario is a dict with any of 'breakdowns' and 'expired' (lists of
+    Train IDs) and 'bays_out' (a list of 'Depot:bay' strings).
+    """
+    layout = layout or STABLING_CONFIG['depots']
+    train_index = {train_id: i for i, train_id in enumerate(train_ids)}
+    bay_index, offset = {}, 0
+    for depot, spec in layout.items():
+        for bay_no in range(1, spec['bays'] + 1):
+            bay_index[f"{depot}:{bay_no}"] = offset + bay_no - 1
+        offset += spec['bays']
+
+    masks = {
+        'breakdown': np.zeros((len(scenarios), len(train_ids)), dtype=bool),
+        'certificate_expiry': np.zeros((len(scenarios), len(train_ids)), dtype=bool),
+        'bay_outage': np.zeros((len(scenarios), offset), dtype=bool)
+    }
+    for row, scenario in enumerate(scenarios):
+        for mask, key, index in (('breakdown', 'breakdowns', train_index),
+                                 ('certificate_expiry', 'expired', train_index),
+                                 ('bay_outage', 'bays_out', bay_index)):
+            unknown = [item for item in scenario.get(key, []) if item not in index]
+            if unknown:
+                raise ValueError(f"Scenario {row}: unknown {key} {', '.join(map(str, unknown[:5]))}")
+            masks[mask][row, [index[item] for item in scenario.get(key, [])]] = True
+    return masks
+
+def evaluate(base, masks, bay_positions, service_trains=None, min_service_score=None):
+    """Score and plan every scenario in masks at once; returns per-scenario and per-train arrays
+
+    Broken-down trains lose their availability and pick up an alert, and
+    are then scored with quick_fix.induction_score on the whole (scenarios x
+    trains) matrix. The planner's hard constraints and utility are applied
+    the same way, and the best service_trains serviceable trains of each
+    scenario go into Service. A scenario is feasible when it fills every
+    Service slot and every train outside maintenance still has a stabling
+    position after the bay outages.
+    """
+    from quick_fix import induction_score
+    from feature_store import AVAILABILITY_SCORES
+
+    service_trains = service_trains if service_trains is not None else PLANNER_CONFIG['service_trains']
+    min_service_score = min_service_score if min_service_score is not None else PLANNER_CONFIG['min_service_score']
+    weights = PLANNER_CONFIG['weights']
+    broken = masks['breakdown']
+
+    availability = np.where(broken, AVAILABILITY_SCORES['Out of Service'], base['availability'])
+    # Whole points, as score_fleet reports them
+    scores = np.floor(induction_score(availability, base['maintenance'], base['alerts'] + broken))
+
+    maintenance = (broken | masks['certificate_expiry'] | base['in_maintenance'] | base['expired']
+                   | base['overdue'] | (scores < min_service_score))
+    serviceable = ~maintenance & ~base['pending']
+    utility = (weights['score'] * scores + weights['branding'] * base['branding']
+               - weights['job_cards'] * base['open_job_cards'] - weights['mileage'] * base['mileage_z'])
+
+    # Best service_trains serviceable trains per scenario, ties broken by Train ID like the planner
+    slots = min(service_trains, serviceable.shape[1])
+    ranked = np.argsort(np.where(serviceable, -utility, np.inf), axis=1, kind='stable')[:, :slots]
+    service = np.zeros_like(serviceable)
+    np.put_along_axis(service, ranked, True, axis=1)
+    service &= serviceable
+
+    positions = bay_positions.sum() - (masks['bay_outage'] * bay_positions).sum(axis=1)
+    stabling_shortfall = np.maximum((~maintenance).sum(axis=1) - positions, 0)
+    service_count = service.sum(axis=1)
+    return {
+        'scores': scores,
+        'service': service,
+        'maintenance': maintenance,
+        'service_count': service_count,
+        'service_utility': np.where(service, utility, 0).sum(axis=1),
+        'mean_score': scores.mean(axis=1),
+        'stabling_positions': positions,
+        'stabling_shortfall': stabling_shortfall,
+        'feasible': (service_count >= service_trains) & (stabling_shortfall == 0)
+    }
+
+def simulate(fleet_df, scenarios=None, n_scenarios=None, rates=None, seed=None,
+             service_trains=None, chunk_size=None):
+    """Run explicit scenarios, or n_scenarios Monte Carlo draws, and summarise them
+
+    Scenarios are evaluated chunk_size at a time so memory stays bounded
+    however many are asked for.
+    """
+    n_scenarios = len(scenarios) if scenarios is not None else (n_scenarios or SIMULATION_CONFIG['scenarios'])
+    chunk_size = chunk_size or SIMULATION_CONFIG['chunk_size']
+    rng = np.random.default_rng(SIMULATION_CONFIG['seed'] if seed is None else seed)
+    # Train ID order, so equal utilities are broken the way the planner breaks them
+    fleet_df = fleet_df.sort_values('Train ID', kind='stable', ignore_index=True)
+    base = _fleet_arrays(fleet_df)
+    train_ids = fleet_df['Train ID'].astype(str).to_numpy()
+    bay_positions = _bay_positions()
+
+    per_scenario = {key: [] for key in ('service_count', 'service_utility', 'mean_score',
+                                        'stabling_shortfall', 'feasible')}
+    service_total = np.zeros(len(train_ids))
+    maintenance_total = np.zeros(len(train_ids))
+    started = time.perf_counter()
+    for start in range(0, n_scenarios, chunk_size):
+        stop = min(start + chunk_size, n_scenarios)
+        if scenarios is not None:
+            masks = scenario_masks(scenarios[start:stop], list(train_ids))
+        else:
+            masks = sample_scenarios(stop - start, len(train_ids), len(bay_positions), rates, rng)
+        result = evaluate(base, masks, bay_positions, service_trains)
+        for key in per_scenario:
+            per_scenario[key].append(result[key])
+        service_total += result['service'].sum(axis=0)
+        maintenance_total += result['maintenance'].sum(axis=0)
+    per_scenario = {key: np.concatenate(values) for key, values in per_scenario.items()}
+
+    service_count = per_scenario['service_count']
+    summary = {
+        'scenarios': n_scenarios,
+        'trains': len(train_ids),
+        'service_trains': service_trains if service_trains is not None else PLANNER_CONFIG['service_trains'],
+        'feasible_rate': float(per_scenario['feasible'].mean()),
+        'service_count': {
+            'mean': float(service_count.mean()),
+            'p5': float(np.percentile(service_count, 5)),
+            'p50': float(np.percentile(service_count, 50)),
+            'p95': float(np.percentile(service_count, 95))
+        },
+        'mean_score': float(per_scenario['mean_score'].mean()),
+        'stabling_shortfall_rate': float((per_scenario['stabling_shortfall'] > 0).mean()),
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+    trains = pd.DataFrame({
+        'Train ID': train_ids,
+        'Service Probability': service_total / n_scenarios,
+        'Maintenance Probability': maintenance_total / n_scenarios
+    }).sort_values('Service Probability', ascending=False, kind='stable', ignore_index=True)
+    return summary, trains, per_scenario
+
+def load_fleet(db_path=None):
+    """The database fleet, or the sample fleet create_simplified_induction_system falls back to"""
+    from quick_fix import load_db_fleet
+
+    fleet_df = load_db_fleet(db_path) if db_path is not None else load_db_fleet()
+    if fleet_df is None or not len(fleet_df):
+        # Sample trains are simulated as certified, as in quick_fix
+        fleet_df = pd.DataFrame({'Train ID': [f'T{i:03d}' for i in range(1, 58)], 'Fitness Status': 'Valid'})
+    return fleet_df
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="KMRL what-if scenario simulator")
+    parser.add_argument('--scenarios', type=int, default=None, help='Monte Carlo scenarios to draw')
+    parser.add_argument('--breakdown-rate', type=float, default=None, help='chance each train breaks down')
+    parser.add_argument('--expiry-rate', type=float, default=None, help="chance each train's certificate expires")
+    parser.add_argument('--bay-outage-rate', type=float, default=None, help='chance each stabling bay is out of use')
+    parser.add_argument('--service-trains', type=int, default=None, help='service slots to fill')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='print the summary and per-train odds as JSON')
+    args = parser.parse_args()
+
+    rates = {key: value for key, value in (('breakdown', args.breakdown_rate),
+                                           ('certificate_expiry', args.expiry_rate),
+                                           ('bay_outage', args.bay_outage_rate)) if value is not None}
+    summary, trains, _ = simulate(load_fleet(), n_scenarios=args.scenarios, rates=rates,
+                                  seed=args.seed, service_trains=args.service_trains)
+    if args.json:
+        print(json.dumps({'summary': summary, 'trains': trains.to_dict('records')}))
+    else:
+        print(f"🎲 {summary['scenarios']} scenarios x {summary['trains']} trains in {summary['seconds']}s")
+        print(f"   Feasible: {summary['feasible_rate']:.1%}, stabling shortfall: {summary['stabling_shortfall_rate']:.1%}")
+        count = summary['service_count']
+        print(f"   Service trains: mean {count['mean']:.1f}, p5 {count['p5']:.0f}, p95 {count['p95']:.0f} "
+              f"of {summary['service_trains']}")
+        print(trains.head(10).to_string(index=False))
@@ -0,0 +1,233 @@
+"""
+KMRL Stabling Bay Assignment
+Assigns every trainset a depot bay position so the next morning's induction order needs the fewest shunting moves
+"""
+
+import time
+
+from lazy_imports import lazy_import
+from config import DB_PATH, STABLING_CONFIG
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Induction decisions in departure order; only Service trains leave in the morning
+DEPARTURE_ORDER = ['Service', 'Standby', 'Maintenance']
+
+def parse_slot(text):
+    """'Depot1:4:2' -> ('Depot1', 4, 2)"""
+    try:
+        depot, bay_no, position_order = text.split(':')
+        return depot, int(bay_no), int(position_order)
+    except ValueError:
+        raise ValueError(f"Blocked position must look like Depot1:4:2, got {text!r}") from None
+
+def build_slots(layout=None, occupied=None, blocked=()):
+    """Every usable (depot, bay, position) with its depth in the bay
+
+    Positions are numbered from the exit, so position 1 leaves first. Bays
+    and positions seen in stabling_geometry but missing from the layout are
+    added. Blocked positions are left out, and the positions behind them are
+    flagged as trapped because nothing there can get past to leave.
+    """
+    layout = layout or STABLING_CONFIG['depots']
+    slots = {
+        (depot, bay_no, position_order)
+        for depot, spec in layout.items()
+        for bay_no in range(1, spec['bays'] + 1)
+        for position_order in range(1, spec['positions_per_bay'] + 1)
+    }
+    if occupied is not None and len(occupied):
+        slots |= set(zip(occupied['depot'], occupied['bay_no'].astype(int), occupied['position_order'].astype(int)))
+
+    frame = pd.DataFrame(sorted(slots), columns=['depot', 'bay_no', 'position_order'])
+    bays = frame.groupby(['depot', 'bay_no'])['position_order']
+    frame['capacity'] = bays.transform('max')
+    frame['depth'] = ((frame['position_order'] - 1) / (frame['capacity'] - 1).clip(lower=1)).astype('float64')
+
+    blocked = pd.DataFrame(list(blocked), columns=['depot', 'bay_no', 'position_order'])
+    if len(blocked):
+        first_block = blocked.groupby(['depot', 'bay_no'])['position_order'].min().rename('first_block')
+        frame = frame.merge(first_block, left_on=['depot', 'bay_no'], right_index=True, how='left')
+        is_blocked = frame.set_index(['depot', 'bay_no', 'position_order']).index.isin(
+            blocked.set_index(['depot', 'bay_no', 'position_order']).index
+        )
+        frame['trapped'] = frame['position_order'] > frame['first_block'].fillna(np.inf)
+        frame = frame[~is_blocked].drop(columns='first_block')
+    else:
+        frame['trapped'] = False
+    return frame.reset_index(drop=True)
+
+def departure_ranks(trains):
+    """0 for the first train out in the morning up to 1 for the last, from decision and score"""
+    decision = pd.Categorical(trains['decision'], categories=DEPARTURE_ORDER, ordered=True)
+    order = pd.DataFrame({
+        'decision': decision.codes,
+        'score': -trains['score'].fillna(0).to_numpy(dtype=np.float64)
+    }).sort_values(['decision', 'score'], kind='stable').index
+    ranks = np.empty(len(trains), dtype=np.float64)
+    ranks[order] = np.arange(len(trains)) / max(len(trains) - 1, 1)
+    return ranks
+
+def assignment_costs(trains, slots, weights=None):
+    """Train x slot cost matrix
+
+    The order term is convex in the gap between a train's departure rank and
+    a slot's depth, which makes the optimal matching keep departure order
+    within every bay. Moving a train that is already stabled, and moving it
+    to the other depot, add their own costs.
+    """
+    weights = {**STABLING_CONFIG['weights'], **(weights or {})}
+    ranks = departure_ranks(trains)
+    cost = weights['order'] * (ranks[:, None] - slots['depth'].to_numpy()[None, :]) ** 2
+
+    stabled = trains['depot'].notna().to_numpy()
+    same_slot = (
+        (trains['depot'].to_numpy()[:, None] == slots['depot'].to_numpy()[None, :])
+        & (trains['bay_no'].to_numpy()[:, None] == slots['bay_no'].to_numpy()[None, :])
+        & (trains['position_order'].to_numpy()[:, None] == slots['position_order'].to_numpy()[None, :])
+    )
+    other_depot = trains['depot'].to_numpy()[:, None] != slots['depot'].to_numpy()[None, :]
+    cost += weights['move'] * (stabled[:, None] & ~same_slot)
+    cost += weights['depot_change'] * (stabled[:, None] & other_depot)
+
+    departing = (trains['decision'] == 'Service').to_numpy()
+    cost += weights['trapped'] * (departing[:, None] & slots['trapped'].to_numpy()[None, :])
+    return cost
+
+def shunting_moves(plan):
+    """Trains that must be shunted aside before an earlier departure behind them can leave"""
+    ordered = plan.sort_values(['depot', 'bay_no', 'position_order'], ascending=[True, True, False])
+    # Earliest departure among the departing trains at or behind each position
+    departing_rank = ordered['departure_rank'].where(ordered['decision'] == 'Service', np.inf)
+    earliest_behind = departing_rank.groupby([ordered['depot'], ordered['bay_no']]).cummin()
+    behind = earliest_behind.groupby([ordered['depot'], ordered['bay_no']]).shift(1, fill_value=np.inf)
+    return (behind < ordered['departure_rank']).reindex(plan.index)
+
+def solve_stabling(trains, slots, weights=None):
+    """Optimal bay assignment for trains over slots with the Hungarian-style LAPJV solver
+
+    trains needs trainset_id, serial_no, decision, score and the current
+    depot/bay_no/position_order (NaN when the train is out in service).
+    Returns one row per assigned train; trains beyond the number of free
+    slots are returned with no slot.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    trains = trains.reset_index(drop=True)
+    cost = assignment_costs(trains, slots, weights)
+    train_rows, slot_rows = linear_sum_assignment(cost)
+
+    plan = trains[['trainset_id', 'serial_no', 'decision', 'score']].copy()
+    plan['departure_rank'] = departure_ranks(trains)
+    for column in ['depot', 'bay_no', 'position_order']:
+        plan[column] = pd.Series(slots[column].to_numpy()[slot_rows], index=train_rows).reindex(plan.index)
+    plan['relocated'] = trains['depot'].notna() & (
+        (plan['depot'] != trains['depot'])
+        | (plan['bay_no'] != trains['bay_no'])
+        | (plan['position_order'] != trains['position_order'])
+    )
+    plan['blocking'] = shunting_moves(plan).fillna(False).astype(bool)
+    return plan.sort_values(['depot', 'bay_no', 'position_order'], ignore_index=True)
+
+def load_stabling_inputs(db_path=DB_PATH):
+    """Trains with their current positions and the departure order of the latest induction plan"""
+    from db_loader import connect_readonly, fetch_frame
+
+    conn = connect_readonly(db_path)
+    try:
+        trainsets = fetch_frame(conn, "SELECT trainset_id, serial_no, status FROM trainsets", (),
+                                ['trainset_id', 'serial_no', 'status'])
+        geometry = fetch_frame(
+            conn, "SELECT trainset_id, depot, bay_no, position_order FROM stabling_geometry ORDER BY stable_id", (),
+            ['trainset_id', 'depot', 'bay_no', 'position_order']
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(induction_plans)")}
+        score = 'score' if 'score' in columns else 'NULL'
+        plan = fetch_frame(
+            conn,
+            f"SELECT trainset_id, decision, {score} FROM induction_plans "
+            "WHERE date = (SELECT MAX(date) FROM induction_plans)",
+            (), ['trainset_id', 'decision', 'score']
+        )
+    finally:
+        conn.close()
+
+    # A train's latest geometry row is where it stands now
+    geometry = geometry.drop_duplicates('trainset_id', keep='last')
+    trains = trainsets.merge(geometry, on='trainset_id', how='left').merge(plan, on='trainset_id', how='left')
+    # Trains missing from the plan follow their fleet status
+    trains['decision'] = trains['decision'].fillna(trains['status'].map({'Active': 'Service'})).fillna(trains['status'])
+    trains['score'] = pd.to_numeric(trains['score'])
+    return trains.drop(columns='status'), geometry
+
+def plan_stabling(db_path=DB_PATH, blocked=None, weights=None):
+    """Solve the stabling plan for the fleet in the database"""
+    trains, geometry = load_stabling_inputs(db_path)
+    blocked = [parse_slot(slot) if isinstance(slot, str) else slot
+               for slot in (STABLING_CONFIG['blocked'] if blocked is None else blocked)]
+    slots = build_slots(occupied=geometry, blocked=blocked)
+    if len(trains) > len(slots):
+        print(f"⚠️ {len(trains)} trains for {len(slots)} free positions, {len(trains) - len(slots)} stay unassigned")
+    return solve_stabling(trains, slots, weights)
+
+def summarize_plan(plan):
+    assigned = plan['depot'].notna()
+    return {
+        'trains': int(len(plan)),
+        'assigned': int(assigned.sum()),
+        'relocated': int(plan['relocated'].sum()),
+        'shunting_moves': int(plan['blocking'].sum()),
+        'by_depot': {depot: int(count) for depot, count in plan.loc[assigned, 'depot'].value_counts().items()}
+    }
+
+def synthetic_fleet(n_trains, seed=42):
+    """Random fleet, half already stabled, across the configured depots (for timing the solver)"""
+    rng = np.random.default_rng(seed)
+    depots = list(STABLING_CONFIG['depots'])
+    layout = {depot: {'bays': n_trains // len(depots) // 2 + 2, 'positions_per_bay': 3} for depot in depots}
+    slots = build_slots(layout)
+    stabled = rng.random(n_trains) < 0.5
+    current = slots.sample(n=n_trains, random_state=seed).reset_index(drop=True)
+    trains = pd.DataFrame({
+        'trainset_id': np.arange(1, n_trains + 1),
+        'serial_no': [f'T{i:04d}' for i in range(1, n_trains + 1)],
+        'decision': rng.choice(DEPARTURE_ORDER, n_trains, p=[0.8, 0.15, 0.05]),
+        'score': rng.integers(40, 101, n_trains).astype(np.float64),
+        'depot': current['depot'].where(stabled),
+        'bay_no': current['bay_no'].where(stabled),
+        'position_order': current['position_order'].where(stabled)
+    })
+    return trains, layout
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="KMRL stabling bay assignment")
+    parser.add_argument('--block', action='append', default=None, metavar='DEPOT:BAY:POSITION',
+                        help='position that cannot be used tonight (repeatable)')
+    parser.add_argument('--output', default=None, help='write the plan as CSV')
+    parser.add_argument('--benchmark', type=int, nargs='*', metavar='TRAINS',
+                        help='time the solver on synthetic fleets of these sizes instead')
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        for n_trains in args.benchmark or [100, 300, 600]:
+            trains, layout = synthetic_fleet(n_trains)
+            slots = build_slots(layout)
+            started = time.perf_counter()
+            plan = solve_stabling(trains, slots)
+            elapsed = time.perf_counter() - started
+            summary = summarize_plan(plan)
+            print(f"⏱️ {n_trains} trains x {len(slots)} positions: {elapsed * 1000:.1f} ms, "
+                  f"{summary['relocated']} relocated, {summary['shunting_moves']} shunting moves")
+    else:
+        started = time.perf_counter()
+        plan = plan_stabling(blocked=args.block)
+        elapsed = time.perf_counter() - started
+        print(plan.to_string(index=False))
+        print(f"\n🚉 {json.dumps(summarize_plan(plan))} in {elapsed * 1000:.1f} ms")
+        if args.output:
+            plan.to_csv(args.output, index=False)
+            print(f"✅ Stabling plan saved to: {args.output}")
@@ -0,0 +1,8 @@
+"""The ML modules import each other by bare name, as when run from ml/"""
+
+import sys
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent.parent
+if str(ML_DIR) not in sys.path:
+    sys.path.insert(0, str(ML_DIR))
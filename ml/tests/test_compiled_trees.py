@@ -0,0 +1,42 @@
+"""Compiled tree ensembles score like the sklearn models they were compiled from"""
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
+
+from compiled_trees import CompiledForest
+
+def _sample(n_rows=400, missing=0.0):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(n_rows, 5)).astype(np.float32)
+    filled = X.copy()
+    X[rng.random(X.shape) < missing] = np.nan
+    y_class = (filled[:, 0] + filled[:, 1] > 0).astype(int) + (filled[:, 2] > 1)
+    y_value = 3 * filled[:, 2] - filled[:, 3] + rng.normal(scale=0.1, size=n_rows)
+    return X, y_class, y_value
+
+def _assert_same_classifier(model, X):
+    compiled = CompiledForest(model)
+    assert np.array_equal(compiled.predict(X), model.predict(X))
+    np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), atol=1e-6)
+
+def test_random_forest_classifier():
+    X, y, _ = _sample()
+    _assert_same_classifier(RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y), X)
+
+def test_random_forest_classifier_with_missing_values():
+    # Trained with gaps, so splits learn which side missing values take
+    X, y, _ = _sample(missing=0.15)
+    model = RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+    assert not CompiledForest(model).missing_left.all()
+    _assert_same_classifier(model, X)
+
+def test_missing_values_unseen_in_training():
+    X, y, _ = _sample()
+    model = RandomForestClassifier(n_estimators=25, random_state=0).fit(X, y)
+    X_missing, _, _ = _sample(missing=0.15)
+    _assert_same_classifier(model, X_missing)
+
+def test_gradient_boosting_regressor():
+    X, _, y = _sample()
+    model = GradientBoostingRegressor(n_estimators=40, random_state=0).fit(X, y)
+    np.testing.assert_allclose(CompiledForest(model).predict(X), model.predict(X), rtol=1e-5, atol=1e-5)
@@ -0,0 +1,16 @@
+"""Startup budget check: every budgeted ML module imports within STARTUP_BUDGET_MS"""
+
+import sys
+import subprocess
+from pathlib import Path
+
+ML_DIR = Path(__file__).resolve().parent.parent
+
+def test_imports_within_startup_budget():
+    completed = subprocess.run(
+        [sys.executable, 'import_report.py', '--check'],
+        cwd=str(ML_DIR),
+        capture_output=True,
+        text=True
+    )
+    assert completed.returncode == 0, completed.stdout + completed.stderr
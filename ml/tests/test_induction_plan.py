@@ -0,0 +1,13 @@
+"""The shipped database plans some trains into Service"""
+
+from config import DB_PATH
+from quick_fix import build_induction_results
+
+def test_shipped_database_fills_service():
+    results = build_induction_results(DB_PATH)
+    decisions = results['Decision'].value_counts()
+    assert decisions.get('Service', 0) > 0, decisions.to_dict()
+    # Service trains come first, in plan order
+    service = results[results['Decision'] == 'Service']
+    assert list(service.index) == list(range(len(service)))
+    assert service['Plan Rank'].is_monotonic_increasing
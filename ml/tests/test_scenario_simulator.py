@@ -0,0 +1,17 @@
+"""The baseline scenario of the sample fleet fills every Service slot"""
+
+from config import PLANNER_CONFIG
+from scenario_simulator import load_fleet, simulate
+
+def test_baseline_fills_service_slots(tmp_path):
+    # No database, so the simulator falls back to the sample fleet
+    fleet_df = load_fleet(tmp_path / 'missing.sqlite')
+    summary, trains, _ = simulate(fleet_df, scenarios=[{}])
+    assert summary['service_count']['mean'] == PLANNER_CONFIG['service_trains']
+    assert summary['feasible_rate'] == 1.0
+
+def test_monte_carlo_without_failures_is_feasible(tmp_path):
+    fleet_df = load_fleet(tmp_path / 'missing.sqlite')
+    rates = {'breakdown': 0.0, 'certificate_expiry': 0.0, 'bay_outage': 0.0}
+    summary, _, _ = simulate(fleet_df, n_scenarios=100, rates=rates)
+    assert summary['feasible_rate'] == 1.0
@@ -0,0 +1,241 @@
+"""
+KMRL Pipeline Tracing
+Spans recording wall time, CPU time and peak traced memory per stage, written as JSON lines
+"""
+
+import os
+import json
+import time
+import threading
+import tracemalloc
+from datetime import datetime
+
+from config import TRACE_PATH, TRACING_CONFIG
+
+# KMRL_TRACE=0 turns tracing off, 1 records time only, memory also records peak memory;
+# unset uses TRACING_CONFIG (off by default)
+TRACE_ENV = 'KMRL_TRACE'
+# Subprocesses started inside a span join its trace through this variable
+TRACE_ID_ENV = 'KMRL_TRACE_ID'
+
+def _env_settings():
+    value = os.environ.get(TRACE_ENV, '').strip().lower()
+    if value in ('0', 'false', 'off', 'no'):
+        return False, False
+    if value in ('1', 'true', 'on', 'yes'):
+        return True, False
+    if value == 'memory':
+        return True, True
+    return TRACING_CONFIG['enabled'], TRACING_CONFIG['trace_memory']
+
+class _NullSpan:
+    """Returned when tracing is off so instrumented code pays one attribute check"""
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+_state = threading.local()
+_enabled, _trace_memory = _env_settings()
+_settings = {
+    'enabled': _enabled,
+    'trace_memory': _trace_memory,
+    'path': str(TRACE_PATH),
+    'max_bytes': TRACING_CONFIG['max_bytes']
+}
+_write_lock = threading.Lock()
+
+def configure(enabled=None, trace_memory=None, path=None, max_bytes=None):
+    """Change tracing settings for this process"""
+    if enabled is not None:
+        _settings['enabled'] = enabled
+    if trace_memory is not None:
+        _settings['trace_memory'] = trace_memory
+    if path is not None:
+        _settings['path'] = str(path)
+    if max_bytes is not None:
+        _settings['max_bytes'] = max_bytes
+
+def enabled():
+    return _settings['enabled']
+
+def _stack():
+    if not hasattr(_state, 'stack'):
+        _state.stack = []
+    return _state.stack
+
+def current_trace_id():
+    """Trace id of the innermost open span, or of the trace this process was started in"""
+    stack = _stack()
+    if stack:
+        return stack[-1].trace_id
+    return os.environ.get(TRACE_ID_ENV)
+
+def trace_env():
+    """Environment for a subprocess whose spans should join the current trace"""
+    trace_id = current_trace_id()
+    if not _settings['enabled'] or trace_id is None:
+        return dict(os.environ)
+    return {**os.environ, TRACE_ID_ENV: trace_id}
+
+class Span:
+    """One timed stage; nested spans share the trace id of the outermost one
+
+    Peak memory is the highest tracemalloc reading above the span's starting
+    point. tracemalloc is process-wide, so spans open in several threads at
+    once share their peaks.
+    """
+
+    def __init__(self, name, trace_id=None, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.trace_id = trace_id
+        self.parent = None
+        self._started_tracemalloc = False
+
+    def set(self, **attrs):
+        """Attach attributes known only once the stage has run, such as row counts"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        self.trace_id = self.trace_id or current_trace_id() or os.urandom(8).hex()
+        self.span_id = os.urandom(4).hex()
+
+        if _settings['trace_memory']:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            if self.parent is not None:
+                # The parent keeps the peak reached so far before it is reset for this span
+                self.parent.peak = max(self.parent.peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self.start_memory = self.peak = tracemalloc.get_traced_memory()[0]
+
+        stack.append(self)
+        self.started_at = time.time()
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self.start_wall
+        cpu = time.process_time() - self.start_cpu
+        record = {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent else None,
+            'name': self.name,
+            'pid': os.getpid(),
+            'started_at': datetime.fromtimestamp(self.started_at).isoformat(),
+            'wall_ms': round(wall * 1000, 3),
+            'cpu_ms': round(cpu * 1000, 3),
+            'status': 'error' if exc_type else 'ok'
+        }
+
+        if _settings['trace_memory'] and tracemalloc.is_tracing():
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            record['peak_memory_bytes'] = self.peak - self.start_memory
+            if self.parent is not None:
+                self.parent.peak = max(self.parent.peak, self.peak)
+                tracemalloc.reset_peak()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+        if exc_type is not None:
+            record['error'] = f"{exc_type.__name__}: {exc}"
+        record.update(self.attrs)
+
+        stack = _stack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        _write(record)
+        return False
+
+def span(name, trace_id=None, **attrs):
+    """Time a stage: `with span('retrain.fitness_certificate', rows=n): ...`"""
+    if not _settings['enabled']:
+        return NULL_SPAN
+    return Span(name, trace_id, **attrs)
+
+def _write(record):
+    line = json.dumps(record, default=str) + '\n'
+    path = _settings['path']
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                if os.path.getsize(path) >= _settings['max_bytes']:
+                    # One older file is kept, so the trace file stays bounded
+                    os.replace(path, f"{path}.1")
+            except FileNotFoundError:
+                pass
+            # One append per line, so concurrent processes do not interleave records
+            with open(path, 'a') as f:
+                f.write(line)
+    except OSError:
+        pass
+
+def read_spans(path=None, trace_id=None):
+    """Read recorded spans, including the rotated file, optionally only those of one trace"""
+    path = path or _settings['path']
+    spans = []
+    for part in (f"{path}.1", path):
+        try:
+            with open(part, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if trace_id is None or record.get('trace_id') == trace_id:
+                        spans.append(record)
+        except OSError:
+            pass
+    return spans
+
+def summarize(spans):
+    """Print the spans of one trace as an indented tree in start order"""
+    children = {}
+    for record in spans:
+        children.setdefault(record.get('parent_id'), []).append(record)
+    span_ids = {record['span_id'] for record in spans}
+    # Spans from subprocesses have parents outside this process and are shown at the top level
+    roots = [record for record in spans if record.get('parent_id') not in span_ids]
+
+    def show(record, depth):
+        memory = record.get('peak_memory_bytes')
+        memory = f"{memory / (1 << 20):9.1f} MB" if memory is not None else ' ' * 12
+        status = '' if record['status'] == 'ok' else f"  ❌ {record.get('error', '')}"
+        label = f"{record['name']} [{record['artifact']}]" if 'artifact' in record else record['name']
+        print(f"{'  ' * depth}{label:<{56 - 2 * depth}} {record['wall_ms']:>10.1f} ms "
+              f"{record['cpu_ms']:>10.1f} ms cpu {memory}{status}")
+        for child in sorted(children.get(record['span_id'], []), key=lambda r: r['started_at']):
+            show(child, depth + 1)
+
+    for root in sorted(roots, key=lambda r: r['started_at']):
+        show(root, 0)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="KMRL pipeline trace viewer")
+    parser.add_argument('--trace', help='trace id to show (default: the most recent trace)')
+    parser.add_argument('--path', default=None, help=f'trace file (default: {TRACE_PATH})')
+    args = parser.parse_args()
+
+    spans = read_spans(args.path)
+    if not spans:
+        print("⚠️ No spans recorded yet")
+    else:
+        trace_id = args.trace or spans[-1]['trace_id']
+        print(f"🔍 Trace {trace_id}")
+        summarize([record for record in spans if record['trace_id'] == trace_id])
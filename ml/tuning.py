@@ -0,0 +1,197 @@
+"""
+KMRL Hyperparameter Tuning
+Budgeted successive-halving search with parallel k-fold CV; the best parameters are saved per model
+"""
+
+import os
+import json
+import time
+import itertools
+from datetime import datetime
+
+from lazy_imports import lazy_import
+from config import TUNED_PARAMS_DIR, TRAINING_CONFIG
+
+np = lazy_import('numpy')
+
+_FOREST_SPACE = {
+    'n_estimators': [50, 100, 150, 200, 300],
+    'max_depth': [None, 4, 8, 16],
+    'min_samples_leaf': [1, 2, 4, 8],
+    'max_features': ['sqrt', 'log2', None]
+}
+
+# Key parameters searched per model. The mileage balancer (least squares) and
+# the stabling clusters (a fixed number of bays) have nothing worth searching.
+SEARCH_SPACES = {
+    'fitness_certificate': _FOREST_SPACE,
+    'jobcard_optimizer': {
+        'n_estimators': [50, 100, 200, 300],
+        'learning_rate': [0.03, 0.1, 0.3],
+        'max_depth': [2, 3, 4, 5],
+        'subsample': [0.7, 0.85, 1.0]
+    },
+    'branding_optimizer': _FOREST_SPACE,
+    'resource_scheduler': _FOREST_SPACE,
+    'master_decision_engine': _FOREST_SPACE
+}
+
+def _params_path(name, params_dir=TUNED_PARAMS_DIR):
+    return os.path.join(str(params_dir), f"{name}.json")
+
+def load_tuned_params(name, params_dir=TUNED_PARAMS_DIR):
+    """Saved search result for a model, or None"""
+    try:
+        with open(_params_path(name, params_dir), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_tuned_params(name, result, params_dir=TUNED_PARAMS_DIR):
+    os.makedirs(str(params_dir), exist_ok=True)
+    path = _params_path(name, params_dir)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(result, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+def sample_candidates(space, n_candidates, seed=42):
+    """Up to n_candidates distinct parameter combinations drawn from a grid"""
+    keys = sorted(space)
+    grid = list(itertools.product(*(space[key] for key in keys)))
+    rng = np.random.default_rng(seed)
+    chosen = rng.choice(len(grid), size=min(n_candidates, len(grid)), replace=False)
+    return [dict(zip(keys, grid[i])) for i in sorted(chosen)]
+
+def _cv_splitter(estimator, y, folds, seed=42):
+    """Stratified folds for classifiers when every class can fill them, shuffled folds otherwise"""
+    from sklearn.base import is_classifier
+    from sklearn.model_selection import KFold, StratifiedKFold
+
+    if is_classifier(estimator):
+        _, counts = np.unique(np.asarray(y), return_counts=True)
+        stratified_folds = min(folds, int(counts.min()))
+        if stratified_folds >= 2:
+            return StratifiedKFold(n_splits=stratified_folds, shuffle=True, random_state=seed)
+    return KFold(n_splits=folds, shuffle=True, random_state=seed)
+
+def successive_halving(estimator, space, X, y, budget_seconds=None, n_candidates=None,
+                       folds=None, factor=None, n_jobs=1, seed=42):
+    """Search space under a wall-clock budget
+
+    Every candidate is scored with k-fold CV on a small share of the rows;
+    the best 1/factor move on to factor times more rows until one candidate
+    is left or the rows run out. Folds are fitted in parallel. When the
+    budget runs out the best candidate of the deepest finished round wins.
+    """
+    from sklearn.base import clone, is_classifier
+    from sklearn.model_selection import cross_val_score
+
+    budget_seconds = budget_seconds or TRAINING_CONFIG['tuning_budget_seconds']
+    n_candidates = n_candidates or TRAINING_CONFIG['tuning_candidates']
+    folds = folds or TRAINING_CONFIG['cross_validation_folds']
+    factor = factor or TRAINING_CONFIG['halving_factor']
+    scoring = 'accuracy' if is_classifier(estimator) else 'neg_mean_squared_error'
+
+    started = time.monotonic()
+    deadline = started + budget_seconds
+    candidates = sample_candidates(space, n_candidates, seed)
+    n_samples = len(X)
+    order = np.random.default_rng(seed).permutation(n_samples)
+
+    # Enough rounds to whittle the candidates down, but never below folds x 4 rows
+    min_rows = min(n_samples, folds * 4)
+    rounds = 1
+    while factor ** rounds < len(candidates) and n_samples / factor ** rounds >= min_rows:
+        rounds += 1
+
+    best, history, evaluated = None, [], 0
+    for round_index in range(rounds):
+        rows = max(min_rows, int(n_samples / factor ** (rounds - 1 - round_index)))
+        subset = order[:rows]
+        X_round = X.iloc[subset] if hasattr(X, 'iloc') else np.asarray(X)[subset]
+        y_round = y.iloc[subset] if hasattr(y, 'iloc') else np.asarray(y)[subset]
+        cv = _cv_splitter(estimator, y_round, folds, seed)
+
+        scored = []
+        for params in candidates:
+            if time.monotonic() >= deadline:
+                break
+            candidate = clone(estimator).set_params(**params)
+            if 'n_jobs' in candidate.get_params():
+                # Parallelism goes to the folds, not inside each fit
+                candidate.set_params(n_jobs=1)
+            scores = cross_val_score(candidate, X_round, y_round, cv=cv, scoring=scoring, n_jobs=n_jobs)
+            scored.append((float(np.mean(scores)), params))
+            evaluated += 1
+
+        if not scored:
+            break
+        scored.sort(key=lambda item: item[0], reverse=True)
+        history.append({'round': round_index, 'rows': rows, 'candidates': len(scored), 'best_score': scored[0][0]})
+        # A round cut short by the budget only decides when no earlier round finished
+        if len(scored) == len(candidates) or best is None:
+            best = scored[0]
+        if len(scored) < len(candidates):
+            break
+        candidates = [params for _, params in scored[:max(1, len(candidates) // factor)]]
+
+    if best is None:
+        return None
+    return {
+        'params': best[1],
+        'cv_score': best[0],
+        'scoring': scoring,
+        'folds': folds,
+        'rows': n_samples,
+        'evaluated': evaluated,
+        'rounds': history,
+        'seconds': round(time.monotonic() - started, 2),
+        'tuned_at': datetime.now().isoformat()
+    }
+
+def apply_tuned_params(name, estimator, X_train=None, y_train=None, tune=False, n_jobs=1):
+    """Set a model's saved best parameters, searching for them first when tune is set
+
+    Returns the search result that was applied, or None when the model
+    keeps its defaults.
+    """
+    space = SEARCH_SPACES.get(name)
+    if space is None:
+        return None
+
+    if tune:
+        result = successive_halving(estimator, space, X_train, y_train, n_jobs=n_jobs)
+        if result is not None:
+            save_tuned_params(name, result)
+    else:
+        result = load_tuned_params(name)
+
+    if result is None:
+        return None
+    params = {key: value for key, value in result['params'].items() if key in estimator.get_params()}
+    estimator.set_params(**params)
+    return result
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="KMRL saved hyperparameters")
+    parser.add_argument('--clear', nargs='*', metavar='MODEL',
+                        help='forget the saved parameters of these models (all when none are given)')
+    args = parser.parse_args()
+
+    if args.clear is not None:
+        for name in args.clear or SEARCH_SPACES:
+            if os.path.exists(_params_path(name)):
+                os.remove(_params_path(name))
+                print(f"🗑️ Cleared tuned parameters of {name}")
+    else:
+        for name in SEARCH_SPACES:
+            result = load_tuned_params(name)
+            if result is None:
+                print(f"{name}: defaults (not tuned)")
+            else:
+                print(f"{name}: {result['params']} ({result['scoring']} {result['cv_score']:.3f}, "
+                      f"{result['evaluated']} fits of {result['folds']} folds in {result['seconds']}s, {result['tuned_at']})")